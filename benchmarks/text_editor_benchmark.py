@@ -0,0 +1,551 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Módulo con las pruebas de rendimiento del editor de texto.
+
+Genera ficheros y carpetas de prueba sintéticos (siempre iguales, para que
+los resultados se puedan comparar) y mide el tiempo y la memoria máxima
+(RSS) de las operaciones más costosas del editor: abrir y guardar ficheros,
+abrir y listar carpetas y actualizar la vista completa. Cada prueba se
+ejecuta en un proceso nuevo para que la memoria máxima sea solo la suya.
+
+Los resultados se guardan en un fichero JSON que puede compararse con el de
+otro commit (--compare) para detectar empeoramientos.
+
+Ejemplos:
+    python benchmarks/text_editor_benchmark.py
+        Pruebas rápidas (ficheros de hasta 64 MB, carpetas de hasta 50.000
+        ficheros); resultados en benchmark_results.json.
+    python benchmarks/text_editor_benchmark.py --full --output nuevo.json \\
+            --compare anterior.json
+        Todas las pruebas (ficheros de hasta 2 GB, carpetas de hasta 500.000
+        ficheros), comparadas con un resultado anterior.
+
+La prueba de la vista necesita PyQt4. Se usa la plataforma "offscreen" de Qt
+si está disponible; con Qt 4 en X11 hay que ejecutarla con un servidor X
+virtual (por ejemplo, xvfb-run). Si no se puede crear la aplicación de Qt, la
+prueba se marca como omitida.
+
+Autor: Andrés Salinas Lima <i52salia@uco.es>.
+"""
+
+from __future__ import print_function
+import argparse
+import codecs
+import json
+import multiprocessing
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import os
+import tempfile
+import time
+import timeit
+
+try:
+    import resource
+except ImportError:
+    # No existe en Windows: no se mide la memoria.
+    resource = None
+
+# Los módulos del editor no forman un paquete: se importan desde src.
+SOURCE_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.pardir, u"src")
+sys.path.insert(0, SOURCE_FOLDER)
+
+KB = 1024
+MB = 1024 * KB
+GB = 1024 * MB
+
+# Tamaños de los ficheros de prueba (en UTF-8) de las pruebas rápidas y de
+# las completas.
+QUICK_FILE_SIZES = [KB, MB, 64 * MB]
+FULL_FILE_SIZES = [KB, MB, 64 * MB, 512 * MB, 2 * GB]
+
+# Formatos de los ficheros de prueba con otras codificaciones y saltos de
+# línea (de tamaño MIXED_FILE_SIZE): (nombre, codificación, BOM, salto).
+MIXED_FORMATS = [
+    (u"latin1", u"latin-1", b"", u"\n"),
+    (u"utf16", u"utf-16-le", codecs.BOM_UTF16_LE, u"\n"),
+    (u"crlf", u"utf-8", b"", u"\r\n"),
+]
+MIXED_FILE_SIZE = MB
+
+# Número de ficheros de las carpetas de prueba.
+QUICK_FOLDER_SIZES = [10, 1000, 50000]
+FULL_FOLDER_SIZES = [10, 1000, 50000, 500000]
+
+# Semilla del generador de texto: los ficheros de prueba son siempre iguales.
+SEED = 2017
+
+# Palabras con las que se genera el texto (algunas con caracteres no ASCII).
+_WORDS = [u"editor", u"texto", u"fichero", u"carpeta", u"modelo", u"vista",
+          u"controlador", u"línea", u"página", u"búsqueda", u"canción",
+          u"año", u"über", u"naïve", u"def", u"return", u"import", u"self",
+          u"0x1f", u"42", u"{", u"}", u"(", u")", u"=", u"+"]
+
+
+def main(argv=None):
+    """
+    Función principal de las pruebas de rendimiento.
+
+    Argumentos:
+        argv: Lista con los argumentos de la línea de órdenes (por defecto,
+            sys.argv[1:]).
+    """
+    # En Python 2 la salida no tiene codificación si no es una terminal (por
+    # ejemplo, al redirigirla a un fichero). Se ajusta antes de leer los
+    # argumentos, porque la ayuda y los errores de argparse también se
+    # escriben en ella.
+    if (sys.stdout.encoding is None):
+        sys.stdout = codecs.getwriter('utf-8')(sys.stdout)
+    if (sys.stderr.encoding is None):
+        sys.stderr = codecs.getwriter('utf-8')(sys.stderr)
+
+    options = _parse_arguments(argv)
+
+    fixtures_path = options.fixtures
+    if (not os.path.isdir(fixtures_path)):
+        os.makedirs(fixtures_path)
+
+    file_sizes = FULL_FILE_SIZES if options.full else QUICK_FILE_SIZES
+    folder_sizes = FULL_FOLDER_SIZES if options.full else QUICK_FOLDER_SIZES
+
+    print(u"Generando ficheros de prueba en " + fixtures_path + u"...")
+    files = [make_text_file(fixtures_path, u"utf8", size)
+             for size in file_sizes]
+    files.extend(make_text_file(fixtures_path, name, MIXED_FILE_SIZE,
+                                encoding, bom, newline)
+                 for name, encoding, bom, newline in MIXED_FORMATS)
+    folders = [make_folder(fixtures_path, count) for count in folder_sizes]
+
+    cases = []
+    for file_path in files:
+        cases.append((u"open_file", file_path))
+        cases.append((u"save_file", file_path))
+    for folder_path in folders:
+        cases.append((u"open_folder", folder_path))
+        cases.append((u"list_folder", folder_path))
+    cases.append((u"update_view", folders[-1]))
+
+    results = []
+    for name, fixture in cases:
+        if (options.only and name not in options.only):
+            continue
+
+        result = run_case(name, fixture, options.repeat)
+        results.append(result)
+        print(_result_description(result))
+
+    report = {
+        u"commit": _git_commit(),
+        u"date": time.strftime(u"%Y-%m-%dT%H:%M:%S"),
+        u"python": platform.python_version(),
+        u"platform": platform.platform(),
+        u"repeat": options.repeat,
+        u"results": results,
+    }
+    with open(options.output, 'w') as file:
+        json.dump(report, file, indent=2, sort_keys=True)
+    print(u"Resultados guardados en " + options.output)
+
+    if (options.compare is not None):
+        with open(options.compare) as file:
+            compare_results(json.load(file), report)
+
+
+def _parse_arguments(argv):
+    """
+    Devuelve las opciones (objeto argparse.Namespace) de la lista de
+    argumentos argv.
+    """
+    parser = argparse.ArgumentParser(
+        description=u"Pruebas de rendimiento del editor de texto.")
+    parser.add_argument(
+        u"--full", action=u"store_true",
+        help=u"incluye los ficheros y carpetas más grandes (2 GB, 500.000 "
+             u"ficheros)")
+    parser.add_argument(
+        u"--repeat", type=int, default=5,
+        help=u"número de veces que se repite cada medida")
+    parser.add_argument(
+        u"--only", action=u"append",
+        choices=[u"open_file", u"save_file", u"open_folder", u"list_folder",
+                 u"update_view"],
+        help=u"ejecuta solo esta prueba (puede repetirse)")
+    parser.add_argument(
+        u"--fixtures",
+        default=os.path.join(tempfile.gettempdir(),
+                             u"text_editor_benchmark_fixtures"),
+        help=u"carpeta de los ficheros de prueba (se reutilizan entre "
+             u"ejecuciones)")
+    parser.add_argument(
+        u"--output", default=u"benchmark_results.json",
+        help=u"fichero JSON en el que se guardan los resultados")
+    parser.add_argument(
+        u"--compare", metavar=u"JSON",
+        help=u"resultados anteriores con los que se comparan los nuevos")
+
+    return parser.parse_args(argv)
+
+
+def make_text_file(fixtures_path, name, size, encoding=u"utf-8", bom=b"",
+                   newline=u"\n"):
+    """
+    Genera (si no existe ya) un fichero de texto de prueba.
+
+    Argumentos:
+        fixtures_path: String con la ruta a la carpeta de pruebas.
+        name: String con el nombre del formato del fichero.
+        size: Tamaño aproximado del fichero en bytes.
+        encoding: String con la codificación del texto.
+        bom: Bytes de la marca de orden de bytes.
+        newline: String con el salto de línea.
+
+    Devuelve:
+        String con la ruta al fichero.
+    """
+    file_path = os.path.join(fixtures_path, u"%s_%s.txt" % (name,
+                                                           _size_name(size)))
+    if (os.path.exists(file_path)):
+        return file_path
+
+    # Generamos un bloque de texto (de 1 MB como mucho) y lo repetimos hasta
+    # llegar al tamaño pedido.
+    block = _random_text(min(size, MB), newline).encode(encoding)
+    partial_path = file_path + u".part"
+    with open(partial_path, 'wb') as file:
+        file.write(bom)
+        written = len(bom)
+        while (written < size):
+            chunk = block[:size - written]
+            if (len(chunk) < len(block)):
+                # No cortamos un carácter multibyte por la mitad.
+                chunk = chunk.decode(encoding, 'ignore').encode(encoding)
+                if (not chunk):
+                    break
+            file.write(chunk)
+            written += len(chunk)
+    os.rename(partial_path, file_path)
+
+    return file_path
+
+
+def _random_text(size, newline):
+    """
+    Devuelve un string unicode de unos size caracteres con líneas de
+    palabras generadas al azar (siempre las mismas) separadas por newline.
+    """
+    generator = random.Random(SEED)
+    lines = []
+    length = 0
+
+    while (length < size):
+        line = u" ".join(generator.choice(_WORDS)
+                         for _ in range(generator.randint(0, 16)))
+        lines.append(line)
+        length += len(line) + len(newline)
+
+    return newline.join(lines) + newline
+
+
+def make_folder(fixtures_path, count):
+    """
+    Genera (si no existe ya) una carpeta de prueba con count ficheros vacíos
+    (algunos de ellos ocultos).
+
+    Devuelve:
+        String con la ruta a la carpeta.
+    """
+    folder_path = os.path.join(fixtures_path, u"folder_%d" % count)
+    if (os.path.isdir(folder_path)):
+        return folder_path
+
+    partial_path = folder_path + u".part"
+    if (os.path.isdir(partial_path)):
+        shutil.rmtree(partial_path)
+    os.makedirs(partial_path)
+
+    for i in range(count):
+        name = u".hidden_%07d" % i if i % 10 == 0 else u"file_%07d.txt" % i
+        open(os.path.join(partial_path, name), 'wb').close()
+    os.rename(partial_path, folder_path)
+
+    return folder_path
+
+
+def run_case(name, fixture, repeat):
+    """
+    Ejecuta la prueba name con el fichero o carpeta de prueba fixture en un
+    proceso nuevo.
+
+    Devuelve:
+        Diccionario con el resultado de la prueba (ver _run_case_process).
+    """
+    pool = multiprocessing.Pool(1)
+    try:
+        return pool.apply(_run_case_process, (name, fixture, repeat))
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def _run_case_process(name, fixture, repeat):
+    """
+    Ejecuta la prueba name (en su propio proceso).
+
+    Devuelve:
+        Diccionario con el nombre de la prueba, el fichero o carpeta de
+        prueba, su tamaño, los tiempos de cada repetición (en segundos), el
+        mejor tiempo, la mediana, la memoria máxima del proceso (en KB) y, si
+        no se ha podido ejecutar, el motivo.
+    """
+    result = {
+        u"name": name,
+        u"fixture": os.path.basename(fixture),
+        u"size": _fixture_size(fixture),
+        u"times": [],
+    }
+
+    try:
+        times = _CASES[name](fixture, repeat)
+    except _Skipped as skipped:
+        result[u"skipped"] = unicode(skipped)
+    else:
+        result[u"times"] = times
+        result[u"best"] = min(times)
+        result[u"median"] = sorted(times)[len(times) // 2]
+
+    result[u"peak_rss_kb"] = _peak_rss_kb()
+    return result
+
+
+class _Skipped(Exception):
+    """
+    Excepción _Skipped: Se lanza cuando una prueba no puede ejecutarse (por
+    ejemplo, si falta PyQt4).
+    """
+    pass
+
+
+def _new_model():
+    """
+    Devuelve un modelo del editor sin diario de ediciones.
+    """
+    from text_editor_model import TextEditorModel
+
+    model = TextEditorModel()
+    model.journal = None
+    model.crawl_project = False
+    return model
+
+
+def _time_calls(function, repeat, setup=None):
+    """
+    Devuelve la lista con el tiempo (en segundos) de repeat llamadas a la
+    función function (llamando antes a setup, si se indica, sin medirla).
+    """
+    times = []
+    for _ in range(repeat):
+        if (setup is not None):
+            setup()
+        start = timeit.default_timer()
+        function()
+        times.append(timeit.default_timer() - start)
+    return times
+
+
+def _bench_open_file(file_path, repeat):
+    """
+    Mide TextEditorModel.open_file con el fichero file_path.
+    """
+    model = _new_model()
+
+    def open_file():
+        model.open_file(file_path)
+
+    return _time_calls(open_file, repeat,
+                       lambda: model.close_document(file_path))
+
+
+def _bench_save_file(file_path, repeat):
+    """
+    Mide TextEditorModel.save_file del fichero file_path (guardándolo en una
+    copia, con el formato con el que se leyó).
+    """
+    model = _new_model()
+    model.open_file(file_path)
+    if (model.is_read_only()):
+        raise _Skipped(u"fichero de solo lectura (demasiado grande)")
+
+    # El editor guarda desde una copia del documento (PieceTable.snapshot)
+    # tomada después de editarlo, así que se comprueba que tiene su mismo
+    # texto.
+    document = model.opened_file_data
+    document.insert(len(document) // 2, u"editado\n")
+    document.delete(0, 1)
+    if (document.snapshot().get_text() != document.get_text()):
+        raise AssertionError(u"La copia del documento no coincide con él")
+
+    copy_path = file_path + u".saved"
+    try:
+        return _time_calls(lambda: model.save_file(copy_path), repeat)
+    finally:
+        if (os.path.exists(copy_path)):
+            os.remove(copy_path)
+
+
+def _bench_open_folder(folder_path, repeat):
+    """
+    Mide TextEditorModel.open_folder con la carpeta folder_path.
+    """
+    model = _new_model()
+    return _time_calls(lambda: model.open_folder(folder_path), repeat)
+
+
+def _bench_list_folder(folder_path, repeat):
+    """
+    Mide el listado de los ficheros no ocultos de la carpeta folder_path
+    (FolderIndex.refresh, que sustituye a _list_not_hidden_files).
+    """
+    from text_editor_folder import FolderIndex
+
+    return _time_calls(lambda: FolderIndex(folder_path).refresh(), repeat)
+
+
+def _bench_update_view(folder_path, repeat):
+    """
+    Mide TextEditorController._update_view con la carpeta folder_path
+    abierta y un fichero de texto abierto, sin mostrar la ventana.
+    """
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    try:
+        from PyQt4 import QtGui
+        from text_editor_view import TextEditorView
+        from text_editor_controller import TextEditorController
+    except ImportError as error:
+        raise _Skipped(u"no se puede importar PyQt4: " + unicode(error))
+
+    try:
+        app = QtGui.QApplication([sys.argv[0]])
+    except RuntimeError as error:
+        raise _Skipped(u"no se puede crear la aplicación de Qt: " +
+                       unicode(error))
+
+    # El controlador abre la carpeta actual al iniciarse.
+    os.chdir(folder_path)
+    model = _new_model()
+    view = TextEditorView()
+    view.show = lambda: None
+    controller = TextEditorController(model, view)
+
+    fixture_file = os.path.join(os.path.dirname(folder_path),
+                                u"utf8_%s.txt" % _size_name(MB))
+    if (os.path.exists(fixture_file)):
+        model.open_file(fixture_file)
+
+    def update_view():
+        controller._update_view()
+        app.processEvents()
+
+    return _time_calls(update_view, repeat)
+
+
+_CASES = {
+    u"open_file": _bench_open_file,
+    u"save_file": _bench_save_file,
+    u"open_folder": _bench_open_folder,
+    u"list_folder": _bench_list_folder,
+    u"update_view": _bench_update_view,
+}
+
+
+def compare_results(old_report, new_report):
+    """
+    Muestra la variación del mejor tiempo de cada prueba entre los
+    resultados old_report y new_report (diccionarios leídos del JSON).
+    """
+    old_best = dict(((result[u"name"], result[u"fixture"]), result[u"best"])
+                    for result in old_report[u"results"] if u"best" in result)
+
+    print(u"Comparación con el commit %s:" % old_report.get(u"commit"))
+    for result in new_report[u"results"]:
+        key = (result[u"name"], result[u"fixture"])
+        if (key not in old_best or u"best" not in result):
+            continue
+
+        ratio = result[u"best"] / old_best[key] if old_best[key] else 1.0
+        print(u"  %-12s %-22s %9.4f s -> %9.4f s (x%.2f)" % (
+            key[0], key[1], old_best[key], result[u"best"], ratio))
+
+
+def _result_description(result):
+    """
+    Devuelve un string con el resumen del resultado result de una prueba.
+    """
+    description = u"%-12s %-22s" % (result[u"name"], result[u"fixture"])
+    if (u"skipped" in result):
+        return description + u" omitida: " + result[u"skipped"]
+
+    return description + u" mejor %9.4f s, mediana %9.4f s, RSS %d KB" % (
+        result[u"best"], result[u"median"], result[u"peak_rss_kb"] or 0)
+
+
+def _fixture_size(fixture):
+    """
+    Devuelve el tamaño en bytes del fichero de prueba fixture o el número de
+    entradas de la carpeta de prueba fixture.
+    """
+    if (os.path.isdir(fixture)):
+        return len(os.listdir(fixture))
+    return os.path.getsize(fixture)
+
+
+def _size_name(size):
+    """
+    Devuelve un string con el tamaño size en la unidad más grande posible
+    (por ejemplo, u"64MB").
+    """
+    for unit, name in ((GB, u"GB"), (MB, u"MB"), (KB, u"KB")):
+        if (size >= unit and size % unit == 0):
+            return u"%d%s" % (size // unit, name)
+    return u"%dB" % size
+
+
+def _peak_rss_kb():
+    """
+    Devuelve la memoria máxima (RSS) usada por el proceso en KB (o None si
+    no se puede medir).
+    """
+    if (resource is None):
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Mac OS X la da en bytes; Linux, en KB.
+    if (sys.platform == "darwin"):
+        peak //= 1024
+    return peak
+
+
+def _git_commit():
+    """
+    Devuelve el hash del commit actual del repositorio (o None si no se
+    puede obtener).
+    """
+    try:
+        output = subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], cwd=SOURCE_FOLDER,
+            stderr=open(os.devnull, 'w'))
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return output.decode('ascii').strip()
+
+
+if __name__ == "__main__":
+    """
+    Función principal: Ejecuta las pruebas de rendimiento.
+    """
+    main()
@@ -11,18 +11,26 @@ Editor de ficheros de texto que permite abrir una carpeta y mostrar los ficheros
 dentro de ella en un panel lateral para poder abrirlos fácilmente con tan solo
 hacer click sobre uno de ellos.
 
-El programa mostrará un mensaje emergente cada vez que un fichero se guarda en
-memoria satisfactoriamente o cuando sucede algún error. Además, antes de abrir
-un nuevo fichero se comprobará si el usuario ha hecho cambios en el fichero
-abierto y, en caso afirmativo, se le avisará de que perderá dichos cambios y se
-le permitirá cancelar la operación.
+El programa mostrará un aviso, sin bloquear la ventana, cada vez que un fichero
+se guarda en memoria satisfactoriamente o cuando sucede algún error (los
+errores quedan además en un registro). Además, antes de abrir un nuevo fichero
+se comprobará si el usuario ha hecho cambios en el fichero abierto y, en caso
+afirmativo, se le avisará de que perderá dichos cambios y se le permitirá
+cancelar la operación.
 
 Autor: Andrés Salinas Lima <i52salia@uco.es>.
 """
 
+import timeit
+
+# Instante en el que empieza el programa, para medir cuánto tarda en mostrarse
+# la ventana (incluida la importación de los módulos).
+_START_TIME = timeit.default_timer()
+
 from text_editor_model import TextEditorModel
 from text_editor_view import TextEditorView
 from text_editor_controller import TextEditorController
+from text_editor_trace import tracer
 import sys
 from PyQt4 import QtGui
 
@@ -37,6 +45,10 @@ class TextEditor():
 
         controller = TextEditorController(TextEditorModel(), TextEditorView())
 
+        if (tracer is not None):
+            tracer.add_timing(u"startup.window_shown", _START_TIME,
+                              timeit.default_timer() - _START_TIME)
+
         sys.exit(app.exec_())
 
 
@@ -0,0 +1,435 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Módulo con la estructura de datos que almacena el documento abierto en el
+editor de texto.
+
+Autor: Andrés Salinas Lima <i52salia@uco.es>.
+"""
+
+from __future__ import print_function
+from array import array
+from bisect import bisect_left, bisect_right
+import sys
+
+
+# Tamaño máximo (en caracteres) de cada trozo del buffer de añadidos. Mientras
+# no se supere, el texto escrito de forma consecutiva se acumula en el mismo
+# trozo para no multiplicar el número de piezas.
+_ADD_CHUNK_SIZE = 4096
+
+# Índice del buffer original dentro de la lista de buffers.
+_ORIGINAL = 0
+
+
+class PieceTable():
+    """
+    Clase PieceTable: Documento de texto representado como una tabla de piezas.
+
+    El texto original del fichero se guarda en un buffer de solo lectura que
+    nunca se copia ni se modifica; las inserciones se añaden a un buffer de
+    añadidos y el documento es la secuencia de piezas (trozos de uno u otro
+    buffer) que se recorren en orden. Insertar o borrar solo divide o recorta
+    piezas, sin copiar el resto del documento.
+
+    La búsqueda de la pieza que contiene una posición o una línea se hace por
+    búsqueda binaria sobre los desplazamientos acumulados de las piezas, y el
+    buffer original lleva un índice con el comienzo de cada línea. Tras una
+    modificación, el cambio de los desplazamientos de las piezas siguientes
+    no se aplica una a una, sino que queda pendiente a partir de una pieza;
+    la siguiente modificación solo actualiza las piezas que hay entre ella y
+    la anterior, así que editar siempre en la misma zona no depende del
+    número de piezas.
+
+    Argumentos:
+        text: String unicode con el contenido inicial del documento.
+        line_starts: array con la posición de comienzo de cada línea de text
+            si ya se conoce, por ejemplo del índice de contenido (opcional;
+            si no se indica, se calcula con index_lines).
+
+    Atributos:
+        line_count: Número de líneas del documento.
+    """
+
+    def __init__(self, text=u"", line_starts=None):
+        self._buffers = [text]
+        self._original_lines = (index_lines(text) if line_starts is None
+                                else line_starts)
+
+        # Cada pieza es una lista [buffer, inicio, longitud, saltos de línea].
+        self._pieces = []
+        if (text):
+            self._pieces.append([_ORIGINAL, 0, len(text),
+                                 len(self._original_lines) - 1])
+
+        self._length = len(text)
+
+        # Desplazamientos y saltos de línea acumulados antes de cada pieza. A
+        # los de las piezas a partir de _shift_index les falta sumar
+        # _shift_length y _shift_newlines (ver _shift).
+        self._offsets = [0] * len(self._pieces)
+        self._newlines = [0] * len(self._pieces)
+        self._shift_index = 0
+        self._shift_length = 0
+        self._shift_newlines = 0
+
+    def __len__(self):
+        return self._length
+
+    def __unicode__(self):
+        return self.get_text()
+
+    def __eq__(self, other):
+        if (len(self) != len(other)):
+            return False
+        if (isinstance(other, PieceTable)):
+            other = other.get_text()
+        return self.get_text() == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    @property
+    def line_count(self):
+        return self._newlines_before(len(self._pieces)) + 1
+
+    def insert(self, position, text):
+        """
+        Inserta el string unicode text en la posición indicada en el argumento
+        position.
+        """
+        if (not text):
+            return
+        if (position < 0 or position > self._length):
+            raise IndexError(u"Posición fuera del documento")
+
+        buffer, start = self._append(text)
+        index = self._split(position)
+        newlines = text.count(u"\n")
+        self._length += len(text)
+
+        # Si la pieza anterior termina justo donde empieza el texto añadido,
+        # simplemente la alargamos.
+        if (index > 0):
+            previous = self._pieces[index - 1]
+            if (previous[0] == buffer and
+                    previous[1] + previous[2] == start):
+                previous[2] += len(text)
+                previous[3] += newlines
+                self._shift(index, len(text), newlines)
+                return
+
+        self._insert_piece(index, [buffer, start, len(text), newlines],
+                           position, self._newlines_before(index))
+        self._shift(index + 1, len(text), newlines)
+
+    def delete(self, position, count):
+        """
+        Borra count caracteres a partir de la posición indicada en el argumento
+        position.
+        """
+        count = min(count, self._length - position)
+        if (count <= 0):
+            return
+        if (position < 0):
+            raise IndexError(u"Posición fuera del documento")
+
+        first = self._split(position)
+        last = self._split(position + count)
+        newlines = sum(piece[3] for piece in self._pieces[first:last])
+
+        del self._pieces[first:last]
+        del self._offsets[first:last]
+        del self._newlines[first:last]
+        if (self._shift_index >= last):
+            self._shift_index -= last - first
+        elif (self._shift_index > first):
+            self._shift_index = first
+
+        self._length -= count
+        self._shift(first, -count, -newlines)
+
+    def snapshot(self):
+        """
+        Devuelve una copia del documento que no se ve afectada por las
+        modificaciones posteriores (por ejemplo, para guardarlo desde otro
+        hilo mientras el usuario sigue escribiendo).
+
+        Los buffers de texto no se copian, solo la lista de piezas.
+        """
+        copy = PieceTable()
+        copy._buffers = list(self._buffers)
+        copy._original_lines = self._original_lines
+        copy._pieces = [list(piece) for piece in self._pieces]
+        copy._length = self._length
+        copy._offsets = list(self._offsets)
+        copy._newlines = list(self._newlines)
+        copy._shift_index = self._shift_index
+        copy._shift_length = self._shift_length
+        copy._shift_newlines = self._shift_newlines
+
+        return copy
+
+    def set_text(self, text):
+        """
+        Sustituye todo el contenido del documento por el string unicode text,
+        que pasa a ser el nuevo buffer original.
+        """
+        self.__init__(text)
+
+    def get_text(self, start=0, end=None):
+        """
+        Devuelve un string unicode con el texto entre las posiciones start y
+        end (por defecto, el documento completo).
+        """
+        return u"".join(self.iter_chunks(start, end))
+
+    def iter_chunks(self, start=0, end=None):
+        """
+        Generador que recorre el texto entre las posiciones start y end
+        devolviendo el contenido de cada pieza sin construir el documento
+        completo en memoria.
+        """
+        if (end is None or end > self._length):
+            end = self._length
+        if (start >= end):
+            return
+
+        index = self._piece_at(start)
+        offset = self._offset(index)
+
+        while (index < len(self._pieces) and offset < end):
+            buffer, piece_start, length, _ = self._pieces[index]
+
+            chunk_start = piece_start + max(0, start - offset)
+            chunk_end = piece_start + min(length, end - offset)
+            yield self._buffers[buffer][chunk_start:chunk_end]
+
+            index += 1
+            offset += length
+
+    def line_start(self, line):
+        """
+        Devuelve la posición en la que empieza la línea indicada en el
+        argumento line (empezando a contar desde 0).
+        """
+        if (line <= 0):
+            return 0
+        if (line >= self.line_count):
+            raise IndexError(u"Línea fuera del documento")
+
+        # Buscamos la pieza que contiene el salto de línea número line.
+        index = self._piece_with_newline(line)
+        buffer, start, length, _ = self._pieces[index]
+        newline = self._nth_newline(buffer, start,
+                                    line - self._newlines_before(index))
+
+        return self._offset(index) + newline - start + 1
+
+    def line_at(self, position):
+        """
+        Devuelve el número de la línea (empezando a contar desde 0) que
+        contiene la posición indicada en el argumento position.
+        """
+        if (position <= 0 or not self._pieces):
+            return 0
+
+        position = min(position, self._length)
+        index = self._piece_at(position - 1)
+        buffer, start, _, _ = self._pieces[index]
+
+        return self._newlines_before(index) + self._count_newlines(
+            buffer, start, start + position - self._offset(index))
+
+    def line(self, line):
+        """
+        Devuelve un string unicode con el contenido de la línea indicada en el
+        argumento line (sin el salto de línea final).
+        """
+        start = self.line_start(line)
+        if (line + 1 < self.line_count):
+            end = self.line_start(line + 1) - 1
+        else:
+            end = self._length
+
+        return self.get_text(start, end)
+
+    def _append(self, text):
+        """
+        Añade el string unicode text al buffer de añadidos.
+
+        Devuelve:
+            Tupla (buffer, inicio) con la ubicación del texto añadido.
+        """
+        last = len(self._buffers) - 1
+        if (last != _ORIGINAL and
+                len(self._buffers[last]) + len(text) <= _ADD_CHUNK_SIZE):
+            start = len(self._buffers[last])
+            self._buffers[last] += text
+            return (last, start)
+
+        self._buffers.append(text)
+        return (len(self._buffers) - 1, 0)
+
+    def _split(self, position):
+        """
+        Divide (si hace falta) la pieza que contiene la posición indicada en el
+        argumento position para que una pieza empiece justo en ella.
+
+        Devuelve:
+            Índice de la pieza que empieza en la posición position (o el
+            número de piezas si position es el final del documento).
+        """
+        index = self._piece_at(position)
+        if (index < 0 or index >= len(self._pieces)):
+            return len(self._pieces)
+
+        offset = position - self._offset(index)
+        if (offset == 0):
+            return index
+
+        buffer, start, length, newlines = self._pieces[index]
+        if (offset >= length):
+            return index + 1
+
+        left_newlines = self._count_newlines(buffer, start, start + offset)
+        self._pieces[index] = [buffer, start, offset, left_newlines]
+
+        # Los desplazamientos de las piezas siguientes no cambian, así que
+        # basta con insertar el de la nueva pieza.
+        self._insert_piece(index + 1, [buffer, start + offset,
+                                       length - offset,
+                                       newlines - left_newlines],
+                           position,
+                           self._newlines_before(index) + left_newlines)
+
+        return index + 1
+
+    def _insert_piece(self, index, piece, offset, newlines):
+        """
+        Inserta la pieza piece en la posición index de la lista de piezas,
+        con el desplazamiento offset y los saltos de línea acumulados
+        newlines indicados. No cambia los de las piezas siguientes.
+        """
+        self._pieces.insert(index, piece)
+        if (index < self._shift_index):
+            self._shift_index += 1
+        else:
+            offset -= self._shift_length
+            newlines -= self._shift_newlines
+        self._offsets.insert(index, offset)
+        self._newlines.insert(index, newlines)
+
+    def _shift(self, index, length, newlines):
+        """
+        Suma length al desplazamiento y newlines a los saltos de línea
+        acumulados de las piezas a partir de la que está en la posición index.
+
+        El cambio queda pendiente a partir de esa pieza; solo se aplican los
+        cambios pendientes de las piezas que hay entre ella y la pieza a
+        partir de la que estaban pendientes hasta ahora.
+        """
+        if (self._shift_length or self._shift_newlines):
+            for i in range(index, self._shift_index):
+                self._offsets[i] -= self._shift_length
+                self._newlines[i] -= self._shift_newlines
+            for i in range(self._shift_index, index):
+                self._offsets[i] += self._shift_length
+                self._newlines[i] += self._shift_newlines
+
+        self._shift_index = index
+        self._shift_length += length
+        self._shift_newlines += newlines
+
+    def _offset(self, index):
+        """
+        Devuelve el desplazamiento de la pieza que está en la posición index.
+        """
+        if (index < self._shift_index):
+            return self._offsets[index]
+        return self._offsets[index] + self._shift_length
+
+    def _newlines_before(self, index):
+        """
+        Devuelve el número de saltos de línea que hay antes de la pieza que
+        está en la posición index (o en todo el documento si index es el
+        número de piezas).
+        """
+        if (index == len(self._pieces)):
+            if (not self._pieces):
+                return 0
+            return self._newlines_before(index - 1) + self._pieces[-1][3]
+        if (index < self._shift_index):
+            return self._newlines[index]
+        return self._newlines[index] + self._shift_newlines
+
+    def _piece_at(self, position):
+        """
+        Devuelve el índice de la pieza que contiene la posición indicada en el
+        argumento position (el de la última pieza que empieza en ella o
+        antes).
+        """
+        split = self._shift_index
+        if (split < len(self._offsets) and
+                self._offsets[split] + self._shift_length <= position):
+            return bisect_right(self._offsets,
+                                position - self._shift_length, split) - 1
+        return bisect_right(self._offsets, position, 0, split) - 1
+
+    def _piece_with_newline(self, line):
+        """
+        Devuelve el índice de la pieza que contiene el salto de línea número
+        line (empezando a contar desde 1).
+        """
+        split = self._shift_index
+        if (split < len(self._newlines) and
+                self._newlines[split] + self._shift_newlines < line):
+            return bisect_left(self._newlines,
+                               line - self._shift_newlines, split) - 1
+        return bisect_left(self._newlines, line, 0, split) - 1
+
+    def _count_newlines(self, buffer, start, end):
+        """
+        Devuelve el número de saltos de línea entre las posiciones start y end
+        del buffer indicado.
+        """
+        if (buffer == _ORIGINAL):
+            return (bisect_left(self._original_lines, end + 1) -
+                    bisect_left(self._original_lines, start + 1))
+        return self._buffers[buffer].count(u"\n", start, end)
+
+    def _nth_newline(self, buffer, start, n):
+        """
+        Devuelve la posición dentro del buffer indicado del salto de línea
+        número n (empezando a contar desde 1) a partir de la posición start.
+        """
+        if (buffer == _ORIGINAL):
+            first = bisect_left(self._original_lines, start + 1)
+            return self._original_lines[first + n - 1] - 1
+
+        position = start - 1
+        for _ in range(n):
+            position = self._buffers[buffer].index(u"\n", position + 1)
+        return position
+
+
+def index_lines(text):
+    """
+    Devuelve un array con la posición de comienzo de cada línea del string
+    unicode text.
+    """
+    index = array('l', [0])
+    position = text.find(u"\n")
+    while (position != -1):
+        index.append(position + 1)
+        position = text.find(u"\n", position + 1)
+
+    return index
+
+
+if __name__ == "__main__":
+    """
+    En caso de que intentemos ejecutar este módulo.
+    """
+    print(u"Este módulo no puede ser ejecutado", file=sys.stderr)
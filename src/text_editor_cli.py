@@ -0,0 +1,291 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Módulo con el modo por lotes (línea de órdenes) del editor de texto.
+
+Abre varios ficheros con el modelo del editor (sin cargar PyQt4 ni
+necesitar una pantalla), les aplica las transformaciones indicadas
+(reemplazos y cambios de codificación o de saltos de línea) y los vuelve a
+guardar. Los ficheros se reparten entre varios procesos.
+
+Ejemplos:
+    python text_editor_cli.py *.txt
+        Muestra la codificación y los saltos de línea de cada fichero.
+    python text_editor_cli.py --encoding utf-8 --newline lf *.txt
+        Convierte los ficheros a UTF-8 con saltos de línea LF.
+    python text_editor_cli.py --replace "v(\\d+)" "version \\1" --regex *.py
+        Reemplaza texto en todos los ficheros.
+
+Autor: Andrés Salinas Lima <i52salia@uco.es>.
+"""
+
+from __future__ import print_function
+from text_editor_model import TextEditorModel, TextEditorError
+from text_editor_io import TextFormat
+import argparse
+import codecs
+import multiprocessing
+import re
+import sys
+
+
+# Saltos de línea que se pueden elegir con --newline.
+NEWLINES = {u"lf": u"\n", u"crlf": u"\r\n", u"cr": u"\r"}
+
+# Modelo del editor de cada proceso (se crea al iniciar el proceso).
+_model = None
+
+
+def main(argv=None):
+    """
+    Función principal del modo por lotes.
+
+    Argumentos:
+        argv: Lista con los argumentos de la línea de órdenes (por defecto,
+            sys.argv[1:]).
+
+    Devuelve:
+        Código de salida: 0 si todos los ficheros se han procesado bien y 1
+        en caso contrario.
+    """
+    # En Python 2 la salida no tiene codificación si no es una terminal (por
+    # ejemplo, al redirigirla a un fichero). Se ajusta antes de leer los
+    # argumentos, porque la ayuda y los errores de argparse también se
+    # escriben en ella.
+    if (sys.stdout.encoding is None):
+        sys.stdout = codecs.getwriter('utf-8')(sys.stdout)
+    if (sys.stderr.encoding is None):
+        sys.stderr = codecs.getwriter('utf-8')(sys.stderr)
+
+    options = _parse_arguments(argv)
+
+    encoding = sys.getfilesystemencoding()
+    options.replace = [(_decode_argument(query, encoding),
+                        _decode_argument(replacement, encoding))
+                       for query, replacement in options.replace]
+
+    if (options.regex):
+        try:
+            for query, _ in options.replace:
+                re.compile(query)
+        except re.error as error:
+            print(u"Expresión regular no válida: " + unicode(error),
+                  file=sys.stderr)
+            return 1
+
+    if (options.encoding is not None):
+        try:
+            codecs.lookup(options.encoding)
+        except LookupError:
+            print(u"Codificación desconocida: " + options.encoding,
+                  file=sys.stderr)
+            return 1
+
+    tasks = [(_decode_argument(path, encoding), options)
+             for path in options.files]
+
+    # Con un solo fichero (o un solo proceso) no merece la pena crear
+    # procesos.
+    if (len(tasks) == 1 or options.processes == 1):
+        _init_process()
+        results = map(_process_file, tasks)
+        pool = None
+    else:
+        pool = multiprocessing.Pool(options.processes, _init_process)
+        results = pool.imap(_process_file, tasks)
+
+    failed = False
+    try:
+        for file_path, message, ok in results:
+            print(file_path + u": " + message,
+                  file=sys.stdout if ok else sys.stderr)
+            failed = failed or not ok
+    finally:
+        if (pool is not None):
+            pool.terminate()
+
+    return 1 if failed else 0
+
+
+def _parse_arguments(argv):
+    """
+    Devuelve las opciones (objeto argparse.Namespace) de la lista de
+    argumentos argv.
+    """
+    parser = argparse.ArgumentParser(
+        description=u"Abre, transforma y guarda varios ficheros de texto "
+                    u"sin interfaz gráfica. Sin transformaciones, solo "
+                    u"muestra el formato de cada fichero.")
+    parser.add_argument(
+        u"files", metavar=u"FICHERO", nargs=u"+",
+        help=u"ficheros que se procesan")
+    parser.add_argument(
+        u"--replace", nargs=2, action=u"append", default=[],
+        metavar=(u"TEXTO", u"REEMPLAZO"),
+        help=u"reemplaza TEXTO por REEMPLAZO (puede repetirse)")
+    parser.add_argument(
+        u"--regex", action=u"store_true",
+        help=u"interpreta TEXTO como una expresión regular")
+    parser.add_argument(
+        u"--ignore-case", action=u"store_true",
+        help=u"no distingue mayúsculas y minúsculas al buscar TEXTO")
+    parser.add_argument(
+        u"--encoding",
+        help=u"codificación con la que se guardan los ficheros")
+    parser.add_argument(
+        u"--newline", choices=sorted(NEWLINES),
+        help=u"saltos de línea con los que se guardan los ficheros")
+    parser.add_argument(
+        u"--bom", choices=[u"yes", u"no"],
+        help=u"guarda los ficheros con o sin marca de orden de bytes (BOM)")
+    parser.add_argument(
+        u"--fallback-encoding",
+        help=u"codificación con la que se leen los ficheros que no son UTF-8")
+    parser.add_argument(
+        u"--backup", action=u"store_true",
+        help=u"conserva una copia (~) de cada fichero modificado")
+    parser.add_argument(
+        u"--dry-run", action=u"store_true",
+        help=u"muestra los cambios que se harían sin guardar los ficheros")
+    parser.add_argument(
+        u"--processes", type=int, default=None,
+        help=u"número de procesos (por defecto, uno por procesador)")
+
+    return parser.parse_args(argv)
+
+
+def _decode_argument(argument, encoding):
+    """
+    Devuelve el argumento de la línea de órdenes argument como string
+    unicode (en Python 2 llega como bytes en la codificación encoding).
+    """
+    if (isinstance(argument, bytes)):
+        return argument.decode(encoding)
+    return argument
+
+
+def _init_process():
+    """
+    Crea el modelo del editor del proceso. Los cambios por lotes se guardan
+    directamente, así que no se anotan en el diario de ediciones.
+    """
+    global _model
+
+    _model = TextEditorModel()
+    _model.journal = None
+    _model.crawl_project = False
+
+
+def _process_file(task):
+    """
+    Procesa un fichero (en un proceso de trabajo).
+
+    Argumentos:
+        task: Tupla (ruta, opciones) con la ruta al fichero y las opciones
+            de la línea de órdenes.
+
+    Devuelve:
+        Tupla (ruta, mensaje, correcto) con la ruta al fichero, un mensaje
+        con el resultado y True si se ha procesado bien.
+    """
+    file_path, options = task
+    model = _model
+
+    if (options.fallback_encoding is not None):
+        model.fallback_encoding = options.fallback_encoding
+    model.keep_backup = options.backup
+
+    try:
+        model.open_file(file_path)
+
+        if (model.is_read_only()):
+            return (file_path, u"se omite (fichero binario o demasiado "
+                               u"grande para editarlo)", True)
+
+        old_format = model.opened_file_format
+        new_format = _target_format(old_format, options)
+
+        replacements = 0
+        for query, replacement in options.replace:
+            change = model.replace_all(query, replacement, options.regex,
+                                       options.ignore_case)
+            if (change is not None):
+                start, end, new_text, count = change
+                model.delete_text(start, end - start)
+                model.insert_text(start, new_text)
+                replacements += count
+
+        if (not options.replace and new_format is None):
+            return (file_path, _format_description(old_format), True)
+
+        changed_format = (new_format is not None and
+                          _format_description(new_format) !=
+                          _format_description(old_format))
+        if (not replacements and not changed_format):
+            return (file_path, u"sin cambios", True)
+
+        message = u"%d reemplazos" % replacements
+        if (changed_format):
+            message += (u", " + _format_description(old_format) + u" -> " +
+                        _format_description(new_format))
+            model.opened_file_format = new_format
+
+        if (options.dry_run):
+            return (file_path, message + u" (no guardado)", True)
+
+        model.save_file(file_path)
+        return (file_path, message, True)
+    except TextEditorError as error:
+        return (file_path, unicode(error), False)
+    except (re.error, LookupError, UnicodeError) as error:
+        return (file_path, unicode(error), False)
+    finally:
+        # Liberamos el documento (y la proyección en memoria de los ficheros
+        # grandes) antes de pasar al siguiente fichero.
+        model.close_document(file_path)
+
+
+def _target_format(text_format, options):
+    """
+    Devuelve el formato (objeto TextFormat) con el que se guarda un fichero
+    leído con el formato text_format según las opciones de la línea de
+    órdenes (o None si no cambian el formato).
+    """
+    if (options.encoding is None and options.newline is None and
+            options.bom is None):
+        return None
+
+    encoding = text_format.encoding
+    if (options.encoding is not None):
+        encoding = codecs.lookup(options.encoding).name
+
+    bom = text_format.bom
+    if (options.bom is not None):
+        bom = options.bom == u"yes"
+
+    newline = text_format.newline
+    if (options.newline is not None):
+        newline = NEWLINES[options.newline]
+
+    return TextFormat(encoding, bom, newline)
+
+
+def _format_description(text_format):
+    """
+    Devuelve un string con la codificación y los saltos de línea del formato
+    text_format (objeto TextFormat).
+    """
+    names = dict((value, key.upper()) for key, value in NEWLINES.items())
+    description = text_format.encoding.upper()
+    if (text_format.bom):
+        description += u" con BOM"
+
+    return description + u", " + names[text_format.newline]
+
+
+if __name__ == "__main__":
+    """
+    Función principal: Ejecuta el modo por lotes.
+    """
+    sys.exit(main())
@@ -9,7 +9,22 @@ Autor: Andrés Salinas Lima <i52salia@uco.es>.
 
 from __future__ import print_function
 from text_editor_view import TextEditorDialogs
+from text_editor_model import FOLDER_OPENED, FOLDER_CHANGED
+from text_editor_model import FILE_OPENED, FILE_SAVED, PROJECT_FILES_FOUND
+from text_editor_model import DOCUMENT_SWITCHED, DOCUMENT_CLOSED
+from text_editor_model import DOCUMENT_EVICTED, TextEditorError
+from text_editor_workers import FileWorker, SearchWorker, HighlightWorker
+from text_editor_syntax import lexer_for
+from text_editor_session import Session, load_session, save_session
+from text_editor_watcher import FolderWatcher
+from text_editor_trace import traced, tracer, memory_usage, debug
+from text_editor_notifications import INFO, ERROR, NotificationQueue
+import re
+import time
 import sys
+import os
+import timeit
+from PyQt4 import QtCore
 from PyQt4 import QtGui
 
 
@@ -26,25 +41,152 @@ class TextEditorController():
         view: objeto de la clase TextEditorView.
     """
 
+    # Número de páginas de un fichero grande que se muestran a la vez en el
+    # editor (la página visible y sus vecinas).
+    _PAGE_WINDOW = 3
+
+    # Milisegundos entre las consultas al recorrido del proyecto en segundo
+    # plano.
+    _CRAWL_POLL_INTERVAL = 200
+
+    # Milisegundos entre las comprobaciones del bucle de eventos y retraso (en
+    # segundos) a partir del cual se considera que ha estado bloqueado.
+    _STALL_CHECK_INTERVAL = 50
+    _STALL_THRESHOLD = 0.1
+
+    # Milisegundos entre las actualizaciones de los tiempos y la memoria en
+    # la barra de estado (en modo depuración).
+    _PERFORMANCE_INTERVAL = 1000
+
     def __init__(self, model, view):
         self.model = model
         self.view = view
 
-        self._init_model()
+        # Estado de la ventana de páginas mostrada para los ficheros grandes.
+        self._first_page = 0
+        self._window_lengths = []
+        self._paging = False
+
+        # Documento del editor (QTextDocument) de cada documento del modelo que
+        # está en memoria, para cambiar de pestaña sin volver a rellenar el
+        # editor y conservando su historial de deshacer. Se guardan también
+        # la posición del cursor y del scroll de cada uno.
+        self._editor_documents = {}
+        self._view_states = {}
+        self._shown_path = None
+
+        # Indica que el editor se está rellenando con el contenido del modelo,
+        # por lo que sus cambios no deben reenviarse al modelo.
+        self._loading = False
+
+        # Operación de fichero en curso (objeto FileWorker) y operaciones
+        # canceladas que todavía no han terminado.
+        self._worker = None
+        self._worker_replaceable = True
+        self._workers = []
+
+        # Búsqueda en la carpeta en curso (objeto SearchWorker), búsquedas
+        # que todavía no han terminado y coincidencias encontradas.
+        self._search_worker = None
+        self._search_workers = []
+        self._search_match_count = 0
+
+        # Análisis del resaltado de sintaxis en segundo plano en curso (objeto
+        # HighlightWorker) y análisis cancelados que todavía no han terminado.
+        self._highlight_worker = None
+        self._highlight_workers = []
+
+        # Lectura de la carpeta en segundo plano en curso (objeto FileWorker),
+        # lecturas sustituidas que todavía no han terminado y si la carpeta
+        # ha cambiado mientras se leía.
+        self._folder_worker = None
+        self._folder_workers = []
+        self._folder_changed_while_loading = False
+
+        # Vigilante de cambios en la carpeta abierta.
+        self._folder_watcher = FolderWatcher()
+
+        # Temporizador para recoger los ficheros encontrados por el recorrido
+        # del proyecto en segundo plano.
+        self._crawl_timer = QtCore.QTimer()
+        self._crawl_timer.setInterval(self._CRAWL_POLL_INTERVAL)
+
+        # Avisos pendientes de mostrar. Se muestran desde un temporizador, de
+        # forma que los que llegan seguidos se juntan y la vista se actualiza
+        # una sola vez; si se repite el aviso que se está mostrando, basta
+        # con actualizar su contador.
+        self._notifications = NotificationQueue()
+        self._notification_timer = QtCore.QTimer()
+        self._notification_timer.setSingleShot(True)
+        self._notification_repeated = False
+        self._shown_error_count = 0
+
+        # Temporizadores de la instrumentación (solo si está activada): uno
+        # detecta los bloqueos del bucle de eventos (cuando salta con
+        # retraso) y otro muestra los tiempos en la barra de estado.
+        self._stall_timer = None
+        self._last_stall_check = None
+        self._performance_timer = None
+
+        # Sesión guardada al cerrar el programa la vez anterior (objeto
+        # Session, o None).
+        self._session = load_session()
+
+        # La ventana se muestra antes de leer nada del disco: el modelo se
+        # inicializa en cuanto arranca el bucle de eventos.
         self._init_view()
         self._init_controller()
+        QtCore.QTimer.singleShot(0, self._init_model)
 
     def _init_model(self):
         """
         Inicializa el modelo.
         """
         # El editor se abrirá con el directorio actual (.) cargado.
-        self.model.open_folder(".")
+        self._open_folder(".")
+
+        # Recuperamos los cambios sin guardar que quedaron en el diario de
+        # ediciones si el programa no se cerró correctamente. Los ficheros se
+        # leen en segundo plano; después se vuelve a abrir el fichero activo
+        # de la sesión anterior.
+        self._start_operation(
+            u"Recuperando los cambios sin guardar...",
+            self.model.load_recovered_documents,
+            self._documents_recovered,
+            u"No se pudieron recuperar los cambios sin guardar")
+
+    def _documents_recovered(self, loaded):
+        """
+        Indica al modelo los ficheros con cambios sin guardar leídos en
+        segundo plano (loaded, ver load_recovered_documents) para que les
+        aplique esos cambios, y vuelve a abrir el fichero activo de la sesión
+        anterior.
+        """
+        recovered = self.model.recover_documents(loaded)
+        if (recovered):
+            self.view.main_window.statusBar().showMessage(
+                u"Se han recuperado los cambios sin guardar de %d "
+                u"fichero(s)" % len(recovered), 5000)
+
+        self._restore_session_file()
+        self._session = None
 
     def _init_view(self):
         """
         Inicializa la vista.
+
+        Si la sesión anterior terminó en la carpeta actual, se muestra al
+        instante la lista de ficheros guardada, que se revalida cuando
+        termina de leerse la carpeta en segundo plano.
         """
+        session = self._session
+        if (session is not None and session.folder_path and
+                session.folder_files is not None and
+                os.path.abspath(session.folder_path) ==
+                os.path.abspath(u".")):
+            self.model.restore_folder(session.folder_path,
+                                      session.folder_files)
+
         self._update_view()
         self.view.show()
 
@@ -52,13 +194,52 @@ class TextEditorController():
         """
         Inicializa el controlador.
 
-        Conecta los botones y acciones de la vista con métodos del controlador.
+        Conecta los botones y acciones de la vista con métodos del controlador
+        y se registra como observador del modelo para actualizar solo las
+        partes de la vista afectadas por cada cambio.
         """
+        self._model_handlers = {
+            FOLDER_OPENED: self._show_opened_folder,
+            FOLDER_CHANGED: self._show_folder_changes,
+            FILE_OPENED: self._show_opened_file,
+            FILE_SAVED: self._show_saved_file,
+            PROJECT_FILES_FOUND: self._show_project_progress,
+            DOCUMENT_SWITCHED: self._show_switched_document,
+            DOCUMENT_CLOSED: self._show_closed_document,
+            DOCUMENT_EVICTED: self._forget_editor_document,
+        }
+        self.model.add_observer(self._model_changed)
+
         self.view.main_widget.refresh_button.clicked.connect(
             self._reload_folder)
 
-        self.view.main_widget.file_list.itemClicked.connect(
+        self.view.main_widget.file_list.clicked.connect(
             self._open_selected_file)
+        self.view.main_widget.project_tree.clicked.connect(
+            self._open_project_file)
+
+        self.view.main_widget.text_edit.verticalScrollBar().valueChanged.connect(
+            self._editor_scrolled)
+        self.view.main_widget.document_tabs.currentChanged.connect(
+            self._switch_document)
+        self.view.main_widget.document_tabs.tabCloseRequested.connect(
+            self._close_document)
+
+        self._folder_watcher.folder_changed.connect(self._folder_changed)
+        self._crawl_timer.timeout.connect(self._poll_project_crawl)
+        self._notification_timer.timeout.connect(self._show_notifications)
+
+        QtGui.qApp.aboutToQuit.connect(self._save_session)
+
+        if (tracer is not None):
+            self._start_instrumentation()
+
+        self.view.main_window.cancel_button.clicked.connect(
+            self._cancel_operation)
+        self.view.main_window.error_log_button.clicked.connect(
+            self.view.main_window.error_log_dock.show)
+        self.view.main_window.error_log_dock.clear_button.clicked.connect(
+            self._clear_error_log)
 
         self.view.main_window.exit_action.triggered.connect(
             QtGui.qApp.closeAllWindows)
@@ -66,30 +247,533 @@ class TextEditorController():
             self._open_file_dialog)
         self.view.main_window.open_folder_action.triggered.connect(
             self._open_folder_dialog)
+        self.view.main_window.quick_open_action.triggered.connect(
+            self.view.main_window.quick_open_dialog.open)
+        self.view.main_window.quick_open_dialog.search_edit.textEdited.connect(
+            self._quick_open_search)
+        self.view.main_window.quick_open_dialog.search_edit.returnPressed.connect(
+            self._quick_open_file)
+        self.view.main_window.quick_open_dialog.result_list.itemActivated.connect(
+            self._quick_open_file)
+        find_bar = self.view.main_widget.find_bar
+        self.view.main_window.find_action.triggered.connect(
+            self._show_find_bar)
+        self.view.main_window.find_next_action.triggered.connect(
+            self._find_next)
+        self.view.main_window.find_previous_action.triggered.connect(
+            self._find_previous)
+        find_bar.find_edit.textEdited.connect(self._find_incremental)
+        find_bar.find_edit.returnPressed.connect(self._find_next)
+        find_bar.next_button.clicked.connect(self._find_next)
+        find_bar.previous_button.clicked.connect(self._find_previous)
+        find_bar.replace_button.clicked.connect(self._replace_match)
+        find_bar.replace_all_button.clicked.connect(self._replace_all)
+        find_bar.close_button.clicked.connect(find_bar.hide)
+        self.view.main_window.search_folder_action.triggered.connect(
+            self.view.main_window.search_folder_dialog.open)
+        self.view.main_window.search_folder_dialog.search_edit.returnPressed.connect(
+            self._search_folder)
+        self.view.main_window.search_folder_dialog.result_list.itemActivated.connect(
+            self._open_search_match)
         self.view.main_window.save_file_action.triggered.connect(
             self._save_opened_file)
         self.view.main_window.save_as_action.triggered.connect(
             self._save_as_dialog)
 
+    @traced(u"controller._update_view")
     def _update_view(self):
         """
-        Actualiza la vista.
+        Actualiza la vista completa.
+
+        Solo se usa al iniciar el programa: el resto de cambios del modelo se
+        reflejan en la vista a través de _model_changed.
+        """
+        if (self.model.opened_folder_path):
+            self._show_opened_folder()
+        self._show_opened_file()
+
+    def _start_instrumentation(self):
+        """
+        Empieza a vigilar los bloqueos del bucle de eventos y, en modo
+        depuración, a mostrar los tiempos y la memoria en la barra de estado.
+        """
+        self._stall_timer = QtCore.QTimer()
+        self._stall_timer.setInterval(self._STALL_CHECK_INTERVAL)
+        self._stall_timer.timeout.connect(self._check_event_loop)
+        self._last_stall_check = timeit.default_timer()
+        self._stall_timer.start()
+
+        if (debug):
+            self.view.main_window.performance_label.show()
+            self._performance_timer = QtCore.QTimer()
+            self._performance_timer.setInterval(self._PERFORMANCE_INTERVAL)
+            self._performance_timer.timeout.connect(self._show_performance)
+            self._performance_timer.start()
+
+    def _check_event_loop(self):
+        """
+        Anota un bloqueo del bucle de eventos si el temporizador ha saltado
+        con más retraso del admitido (porque algo ha ocupado el hilo de la
+        interfaz).
+        """
+        now = timeit.default_timer()
+        delay = (now - self._last_stall_check -
+                 self._STALL_CHECK_INTERVAL / 1000.0)
+        self._last_stall_check = now
+
+        if (delay >= self._STALL_THRESHOLD):
+            tracer.add_timing(u"event_loop.stall", now - delay, delay)
+            tracer.count(u"event_loop.stalls")
+
+    def _show_performance(self):
+        """
+        Muestra en la barra de estado los tiempos de las últimas operaciones,
+        los bloqueos del bucle de eventos y la memoria usada.
+        """
+        timings, counters = tracer.snapshot()
+
+        def last_time(name):
+            timing = timings.get(name)
+            if (timing is None):
+                return u"-"
+            return u"%d ms" % (timing[u"last"] * 1000)
+
+        stall = timings.get(u"event_loop.stall")
+        current, peak = memory_usage()
+
+        text = u"Leer %s · Guardar %s · Carpeta %s · Bloqueos %d" % (
+            last_time(u"model.load_file"), last_time(u"model.write_file"),
+            last_time(u"model.load_folder"),
+            counters.get(u"event_loop.stalls", 0))
+        if (stall is not None):
+            text += u" (máx. %d ms)" % (stall[u"max"] * 1000)
+        if (current is not None or peak is not None):
+            text += u" · RSS %s MB (máx. %s MB)" % (
+                u"-" if current is None else current // 1024,
+                u"-" if peak is None else peak // 1024)
+
+        self.view.main_window.performance_label.setText(text)
+
+    def _poll_project_crawl(self):
+        """
+        Recoge los ficheros encontrados por el recorrido del proyecto en
+        segundo plano (y detiene el temporizador cuando termina).
+        """
+        if (not self.model.poll_project_crawl()):
+            self._crawl_timer.stop()
+
+    def _show_project_progress(self, files, done):
+        """
+        Muestra en la barra de estado el progreso del recorrido del proyecto.
+        """
+        if (done):
+            message = u"Proyecto indexado: %d ficheros"
+        else:
+            message = u"Indexando proyecto: %d ficheros..."
+
+        self.view.main_window.statusBar().showMessage(
+            message % len(self.model.project_files), 2000)
+
+    def _model_changed(self, event, *args):
+        """
+        Actualiza la parte de la vista afectada por el evento del modelo
+        indicado en el argumento event (con sus argumentos args).
+        """
+        self._model_handlers[event](*args)
+
+    @traced(u"controller._show_opened_folder")
+    def _show_opened_folder(self):
+        """
+        Muestra en la vista la carpeta abierta y su lista de ficheros.
         """
-        # Actualizamos las etiquetas.
-        self.view.main_widget.opened_file_label.setText(
-            self.model.opened_file_path)
         self.view.main_widget.opened_folder_label.setText(
             self.model.opened_folder_path)
 
-        # Actualizamos la lista de ficheros.
-        self.view.main_widget.file_list.clear()
-        self.view.main_widget.file_list.addItems(
+        # El modelo ya mantiene la lista ordenada alfabéticamente.
+        self.view.main_widget.file_list_model.set_files(
             self.model.opened_folder_files)
-        self.view.main_widget.file_list.sortItems()  # Ordena alfabéticamente.
 
-        # Actualizamos el editor
-        self.view.main_widget.text_edit.setText(
-            unicode(self.model.opened_file_data))
+        self._folder_watcher.watch(self.model.opened_folder_path)
+
+        # El árbol del proyecto carga cada carpeta al desplegarla, mientras el
+        # recorrido completo se hace en segundo plano.
+        self.view.main_widget.project_tree_model.set_root(
+            self.model.list_project_folder)
+        self.model.start_project_crawl()
+        self._crawl_timer.start()
+
+    def _show_folder_changes(self, added, removed):
+        """
+        Elimina de la lista de ficheros de la vista los ficheros de la lista
+        removed e inserta en su posición los de la lista added.
+        """
+        file_list_model = self.view.main_widget.file_list_model
+
+        for name in removed:
+            file_list_model.remove_file(name)
+
+        for name in added:
+            file_list_model.insert_file(name)
+
+    @traced(u"controller._show_opened_file")
+    def _show_opened_file(self):
+        """
+        Muestra en la vista la ruta y el contenido del fichero abierto (recién
+        leído), en un documento del editor nuevo.
+        """
+        self._view_states.pop(self.model.opened_file_path, None)
+        self._set_editor_document(self._new_editor_document())
+        self._fill_editor()
+        self._show_document_info()
+
+    @traced(u"controller._show_switched_document")
+    def _show_switched_document(self):
+        """
+        Muestra en la vista el documento activo tras cambiar de pestaña,
+        reutilizando su documento del editor si lo tiene.
+        """
+        path = self.model.opened_file_path
+        document = self._editor_documents.get(path)
+
+        if (document is None):
+            # El documento se había descargado de memoria.
+            self._set_editor_document(self._new_editor_document())
+            self._first_page = 0
+            self._fill_editor()
+        else:
+            self._set_editor_document(document)
+            self._restore_view_state(path)
+
+        self._show_document_info()
+
+    def _show_closed_document(self, file_path):
+        """
+        Descarta el documento del editor del documento cerrado file_path y,
+        si era el que se mostraba, muestra el documento vacío que lo sustituye.
+        """
+        self._forget_editor_document(file_path)
+        self._view_states.pop(file_path, None)
+
+        if (file_path == self._shown_path):
+            self._shown_path = None
+            self._show_opened_file()
+        else:
+            self._show_tabs()
+
+    def _forget_editor_document(self, file_path):
+        """
+        Descarta el documento del editor del documento file_path (cerrado o
+        descargado de memoria por el modelo).
+        """
+        self._editor_documents.pop(file_path, None)
+
+    def _show_saved_file(self, old_path, new_path):
+        """
+        Muestra en la vista la ruta del fichero guardado (que antes era
+        old_path y ahora es new_path) y quita la marca de cambios sin guardar.
+        El contenido del editor no se toca, por lo que se conservan el cursor,
+        el desplazamiento y el historial de deshacer.
+        """
+        if (old_path != new_path):
+            for states in (self._editor_documents, self._view_states):
+                if (old_path in states):
+                    states[new_path] = states.pop(old_path)
+            if (self._shown_path == old_path):
+                self._shown_path = new_path
+
+        self._show_document_info()
+
+    def _show_document_info(self):
+        """
+        Muestra en la vista la ruta del documento activo, si tiene cambios
+        sin guardar y las pestañas de los documentos abiertos. Los ficheros
+        binarios se muestran en la vista hexadecimal en lugar del editor.
+        """
+        main_widget = self.view.main_widget
+        main_widget.opened_file_label.setText(self.model.opened_file_path)
+
+        binary = self.model.opened_file_binary
+        main_widget.hex_model.set_file(binary)
+        main_widget.hex_view.setVisible(binary is not None)
+        main_widget.text_edit.setVisible(binary is None)
+
+        if (binary is not None):
+            self.view.main_window.format_label.setText(
+                u"Binario (hexadecimal)")
+        else:
+            self.view.main_window.format_label.setText(
+                self._format_description(self.model.opened_file_format))
+        self._update_modified_indicator()
+        self._show_tabs()
+        self._update_highlighting()
+
+    def _update_highlighting(self):
+        """
+        Resalta la sintaxis del documento del editor según el tipo del
+        fichero abierto (salvo en los ficheros de solo lectura). Si cambia el
+        documento o el tipo, los estados del resaltado de todo el documento se
+        calculan de nuevo en segundo plano.
+        """
+        lexer = None
+        if (not self.model.is_read_only()):
+            lexer = lexer_for(self.model.opened_file_path)
+
+        highlighter = self.view.main_widget.highlighter
+        document = self.view.main_widget.text_edit.document()
+        if (not highlighter.set_document(document, lexer)):
+            return
+
+        if (self._highlight_worker is not None):
+            self._highlight_worker.cancel()
+            self._highlight_worker = None
+
+        if (lexer is None):
+            return
+
+        generation = highlighter.generation
+        worker = HighlightWorker(lexer, unicode(document.toPlainText()))
+        worker.states_ready.connect(
+            lambda states: highlighter.set_states(states, generation))
+        worker.finished.connect(lambda: self._highlight_finished(worker))
+
+        # Guardamos una referencia para que el hilo no se destruya mientras
+        # sigue en ejecución.
+        self._highlight_workers.append(worker)
+        self._highlight_worker = worker
+        worker.start()
+
+    def _highlight_finished(self, worker):
+        """
+        Olvida el análisis del resaltado worker cuando termina.
+        """
+        self._highlight_workers.remove(worker)
+        if (worker is self._highlight_worker):
+            self._highlight_worker = None
+
+    def _format_description(self, text_format):
+        """
+        Devuelve un string con la codificación y los saltos de línea del
+        formato text_format (objeto TextFormat) para la barra de estado.
+        """
+        newlines = {u"\n": u"LF", u"\r\n": u"CRLF", u"\r": u"CR"}
+        description = text_format.encoding.upper()
+        if (text_format.bom):
+            description += u" con BOM"
+
+        return description + u" · " + newlines[text_format.newline]
+
+    def _show_tabs(self):
+        """
+        Crea una pestaña por cada documento abierto y selecciona la del
+        documento activo.
+        """
+        tabs = self.view.main_widget.document_tabs
+
+        # Cambiar las pestañas no debe cambiar de documento.
+        tabs.blockSignals(True)
+        while (tabs.count()):
+            tabs.removeTab(0)
+
+        for path in self.model.open_documents:
+            index = tabs.addTab(self._tab_title(path))
+            tabs.setTabToolTip(index, path)
+
+        if (self.model.opened_file_path in self.model.open_documents):
+            tabs.setCurrentIndex(
+                self.model.open_documents.index(self.model.opened_file_path))
+        tabs.blockSignals(False)
+
+    def _tab_title(self, file_path):
+        """
+        Devuelve el título de la pestaña del documento abierto file_path: el
+        nombre del fichero, con un asterisco si tiene cambios sin guardar.
+        """
+        title = os.path.basename(file_path)
+        if (self.model.is_document_modified(file_path)):
+            title += u" *"
+        return title
+
+    def _new_editor_document(self):
+        """
+        Crea un documento del editor vacío (QTextDocument con la disposición
+        de texto plano) conectado con el controlador.
+        """
+        document = QtGui.QTextDocument()
+        document.setDocumentLayout(QtGui.QPlainTextDocumentLayout(document))
+        document.setDefaultFont(self.view.main_widget.text_edit.font())
+
+        # Solo cambia el documento que se muestra en el editor. Se conectan
+        # métodos (y no funciones lambda que guarden el documento) para no
+        # crear referencias circulares que impidan liberarlo.
+        document.contentsChange.connect(self._editor_changed)
+        document.contentsChanged.connect(self._update_modified_indicator)
+
+        return document
+
+    def _set_editor_document(self, document):
+        """
+        Muestra en el editor el documento del editor document como documento
+        del documento activo del modelo (guardando antes la posición del
+        cursor y del scroll del documento que se mostraba).
+        """
+        self._save_view_state()
+
+        path = self.model.opened_file_path
+        self._editor_documents[path] = document
+        self._shown_path = path
+
+        text_edit = self.view.main_widget.text_edit
+        self._loading = self._paging = True
+        text_edit.setDocument(document)
+        text_edit.setReadOnly(self.model.is_read_only())
+        self._loading = self._paging = False
+
+        # Los documentos del editor que ya no están abiertos (como el
+        # documento vacío sin nombre) no se conservan.
+        for other_path in list(self._editor_documents):
+            if (other_path != path and
+                    other_path not in self.model.open_documents):
+                del self._editor_documents[other_path]
+
+    def _fill_editor(self):
+        """
+        Rellena el editor con el contenido del documento activo del modelo.
+        """
+        if (self.model.opened_file_pages is not None):
+            self._show_pages(self._first_page)
+        else:
+            self._loading = True
+            self.view.main_widget.text_edit.setPlainText(
+                unicode(self.model.opened_file_data))
+            self._loading = False
+
+    def _save_view_state(self):
+        """
+        Guarda la posición del cursor, del scroll y de la ventana de páginas
+        del documento que se muestra en el editor.
+        """
+        if (self._shown_path is None):
+            return
+
+        text_edit = self.view.main_widget.text_edit
+        self._view_states[self._shown_path] = (
+            text_edit.textCursor().position(),
+            text_edit.verticalScrollBar().value(),
+            self._first_page, list(self._window_lengths))
+
+    def _restore_view_state(self, file_path):
+        """
+        Restaura la posición del cursor, del scroll y de la ventana de páginas
+        guardadas del documento file_path.
+        """
+        state = self._view_states.get(file_path)
+        if (state is None):
+            self._first_page = 0
+            return
+
+        position, scroll_value, self._first_page, self._window_lengths = state
+
+        self._paging = True
+        self._move_editor_cursor(position)
+        self.view.main_widget.text_edit.verticalScrollBar().setValue(
+            scroll_value)
+        self._paging = False
+
+    def _update_modified_indicator(self):
+        """
+        Marca el título de la ventana principal y la pestaña del documento
+        activo si tiene cambios sin guardar.
+        """
+        self.view.main_window.setWindowModified(self.model.is_modified())
+
+        path = self.model.opened_file_path
+        if (path in self.model.open_documents):
+            self.view.main_widget.document_tabs.setTabText(
+                self.model.open_documents.index(path), self._tab_title(path))
+
+    def _editor_changed(self, position, chars_removed, chars_added):
+        """
+        Aplica sobre el documento del modelo la modificación hecha por el
+        usuario en el editor (chars_removed caracteres borrados y chars_added
+        caracteres añadidos a partir de la posición position).
+        """
+        if (self._loading or self.model.is_read_only()):
+            return
+
+        document = self.view.main_widget.text_edit.document()
+
+        if (chars_removed):
+            self.model.delete_text(position, chars_removed)
+
+        if (chars_added):
+            cursor = QtGui.QTextCursor(document)
+            cursor.setPosition(position)
+            cursor.setPosition(position + chars_added,
+                               QtGui.QTextCursor.KeepAnchor)
+            # Qt separa los párrafos con el carácter U+2029 en lugar de '\n'.
+            text = unicode(cursor.selectedText()).replace(u"\u2029", u"\n")
+            self.model.insert_text(position, text)
+
+        # Qt puede contar en la modificación el separador de bloque final del
+        # documento, que no forma parte del texto. Si el modelo y el editor
+        # dejan de coincidir, volvemos a sincronizarlos por completo.
+        if (len(self.model.opened_file_data) != document.characterCount() - 1):
+            self.model.set_text(
+                unicode(self.view.main_widget.text_edit.toPlainText()))
+
+    def _show_pages(self, first_page):
+        """
+        Muestra en el editor (en modo solo lectura) las páginas del fichero
+        grande abierto a partir de la indicada en el argumento first_page.
+        """
+        pages = self.model.opened_file_pages
+        first_page = max(0, min(first_page,
+                                pages.page_count - self._PAGE_WINDOW))
+        last_page = min(first_page + self._PAGE_WINDOW, pages.page_count)
+
+        texts = [pages.page(i) for i in range(first_page, last_page)]
+        self._first_page = first_page
+        self._window_lengths = [len(text) for text in texts]
+
+        # Evitamos que el cambio de texto vuelva a mover la ventana.
+        self._paging = True
+        self.view.main_widget.text_edit.setReadOnly(True)
+        self.view.main_widget.text_edit.setPlainText(u"".join(texts))
+        self._paging = False
+
+    def _editor_scrolled(self, value):
+        """
+        Desplaza la ventana de páginas del fichero grande abierto cuando el
+        usuario llega al principio o al final del texto mostrado.
+        """
+        if (self._paging or self.model.opened_file_pages is None):
+            return
+
+        scroll_bar = self.view.main_widget.text_edit.verticalScrollBar()
+        page_count = self.model.opened_file_pages.page_count
+
+        if (value >= scroll_bar.maximum() and
+                self._first_page + self._PAGE_WINDOW < page_count):
+            # Lo que antes era el final del texto queda tras la nueva primera
+            # página de la ventana.
+            position = sum(self._window_lengths[1:])
+            self._show_pages(self._first_page + 1)
+            self._move_editor_cursor(position)
+        elif (value <= scroll_bar.minimum() and self._first_page > 0):
+            self._show_pages(self._first_page - 1)
+            self._move_editor_cursor(self._window_lengths[0])
+
+    def _move_editor_cursor(self, position):
+        """
+        Mueve el cursor del editor a la posición indicada en el argumento
+        position y desplaza la vista para que sea visible.
+        """
+        text_edit = self.view.main_widget.text_edit
+        cursor = text_edit.textCursor()
+        cursor.setPosition(
+            min(position, text_edit.document().characterCount() - 1))
+        text_edit.setTextCursor(cursor)
+        text_edit.ensureCursorVisible()
 
     def _open_folder_dialog(self):
         """
@@ -106,10 +790,60 @@ class TextEditorController():
 
     def _open_folder(self, folder_path):
         """
-        Indica al modelo la carpeta a abrir (folder_path) y actualiza la vista.
+        Lee en segundo plano la carpeta a abrir (folder_path) y se la indica
+        al modelo al terminar. La vista se actualiza cuando el modelo
+        notifica el cambio.
+
+        Si ya se estaba leyendo otra carpeta, su resultado se descarta.
         """
-        self.model.open_folder(folder_path)
-        self._update_view()
+        if (self._folder_worker is not None):
+            self._folder_worker.cancel()
+
+        worker = FileWorker(
+            lambda progress, cancelled: self.model.load_folder(
+                folder_path, progress, cancelled))
+        worker.operation_finished.connect(
+            lambda result: self._folder_loaded(worker, result))
+        worker.operation_failed.connect(
+            lambda error: self._folder_load_failed(worker, folder_path))
+        worker.finished.connect(lambda: self._folder_workers.remove(worker))
+
+        # Guardamos una referencia para que el hilo no se destruya mientras
+        # sigue en ejecución.
+        self._folder_workers.append(worker)
+        self._folder_worker = worker
+        self._folder_changed_while_loading = False
+
+        worker.start()
+
+    def _folder_loaded(self, worker, result):
+        """
+        Indica al modelo la carpeta leída en segundo plano por worker (tupla
+        (ruta, índice)) si sigue siendo la lectura en curso.
+        """
+        if (worker is not self._folder_worker):
+            return
+
+        self._folder_worker = None
+        self.model.set_opened_folder(*result)
+
+        # Los cambios que el vigilante ha detectado mientras se leía la
+        # carpeta pueden no estar en el resultado.
+        if (self._folder_changed_while_loading):
+            self._reload_folder()
+
+    def _folder_load_failed(self, worker, folder_path):
+        """
+        Muestra un mensaje de error si la lectura de la carpeta folder_path
+        (worker) que ha fallado sigue siendo la lectura en curso.
+        """
+        if (worker is not self._folder_worker):
+            return
+
+        self._folder_worker = None
+        self._show_error(
+            u"No se pudo abrir la carpeta \"" +
+            unicode(os.path.abspath(folder_path)) + u"\"")
 
     def _open_file_dialog(self):
         """
@@ -127,52 +861,603 @@ class TextEditorController():
         """
         Abre el fichero seleccionado en la lista de ficheros.
         """
-        selected_files = self.view.main_widget.file_list.selectedItems()
+        selected_files = self.view.main_widget.file_list.selectedIndexes()
 
         if (not selected_files):
-            TextEditorDialogs.show_error_message(
+            self._show_error(
                 u"Primero debe seleccionar un fichero en el panel de la izquierda!")
             return
 
         file_path = unicode(self.model.opened_folder_path +
-                            selected_files[0].text())
+                            self.view.main_widget.file_list_model.file_at(
+                                selected_files[0].row()))
 
         self._open_file(file_path)
 
-    def _open_file(self, file_path):
+    def _open_project_file(self, index):
+        """
+        Abre el fichero del árbol del proyecto indicado en el argumento index
+        (al hacer click sobre una carpeta no se hace nada).
+        """
+        relative_path = self.view.main_widget.project_tree_model.file_path(
+            index)
+        if (relative_path is None):
+            return
+
+        self._open_file(unicode(self.model.opened_folder_path +
+                                relative_path.replace(u"/", os.path.sep)))
+
+    def _quick_open_search(self, query):
+        """
+        Busca los ficheros que coinciden con el texto escrito (query) en la
+        ventana de búsqueda de ficheros y muestra los resultados.
+        """
+        self.view.main_window.quick_open_dialog.set_results(
+            self.model.find_files(unicode(query)))
+
+    def _quick_open_file(self):
+        """
+        Abre el fichero seleccionado en la ventana de búsqueda de ficheros.
+        """
+        relative_path = self.view.main_window.quick_open_dialog.selected_path()
+        if (relative_path is None):
+            return
+
+        self.view.main_window.quick_open_dialog.hide()
+        self._open_file(unicode(self.model.opened_folder_path +
+                                relative_path.replace(u"/", os.path.sep)))
+
+    def _show_find_bar(self):
+        """
+        Muestra la barra de búsqueda con el texto seleccionado en el editor
+        (si es de una sola línea) como texto a buscar.
+        """
+        selected = unicode(
+            self.view.main_widget.text_edit.textCursor().selectedText())
+        if (u"\u2029" in selected):
+            selected = u""
+
+        self.view.main_widget.find_bar.open(selected)
+
+    def _find_incremental(self, text):
+        """
+        Busca el texto escrito en la barra de búsqueda mientras el usuario
+        escribe, empezando por el principio de la selección actual para que la
+        coincidencia seleccionada se vaya ampliando.
+        """
+        cursor = self.view.main_widget.text_edit.textCursor()
+        self._find(cursor.selectionStart())
+
+    def _find_next(self):
+        """
+        Selecciona la siguiente coincidencia del texto de la barra de
+        búsqueda.
+        """
+        cursor = self.view.main_widget.text_edit.textCursor()
+        self._find(cursor.selectionEnd())
+
+    def _find_previous(self):
+        """
+        Selecciona la coincidencia anterior del texto de la barra de búsqueda.
+        """
+        cursor = self.view.main_widget.text_edit.textCursor()
+        self._find(cursor.selectionStart(), backward=True)
+
+    def _find(self, position, backward=False):
+        """
+        Busca el texto de la barra de búsqueda a partir de la posición position
+        del fichero abierto y selecciona en el editor la coincidencia
+        encontrada.
+        """
+        find_bar = self.view.main_widget.find_bar
+        query, regex, ignore_case = self._find_options()
+        if (not query):
+            find_bar.status_label.clear()
+            return
+
+        if (self.model.is_read_only()):
+            find_bar.status_label.setText(
+                u"No disponible en ficheros de solo lectura")
+            return
+
+        try:
+            match = self.model.find_text(query, position, regex, ignore_case,
+                                         backward)
+        except re.error as error:
+            find_bar.status_label.setText(
+                u"Expresión regular no válida: " + unicode(error))
+            return
+
+        if (match is None):
+            find_bar.status_label.setText(u"Sin coincidencias")
+            return
+
+        start, end = match
+        text_edit = self.view.main_widget.text_edit
+        cursor = text_edit.textCursor()
+        cursor.setPosition(start)
+        cursor.setPosition(end, QtGui.QTextCursor.KeepAnchor)
+        text_edit.setTextCursor(cursor)
+        text_edit.ensureCursorVisible()
+
+        line, column = self.model.line_column(start)
+        find_bar.status_label.setText(
+            u"Línea %d, columna %d" % (line + 1, column + 1))
+
+    def _replace_match(self):
+        """
+        Reemplaza la coincidencia seleccionada en el editor (si la hay) y
+        selecciona la siguiente.
+        """
+        find_bar = self.view.main_widget.find_bar
+        query, regex, ignore_case = self._find_options()
+        if (not query or self.model.is_read_only()):
+            return
+
+        cursor = self.view.main_widget.text_edit.textCursor()
+        try:
+            replacement = self.model.replacement_for(
+                query, unicode(find_bar.replace_edit.text()),
+                cursor.selectionStart(), cursor.selectionEnd(), regex,
+                ignore_case)
+        except re.error as error:
+            find_bar.status_label.setText(
+                u"Expresión regular no válida: " + unicode(error))
+            return
+
+        # El cambio llega al modelo a través de _editor_changed.
+        if (replacement is not None):
+            cursor.insertText(replacement)
+
+        self._find_next()
+
+    def _replace_all(self):
+        """
+        Reemplaza todas las coincidencias del fichero abierto como una única
+        edición: el editor se redibuja una sola vez y el cambio se deshace en
+        un solo paso.
+        """
+        find_bar = self.view.main_widget.find_bar
+        query, regex, ignore_case = self._find_options()
+        if (not query or self.model.is_read_only()):
+            return
+
+        try:
+            change = self.model.replace_all(
+                query, unicode(find_bar.replace_edit.text()), regex,
+                ignore_case)
+        except re.error as error:
+            find_bar.status_label.setText(
+                u"Expresión regular no válida: " + unicode(error))
+            return
+
+        if (change is None):
+            find_bar.status_label.setText(u"Sin coincidencias")
+            return
+
+        # Solo se sustituye el fragmento entre la primera y la última
+        # coincidencia; el cambio llega al modelo a través de _editor_changed.
+        start, end, text, count = change
+        cursor = QtGui.QTextCursor(
+            self.view.main_widget.text_edit.document())
+        cursor.beginEditBlock()
+        cursor.setPosition(start)
+        cursor.setPosition(end, QtGui.QTextCursor.KeepAnchor)
+        cursor.insertText(text)
+        cursor.endEditBlock()
+
+        find_bar.status_label.setText(u"%d coincidencias reemplazadas" % count)
+
+    def _find_options(self):
+        """
+        Devuelve la tupla (texto a buscar, expresión regular, ignorar
+        mayúsculas) con las opciones de la barra de búsqueda.
+        """
+        find_bar = self.view.main_widget.find_bar
+        return (unicode(find_bar.find_edit.text()),
+                find_bar.regex_check.isChecked(),
+                not find_bar.case_check.isChecked())
+
+    def _search_folder(self):
+        """
+        Empieza a buscar en la carpeta abierta el texto escrito en la ventana
+        de búsqueda en la carpeta (cancelando la búsqueda anterior). Las
+        coincidencias se muestran según van llegando.
+        """
+        dialog = self.view.main_window.search_folder_dialog
+        query = unicode(dialog.search_edit.text())
+
+        self._cancel_folder_search()
+        dialog.clear_matches()
+        if (not query):
+            return
+
+        try:
+            results = self.model.search_folder(
+                query, dialog.regex_check.isChecked(),
+                not dialog.case_check.isChecked())
+        except re.error as error:
+            dialog.status_label.setText(
+                u"Expresión regular no válida: " + unicode(error))
+            return
+
+        worker = SearchWorker(results)
+        worker.matches_found.connect(
+            lambda matches: self._show_search_matches(worker, matches))
+        worker.search_failed.connect(
+            lambda error: self._search_failed(worker))
+        worker.finished.connect(lambda: self._search_finished(worker))
+
+        # Guardamos una referencia para que el hilo no se destruya mientras
+        # sigue en ejecución.
+        self._search_workers.append(worker)
+        self._search_worker = worker
+        self._search_match_count = 0
+
+        dialog.status_label.setText(u"Buscando...")
+        worker.start()
+
+    def _show_search_matches(self, worker, matches):
+        """
+        Añade a la ventana de búsqueda las coincidencias matches si worker es
+        la búsqueda en curso.
+        """
+        if (worker is not self._search_worker):
+            return
+
+        self._search_match_count += len(matches)
+        dialog = self.view.main_window.search_folder_dialog
+        dialog.add_matches(matches)
+        dialog.status_label.setText(
+            u"%d coincidencias (buscando...)" % self._search_match_count)
+
+    def _search_failed(self, worker):
+        """
+        Indica en la ventana de búsqueda que la búsqueda worker ha fallado si
+        es la búsqueda en curso.
+        """
+        if (worker is self._search_worker):
+            self._search_worker = None
+            self.view.main_window.search_folder_dialog.status_label.setText(
+                u"No se pudo completar la búsqueda")
+
+    def _search_finished(self, worker):
+        """
+        Muestra el número de coincidencias cuando termina la búsqueda worker
+        (si es la búsqueda en curso).
+        """
+        self._search_workers.remove(worker)
+
+        if (worker is self._search_worker):
+            self._search_worker = None
+            self.view.main_window.search_folder_dialog.status_label.setText(
+                u"%d coincidencias" % self._search_match_count)
+
+    def _cancel_folder_search(self):
+        """
+        Cancela la búsqueda en la carpeta en curso (si la hay).
+        """
+        if (self._search_worker is not None):
+            self._search_worker.cancel()
+            self._search_worker = None
+            self.model.cancel_folder_search()
+
+    def _open_search_match(self):
+        """
+        Abre el fichero de la coincidencia seleccionada en la ventana de
+        búsqueda en la carpeta y lleva el cursor hasta ella.
+        """
+        match = self.view.main_window.search_folder_dialog.selected_match()
+        if (match is None):
+            return
+
+        relative_path, line, column = match
+        self._open_file(unicode(self.model.opened_folder_path +
+                                relative_path.replace(u"/", os.path.sep)),
+                        line, column)
+
+    def _open_file(self, file_path, line=None, column=0):
         """
         Indica al modelo el fichero a abrir (file_path) y actualiza la vista.
+        Si se indica una línea (line) y una columna (column), el cursor se
+        coloca en ellas al terminar de abrirlo.
 
-        Antes de abrir el nuevo fichero se comprobará si el usuario ha hecho
-        cambios en el fichero abierto y, en caso afirmativo, se le avisará de
-        que perderá dichos cambios y se le permitirá cancelar la operación.
+        Si el fichero ya está abierto en una pestaña, simplemente se cambia a
+        ella (sin leerlo del disco si su documento sigue en memoria).
         """
-        # Comprobamos si el usuario ha hecho cambios en el fichero abierto.
-        if (self.view.main_widget.text_edit.toPlainText() != self.model.opened_file_data):
-            # Avisamos al usuario y le pedimos confirmación.
-            confirmed = TextEditorDialogs.confirm_operation_message(
-                u"Al abrir otro fichero perderá los cambios sin guardar!")
+        if (not self._confirm_discard_unnamed()):
+            # Eliminamos la selección y salimos sin abrir el nuevo fichero.
+            self._clear_file_list_selection()
+            return
+
+        self._show_document(file_path, line, column)
+
+    def _show_document(self, file_path, line=None, column=0):
+        """
+        Cambia al documento file_path si ya está abierto y en memoria o lo lee
+        en segundo plano en caso contrario (ver _open_file).
+        """
+        if (file_path in self.model.open_documents and
+                self.model.switch_document(file_path)):
+            if (line is not None):
+                self._move_editor_to_line(line, column)
+            return
+
+        self._start_operation(
+            u"Abriendo \"" + file_path + u"\"...",
+            lambda progress, cancelled: self.model.load_file(
+                file_path, progress, cancelled),
+            lambda result: self._file_loaded(file_path, result, line,
+                                             column),
+            u"No se pudo abrir el fichero \"" + file_path + u"\"")
+
+    def _file_loaded(self, file_path, result, line=None, column=0):
+        """
+        Indica al modelo el fichero abierto (file_path) con el resultado de
+        leerlo en segundo plano (tupla (contenido, formato)). La vista se
+        actualiza cuando el modelo notifica el cambio; después se coloca el
+        cursor en la línea line y la columna column (si se han indicado).
+        """
+        content, text_format = result
+        self._first_page = 0
+        self.model.set_opened_file(file_path, content, text_format)
+
+        if (line is not None):
+            self._move_editor_to_line(line, column)
+
+    def _move_editor_to_line(self, line, column=0):
+        """
+        Mueve el cursor del editor a la línea line y la columna column del
+        documento activo (salvo en los ficheros grandes).
+        """
+        if (self.model.opened_file_pages is None):
+            document = self.model.opened_file_data
+            line = min(line, document.line_count - 1)
+            self._move_editor_cursor(document.line_start(line) + column)
+
+    def _confirm_discard_unnamed(self):
+        """
+        Si el documento activo es el documento vacío sin nombre (que no tiene
+        pestaña) y el usuario ha escrito en él, le avisa de que perderá sus
+        cambios al abrir o cambiar de documento y le permite cancelar.
+
+        Devuelve:
+            True si se puede continuar; False si el usuario ha cancelado.
+        """
+        if (self.model.opened_file_path in self.model.open_documents or
+                not self.model.is_modified(check_content=True)):
+            return True
+
+        return TextEditorDialogs.confirm_operation_message(
+            u"Al abrir otro fichero perderá los cambios sin guardar!")
 
-            # Si el usuario decide cancelar...
+    def _switch_document(self, index):
+        """
+        Cambia al documento de la pestaña index (volviendo a leerlo del disco
+        si el modelo lo había descargado de memoria).
+        """
+        if (index < 0 or index >= len(self.model.open_documents)):
+            return
+
+        file_path = self.model.open_documents[index]
+        if (file_path == self.model.opened_file_path):
+            return
+
+        if (not self._confirm_discard_unnamed()):
+            self._show_tabs()
+            return
+
+        self._show_document(file_path)
+
+    def _close_document(self, index):
+        """
+        Cierra el documento de la pestaña index (pidiendo confirmación si
+        tiene cambios sin guardar) y, si era el activo, cambia al documento
+        usado más recientemente.
+        """
+        file_path = self.model.open_documents[index]
+
+        if (self.model.is_document_modified(file_path)):
+            confirmed = TextEditorDialogs.confirm_operation_message(
+                u"Al cerrar el fichero perderá los cambios sin guardar!")
             if (not confirmed):
-                # ... eliminamos la selección y...
-                self._clear_file_list_selection()
-                # ... salimos sin abrir el nuevo fichero.
                 return
 
-        self.model.open_file(file_path)
-        self._update_view()
+        was_active = file_path == self.model.opened_file_path
+        recent = self.model.recent_documents()
+        self.model.close_document(file_path)
+
+        if (was_active and recent):
+            self._show_document(recent[0])
+
+    def _start_operation(self, message, operation, on_finished, error_message,
+                         replaceable=True):
+        """
+        Ejecuta en segundo plano una operación de fichero, mostrando su
+        progreso en la barra de estado. Si ya había otra en curso, se cancela
+        (salvo que sea un guardado, que nunca se interrumpe sin que el usuario
+        lo pida; en ese caso la nueva operación no se inicia).
+
+        Argumentos:
+            message: String con el mensaje que se muestra mientras dura.
+            operation: Función con la operación (ver FileWorker).
+            on_finished: Función a la que se llama con el resultado cuando la
+                operación termina con éxito.
+            error_message: String con el mensaje de error que se muestra si la
+                operación falla.
+            replaceable: Si es True, la operación se cancela si se inicia
+                otra antes de que termine.
+        """
+        if (self._worker is not None and not self._worker_replaceable):
+            self.view.main_window.statusBar().showMessage(
+                u"Espere a que termine la operación en curso", 2000)
+            return
+
+        self._cancel_operation()
+
+        worker = FileWorker(operation)
+        worker.progress.connect(
+            lambda done, total: self._operation_progress(worker, done, total))
+        worker.operation_finished.connect(
+            lambda result: self._operation_finished(worker, on_finished,
+                                                    result))
+        worker.operation_failed.connect(
+            lambda error: self._operation_failed(worker, error_message))
+        worker.operation_cancelled.connect(
+            lambda: self._operation_ended(worker))
+        worker.finished.connect(lambda: self._workers.remove(worker))
+
+        # Guardamos una referencia para que el hilo no se destruya mientras
+        # sigue en ejecución.
+        self._workers.append(worker)
+        self._worker = worker
+        self._worker_replaceable = replaceable
+
+        self.view.main_window.statusBar().showMessage(message)
+        self.view.main_window.progress_bar.setValue(0)
+        self.view.main_window.progress_bar.show()
+        self.view.main_window.cancel_button.show()
+
+        worker.start()
+
+    def _operation_progress(self, worker, done, total):
+        """
+        Actualiza la barra de progreso si worker es la operación en curso.
+        """
+        if (worker is self._worker and total):
+            self.view.main_window.progress_bar.setValue(done * 100 // total)
+
+    def _operation_finished(self, worker, on_finished, result):
+        """
+        Pasa el resultado de la operación de fichero worker a la función
+        on_finished si sigue siendo la operación en curso.
+        """
+        if (self._operation_ended(worker)):
+            on_finished(result)
+
+    def _operation_failed(self, worker, error_message):
+        """
+        Muestra el mensaje de error error_message si la operación de fichero
+        worker que ha fallado sigue siendo la operación en curso.
+        """
+        if (self._operation_ended(worker)):
+            self._show_error(error_message)
+
+    def _operation_ended(self, worker):
+        """
+        Oculta el progreso de la operación de fichero worker si es la que
+        está en curso.
+
+        Devuelve:
+            True si worker era la operación en curso; False si había sido
+            cancelada o sustituida por otra (y su resultado debe ignorarse).
+        """
+        if (worker is not self._worker):
+            return False
+
+        self._worker = None
+        self.view.main_window.statusBar().clearMessage()
+        self.view.main_window.progress_bar.hide()
+        self.view.main_window.cancel_button.hide()
+
+        # Si se estaba abriendo el documento de otra pestaña, la pestaña
+        # seleccionada vuelve a ser la del documento activo.
+        self._show_tabs()
+
+        return True
+
+    def _cancel_operation(self):
+        """
+        Cancela la operación de fichero en curso (si la hay).
+        """
+        if (self._worker is not None):
+            worker = self._worker
+            worker.cancel()
+            self._operation_ended(worker)
+            self.view.main_window.statusBar().showMessage(
+                u"Operación cancelada", 2000)
+
+    def _show_info(self, info_text):
+        """
+        Muestra el aviso de información info_text sin bloquear la ventana.
+        """
+        self._post_notification(INFO, info_text)
+
+    def _show_error(self, error_text):
+        """
+        Muestra el aviso de error error_text sin bloquear la ventana y lo
+        añade al registro de errores.
+        """
+        self._post_notification(ERROR, error_text)
+
+    def _post_notification(self, level, text):
+        """
+        Añade el aviso a la cola. Se muestra al volver al bucle de eventos
+        (o más tarde si acaba de mostrarse otro).
+        """
+        if (self._notifications.post(level, text)):
+            self._notification_repeated = True
+
+        if (not self._notification_timer.isActive()):
+            self._notification_timer.start(0)
+
+    def _show_notifications(self):
+        """
+        Muestra el siguiente aviso de la cola (o el contador actualizado del
+        que se está mostrando), pone al día el registro de errores y programa
+        el temporizador para el siguiente aviso pendiente.
+        """
+        notifications = self._notifications
+
+        notification = notifications.take()
+        if (notification is None and self._notification_repeated):
+            notification = notifications.current
+        self._notification_repeated = False
+
+        if (notification is not None):
+            text = notification.text
+            if (notification.count > 1):
+                text += u" (x%d)" % notification.count
+            self.view.main_window.notification_toast.show_message(
+                text, notification.level == ERROR)
+
+        if (notifications.error_count != self._shown_error_count):
+            self._shown_error_count = notifications.error_count
+            self._show_error_log()
+
+        delay = notifications.delay()
+        if (delay is not None):
+            self._notification_timer.start(int(delay * 1000) + 1)
+
+    def _show_error_log(self):
+        """
+        Muestra el registro de errores en su panel y el número de errores en
+        la barra de estado.
+        """
+        errors = self._notifications.error_log
+        self.view.main_window.error_log_dock.set_errors([
+            (time.strftime("%H:%M:%S", time.localtime(error.time)),
+             error.text, error.count)
+            for error in errors])
+        self.view.main_window.show_error_count(
+            sum(error.count for error in errors))
+
+    def _clear_error_log(self):
+        """
+        Vacía el registro de errores.
+        """
+        self._notifications.error_log.clear()
+        self._show_error_log()
 
     def _clear_file_list_selection(self):
         """
-        Anula la selección de todos los items de la lista de ficheros.
+        Anula la selección de todos los ficheros de la lista de ficheros.
 
         Sirve para que el fichero que se ha intentado abrir no se quede marcado
         como seleccionado en el panel lateral si este finalmente no ha sido
         abierto.
         """
-        for item in self.view.main_widget.file_list.selectedItems():
-            self.view.main_widget.file_list.setItemSelected(item, False)
+        self.view.main_widget.file_list.clearSelection()
 
     def _save_as_dialog(self):
         """
@@ -201,20 +1486,126 @@ class TextEditorController():
 
     def _save_file(self, file_path):
         """
-        Actualiza el modelo con los cambios en el editor de la vista, le indica
-        dónde guardar los cambios (file_path) y actualiza la vista.
+        Guarda en segundo plano el documento del modelo en file_path y
+        actualiza la vista al terminar.
+
+        El documento del modelo ya contiene los cambios hechos en el editor, ya
+        que se le van aplicando a medida que el usuario escribe. Se guarda una
+        copia para que el usuario pueda seguir escribiendo mientras tanto.
         """
-        self.model.opened_file_data = unicode(
-            self.view.main_widget.text_edit.toPlainText())
-        self.model.save_file(file_path)
-        self._update_view()
+        if (self.model.is_read_only()):
+            self._show_error(
+                u"El fichero \"" + self.model.opened_file_path + u"\" se "
+                u"ha abierto en modo solo lectura")
+            return
+
+        document_path = self.model.opened_file_path
+        generation = self.model.opened_file_generation
+        document = self.model.opened_file_data.snapshot()
+        text_format = self.model.opened_file_format
+
+        self._start_operation(
+            u"Guardando \"" + file_path + u"\"...",
+            lambda progress, cancelled: self.model.write_file(
+                file_path, document, progress, cancelled, text_format),
+            lambda content_hash: self._file_saved(
+                file_path, generation, len(document), content_hash,
+                document_path),
+            u"No se pudo guardar en el fichero \"" + file_path + u"\"",
+            replaceable=False)
+
+    def _file_saved(self, file_path, generation, length, content_hash,
+                    document_path):
+        """
+        Registra en el modelo el fichero guardado en segundo plano (desde el
+        documento que tenía la ruta document_path). La vista se actualiza
+        cuando el modelo notifica el cambio.
+        """
+        self.model.set_saved_file(file_path, generation, length, content_hash,
+                                  document_path)
+
+        self._show_info(u"Fichero guardado con éxito en %d ms" %
+                        (self.model.last_save_time * 1000))
 
     def _reload_folder(self):
         """
-        Ordena al modelo actualizar la lista de ficheros y actualiza la vista.
+        Ordena al modelo actualizar la lista de ficheros. Si hay cambios, el
+        modelo los notifica y solo se aplican en la vista los ficheros que han
+        aparecido o desaparecido.
+
+        Se llama al pulsar el botón de refrescar y cuando el vigilante de la
+        carpeta detecta cambios. Si la carpeta se está leyendo en segundo
+        plano, se actualiza cuando termine.
         """
-        self.model.reload_folder()
-        self._update_view()
+        if (self._folder_worker is not None):
+            self._folder_changed_while_loading = True
+            return
+
+        try:
+            self.model.reload_folder()
+        except TextEditorError as error:
+            self._show_error(unicode(error))
+
+    def _folder_changed(self):
+        """
+        Actualiza la lista de ficheros cuando el vigilante detecta cambios en
+        la carpeta abierta. Si la carpeta ha desaparecido, deja de vigilarla
+        (para no avisar del error una y otra vez).
+        """
+        if (not os.path.isdir(self.model.opened_folder_path)):
+            self._folder_watcher.stop()
+            return
+
+        self._reload_folder()
+
+    def _restore_session_file(self):
+        """
+        Vuelve a abrir el fichero activo de la sesión anterior (si sigue
+        existiendo y no se ha abierto ya otro, por ejemplo al recuperar los
+        cambios sin guardar) con el cursor y el scroll donde estaban.
+        """
+        session = self._session
+        if (session is None or not session.file_path or
+                self.model.opened_file_path or
+                not os.path.isfile(session.file_path)):
+            return
+
+        file_path = session.file_path
+        self._start_operation(
+            u"Abriendo \"" + file_path + u"\"...",
+            lambda progress, cancelled: self.model.load_file(
+                file_path, progress, cancelled),
+            lambda result: self._session_file_loaded(file_path, result,
+                                                     session),
+            u"No se pudo abrir el fichero \"" + file_path + u"\"")
+
+    def _session_file_loaded(self, file_path, result, session):
+        """
+        Indica al modelo el fichero activo de la sesión anterior (file_path),
+        leído en segundo plano, y coloca el cursor y el scroll donde estaban
+        (salvo en los ficheros grandes, que se muestran desde el principio).
+        """
+        self._file_loaded(file_path, result)
+
+        if (self.model.opened_file_pages is None):
+            self._move_editor_cursor(session.cursor)
+            self.view.main_widget.text_edit.verticalScrollBar().setValue(
+                session.scroll)
+
+    def _save_session(self):
+        """
+        Guarda la sesión (carpeta abierta con su lista de ficheros, fichero
+        activo y posición del cursor y del scroll) para mostrarla al instante
+        la próxima vez que se inicie el programa.
+        """
+        text_edit = self.view.main_widget.text_edit
+
+        save_session(Session(
+            self.model.opened_folder_path or None,
+            list(self.model.opened_folder_files),
+            self.model.opened_file_path or None,
+            text_edit.textCursor().position(),
+            text_edit.verticalScrollBar().value()))
 
 
 if __name__ == "__main__":
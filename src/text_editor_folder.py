@@ -0,0 +1,492 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Módulo con el índice de ficheros de la carpeta abierta en el editor de texto.
+
+Autor: Andrés Salinas Lima <i52salia@uco.es>.
+"""
+
+from __future__ import print_function
+from bisect import bisect_left, insort
+from collections import deque
+import re
+import sys
+import os
+import threading
+import time
+
+try:
+    from queue import Queue, Empty
+except ImportError:
+    from Queue import Queue, Empty
+
+# os.scandir solo existe a partir de Python 3.5; en versiones anteriores se
+# usa el paquete scandir si está instalado.
+try:
+    from os import scandir
+except ImportError:
+    try:
+        from scandir import scandir
+    except ImportError:
+        scandir = None
+
+
+# Margen (en segundos) durante el que no se confía en la fecha de
+# modificación de una carpeta: algunos sistemas de ficheros solo la guardan con
+# precisión de segundos, así que un cambio hecho justo después de un listado
+# podría no alterarla.
+_MTIME_GRANULARITY = 2.0
+
+# Nombre de los ficheros con reglas de exclusión.
+IGNORE_FILE_NAME = u".gitignore"
+
+# Número de hilos con los que se recorre un proyecto en segundo plano.
+CRAWLER_THREADS = 4
+
+
+class FolderIndex():
+    """
+    Clase FolderIndex: Lista en memoria de los ficheros no ocultos de una
+    carpeta que se actualiza de forma incremental.
+
+    La carpeta solo se vuelve a recorrer si su fecha de modificación ha
+    cambiado (al crear, borrar o renombrar una entrada), y al recorrerla solo
+    se consulta el tipo de las entradas nuevas, usando la información que
+    devuelve scandir sin hacer una llamada a stat por cada fichero.
+
+    Argumentos:
+        folder_path: String con la ruta a la carpeta.
+
+    Atributos:
+        folder_path: String con la ruta a la carpeta.
+        files: Lista ordenada con los nombres de los ficheros no ocultos.
+    """
+
+    def __init__(self, folder_path):
+        self.folder_path = folder_path
+        self.files = []
+
+        self._files = set()
+        self._mtime = None
+        self._scan_time = 0.0
+
+    def refresh(self):
+        """
+        Actualiza la lista de ficheros con los cambios de la carpeta.
+
+        Devuelve:
+            Tupla (añadidos, eliminados) con las listas de nombres de ficheros
+            que han aparecido y desaparecido desde la última actualización.
+        """
+        mtime = os.stat(self.folder_path).st_mtime
+        if (mtime == self._mtime and
+                self._scan_time - mtime > _MTIME_GRANULARITY):
+            return ([], [])
+
+        self._scan_time = time.time()
+        self._mtime = mtime
+
+        files = set()
+        for name, _, is_file in _scan_entries(self.folder_path):
+            if (is_hidden(name)):
+                continue
+            # Las entradas que ya conocíamos no necesitan comprobarse otra vez.
+            if (name in self._files or is_file()):
+                files.add(name)
+
+        added = sorted(files - self._files)
+        removed = sorted(self._files - files)
+
+        self._files = files
+        if (added or removed):
+            self.files[:] = sorted(files)
+
+        return (added, removed)
+
+    def add(self, name):
+        """
+        Añade a la lista el fichero indicado en el argumento name (por
+        ejemplo, tras guardarlo) sin volver a recorrer la carpeta.
+
+        Devuelve:
+            True si el fichero no estaba en la lista; False en caso contrario.
+        """
+        if (name in self._files or is_hidden(name)):
+            return False
+
+        self._files.add(name)
+        insort(self.files, name)
+
+        return True
+
+    def remove(self, name):
+        """
+        Elimina de la lista el fichero indicado en el argumento name sin
+        volver a recorrer la carpeta.
+
+        Devuelve:
+            True si el fichero estaba en la lista; False en caso contrario.
+        """
+        if (name not in self._files):
+            return False
+
+        self._files.discard(name)
+        del self.files[bisect_left(self.files, name)]
+
+        return True
+
+
+class IgnoreRules():
+    """
+    Clase IgnoreRules: Reglas de exclusión de ficheros de un proyecto con el
+    formato de los ficheros .gitignore.
+
+    Se tienen en cuenta el .gitignore de la carpeta raíz y los de todas sus
+    subcarpetas (que se leen la primera vez que hacen falta). Se admiten
+    comentarios, negaciones (!), patrones solo para carpetas (terminados en
+    /), patrones anclados (con / en medio) y los comodines *, ?, [...] y **.
+
+    Argumentos:
+        root_path: String con la ruta a la carpeta raíz del proyecto.
+        patterns: Lista de patrones adicionales que se aplican en todo el
+            proyecto (opcional).
+
+    Atributos:
+        root_path: String con la ruta a la carpeta raíz del proyecto.
+    """
+
+    def __init__(self, root_path, patterns=()):
+        self.root_path = root_path
+
+        # Reglas de cada carpeta (ruta relativa): lista de tuplas
+        # (expresión regular, negada, solo carpetas, anclada).
+        self._rules = {u"": _compile_patterns(patterns) + self._load(u"")}
+        self._lock = threading.Lock()
+
+    def is_ignored(self, relative_path, is_dir):
+        """
+        Devuelve True si el fichero o carpeta con la ruta relativa
+        relative_path (con / como separador) debe excluirse; False en caso
+        contrario.
+
+        No se comprueba si alguna carpeta superior está excluida: al recorrer
+        el proyecto nunca se entra en ellas.
+        """
+        ignored = False
+        parts = relative_path.split(u"/")
+
+        # Recorremos las reglas desde la raíz hasta la carpeta del fichero: la
+        # última regla que coincide es la que decide.
+        for depth in range(len(parts)):
+            folder = u"/".join(parts[:depth])
+            path = u"/".join(parts[depth:])
+
+            for regex, negated, dir_only, anchored in self._folder_rules(folder):
+                if (dir_only and not is_dir):
+                    continue
+                if (regex.match(path if anchored else parts[-1])):
+                    ignored = not negated
+
+        return ignored
+
+    def _folder_rules(self, folder):
+        """
+        Devuelve las reglas del .gitignore de la carpeta con la ruta relativa
+        folder (leyéndolo si todavía no se ha leído).
+        """
+        rules = self._rules.get(folder)
+        if (rules is None):
+            rules = self._load(folder)
+            with self._lock:
+                self._rules[folder] = rules
+
+        return rules
+
+    def _load(self, folder):
+        """
+        Lee las reglas del .gitignore de la carpeta con la ruta relativa
+        folder.
+        """
+        file_path = os.path.join(self.root_path, *(folder.split(u"/") +
+                                                  [IGNORE_FILE_NAME]))
+        try:
+            with open(file_path, 'rb') as file:
+                lines = file.read().decode('utf-8', 'replace').splitlines()
+        except (IOError, OSError):
+            return []
+
+        return _compile_patterns(lines)
+
+
+class ProjectCrawler():
+    """
+    Clase ProjectCrawler: Recorre en segundo plano todas las subcarpetas de un
+    proyecto para obtener la lista completa de sus ficheros.
+
+    El recorrido se reparte entre varios hilos (cada uno lista una carpeta
+    cada vez) y respeta los ficheros ocultos y las reglas de exclusión del
+    proyecto. Los ficheros encontrados se van recogiendo con take_files.
+
+    Argumentos:
+        rules: Reglas de exclusión del proyecto (objeto de la clase
+            IgnoreRules), que indican también su carpeta raíz.
+        threads: Número de hilos del recorrido.
+
+    Atributos:
+        done: True cuando el recorrido ha terminado.
+    """
+
+    def __init__(self, rules, threads=CRAWLER_THREADS):
+        self.done = False
+
+        self._rules = rules
+        self._threads = threads
+        self._queue = Queue()
+        self._lock = threading.Lock()
+        self._found = []
+        self._pending = 0
+        self._cancelled = False
+
+    def start(self):
+        """
+        Empieza el recorrido.
+        """
+        self._pending = 1
+        self._queue.put(u"")
+
+        for _ in range(self._threads):
+            thread = threading.Thread(target=self._work)
+            thread.daemon = True
+            thread.start()
+
+    def cancel(self):
+        """
+        Detiene el recorrido.
+        """
+        self._cancelled = True
+
+    def take_files(self):
+        """
+        Devuelve la lista con las rutas relativas (con / como separador) de
+        los ficheros encontrados desde la última llamada.
+        """
+        with self._lock:
+            files = self._found
+            self._found = []
+
+        return files
+
+    def _work(self):
+        """
+        Bucle de cada hilo del recorrido: lista carpetas de la cola hasta que
+        no queda ninguna pendiente.
+        """
+        while (not self.done and not self._cancelled):
+            try:
+                folder = self._queue.get(timeout=0.1)
+            except Empty:
+                continue
+
+            dirs, files = ([], [])
+            try:
+                dirs, files = scan_folder(self._rules, folder)
+            except (IOError, OSError):
+                pass
+            finally:
+                # La carpeta se da por recorrida aunque no se haya podido
+                # listar, para que el recorrido termine siempre.
+                self._folder_scanned(folder, dirs, files)
+
+    def _folder_scanned(self, folder, dirs, files):
+        """
+        Añade los ficheros files de la carpeta folder a los encontrados y sus
+        subcarpetas dirs a la cola, y marca el recorrido como terminado si no
+        queda ninguna carpeta pendiente.
+        """
+        prefix = folder + u"/" if folder else u""
+
+        with self._lock:
+            self._found.extend(prefix + name for name in files)
+            self._pending += len(dirs) - 1
+            if (self._pending == 0):
+                self.done = True
+
+        for name in dirs:
+            self._queue.put(prefix + name)
+
+
+def scan_folder(rules, folder=u""):
+    """
+    Lista una carpeta de un proyecto sin entrar en sus subcarpetas.
+
+    Argumentos:
+        rules: Reglas de exclusión del proyecto (objeto de la clase
+            IgnoreRules), que indican también su carpeta raíz.
+        folder: String con la ruta relativa de la carpeta (con / como
+            separador; por defecto, la raíz).
+
+    Devuelve:
+        Tupla (carpetas, ficheros) con las listas ordenadas de los nombres de
+        las subcarpetas y ficheros no ocultos ni excluidos.
+    """
+    folder_path = os.path.join(rules.root_path, *folder.split(u"/"))
+    prefix = folder + u"/" if folder else u""
+    dirs = []
+    files = []
+
+    for entry in _scan_entries(folder_path):
+        name = entry[0]
+        if (is_hidden(name)):
+            continue
+
+        is_dir = entry[1]()
+        if (rules.is_ignored(prefix + name, is_dir)):
+            continue
+
+        if (is_dir):
+            dirs.append(name)
+        elif (entry[2]()):
+            files.append(name)
+
+    dirs.sort()
+    files.sort()
+
+    return (dirs, files)
+
+
+def walk_project(rules):
+    """
+    Generador que recorre todas las subcarpetas de un proyecto (en anchura y
+    en el hilo que lo consume) devolviendo la ruta relativa (con / como
+    separador) de cada fichero no oculto ni excluido. Las carpetas que no se
+    pueden leer se saltan.
+
+    Argumentos:
+        rules: Reglas de exclusión del proyecto (objeto de la clase
+            IgnoreRules), que indican también su carpeta raíz.
+    """
+    folders = deque([u""])
+    while (folders):
+        folder = folders.popleft()
+        try:
+            dirs, files = scan_folder(rules, folder)
+        except (IOError, OSError):
+            continue
+
+        prefix = folder + u"/" if folder else u""
+        for name in files:
+            yield prefix + name
+        folders.extend(prefix + name for name in dirs)
+
+
+def is_hidden(name):
+    """
+    Devuelve True si el fichero o carpeta name está oculto; False en caso
+    contrario.
+    """
+    return name.startswith('.')
+
+
+def _scan_entries(folder_path):
+    """
+    Generador que recorre las entradas de la carpeta folder_path devolviendo
+    tuplas (nombre, función que indica si es una carpeta, función que indica
+    si es un fichero). Los enlaces simbólicos a carpetas no se recorren.
+
+    Las entradas cuyo nombre no puede decodificarse con la codificación del
+    sistema de ficheros (en Python 2 llegan como bytes) se saltan, ya que el
+    editor no podría mostrarlas ni abrirlas.
+    """
+    if (scandir is not None):
+        for entry in scandir(folder_path):
+            if (isinstance(entry.name, bytes)):
+                continue
+            yield (entry.name,
+                   lambda entry=entry: entry.is_dir(follow_symlinks=False),
+                   entry.is_file)
+    else:
+        for name in os.listdir(folder_path):
+            if (isinstance(name, bytes)):
+                continue
+            path = os.path.join(folder_path, name)
+            yield (name,
+                   lambda path=path: (os.path.isdir(path) and
+                                      not os.path.islink(path)),
+                   lambda path=path: os.path.isfile(path))
+
+
+def _compile_patterns(lines):
+    """
+    Devuelve la lista de reglas de las líneas de un fichero .gitignore
+    indicadas en el argumento lines.
+    """
+    rules = []
+    for line in lines:
+        rule = _compile_pattern(line)
+        if (rule is not None):
+            rules.append(rule)
+
+    return rules
+
+
+def _compile_pattern(line):
+    """
+    Convierte una línea de un fichero .gitignore en una regla.
+
+    Devuelve:
+        Tupla (expresión regular, negada, solo carpetas, anclada) o None si la
+        línea está vacía o es un comentario.
+    """
+    line = line.rstrip()
+    if (not line or line.startswith(u"#")):
+        return None
+
+    negated = line.startswith(u"!")
+    if (negated):
+        line = line[1:]
+
+    dir_only = line.endswith(u"/")
+    line = line.rstrip(u"/")
+
+    # Los patrones con una / (que no sea la final) se aplican a la ruta
+    # relativa a la carpeta del .gitignore; el resto, al nombre.
+    anchored = u"/" in line
+    line = line.lstrip(u"/")
+    if (not line):
+        return None
+
+    regex = u""
+    i = 0
+    while (i < len(line)):
+        if (line.startswith(u"**/", i)):
+            regex += u"(?:.*/)?"
+            i += 3
+        elif (line.startswith(u"**", i)):
+            regex += u".*"
+            i += 2
+        elif (line[i] == u"*"):
+            regex += u"[^/]*"
+            i += 1
+        elif (line[i] == u"?"):
+            regex += u"[^/]"
+            i += 1
+        elif (line[i] == u"[" and u"]" in line[i + 1:]):
+            end = line.index(u"]", i + 1)
+            group = line[i + 1:end]
+            if (group.startswith(u"!")):
+                group = u"^" + group[1:]
+            regex += u"[" + group + u"]"
+            i = end + 1
+        else:
+            regex += re.escape(line[i])
+            i += 1
+
+    return (re.compile(regex + u"$"), negated, dir_only, anchored)
+
+
+if __name__ == "__main__":
+    """
+    En caso de que intentemos ejecutar este módulo.
+    """
+    print(u"Este módulo no puede ser ejecutado", file=sys.stderr)
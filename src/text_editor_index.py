@@ -0,0 +1,848 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Módulo con el índice de contenido persistente del editor de texto.
+
+El índice de cada carpeta abierta se guarda en su propia carpeta de caché y
+contiene, por cada fichero del proyecto (identificado por su ruta, su tamaño
+y su fecha de modificación), la codificación detectada, la tabla con el
+comienzo de cada línea y los trigramas (tres bytes seguidos) que aparecen en
+él, en forma de listas de apariciones: para cada trigrama, los ficheros que
+lo contienen. Así, al volver a abrir la carpeta no hace falta volver a
+analizar los ficheros, y las búsquedas pueden descartar sin leerlos los que
+no contienen el texto buscado.
+
+Formato del fichero de índice: una línea JSON con la cabecera (versión,
+orden de bytes, formatos de texto y posición de cada sección) seguida de las
+secciones binarias, que son arrays de enteros o de números reales en el
+formato nativo de la máquina. Las columnas de cada entrada (tamaño, fecha,
+formato y comienzo de sus líneas) y la lista de trigramas se leen al abrirlo;
+las líneas de cada fichero y las listas de apariciones se leen de la
+proyección en memoria cuando hacen falta.
+
+Autor: Andrés Salinas Lima <i52salia@uco.es>.
+"""
+
+from __future__ import print_function
+from text_editor_io import TextFormat, FALLBACK_ENCODING, EDIT_MODE
+from text_editor_io import classify_file, read_document, write_atomic
+from text_editor_io import is_ascii_compatible
+from text_editor_buffer import index_lines
+from array import array
+from bisect import bisect_left
+import codecs
+import hashlib
+import json
+import mmap
+import sys
+import os
+import threading
+
+
+# Carpeta en la que se guardan los índices (una subcarpeta por carpeta
+# indexada).
+INDEX_FOLDER = os.path.join(os.path.expanduser(u"~"), u".text_editor",
+                            u"index")
+
+# Tamaño máximo de los ficheros cuyo contenido se indexa. Del resto solo se
+# anotan el tamaño y la fecha, para no volver a mirarlos.
+MAX_INDEXED_SIZE = 1024 * 1024
+
+# Número de ficheros leídos entre dos escrituras del índice al disco mientras
+# se actualiza, para no perder todo el trabajo si se cierra el programa.
+CHECKPOINT_FILES = 5000
+
+# Versión del formato del fichero de índice (los índices con otra versión se
+# vuelven a crear).
+_INDEX_VERSION = 1
+
+# Nombre del fichero de índice dentro de la carpeta de caché de la carpeta.
+_INDEX_NAME = u"content.index"
+
+# Valores especiales de la columna de formatos: ficheros de los que solo se
+# conocen el tamaño y la fecha (binarios, demasiado grandes o ilegibles) y
+# entradas borradas (ficheros que han cambiado o desaparecido, que se
+# eliminan del todo al compactar el índice).
+_NO_TEXT = -1
+_REMOVED = -2
+
+# Secciones binarias del fichero de índice, en orden, con su tipo de array.
+_SECTIONS = [
+    (u"sizes", 'd'),
+    (u"mtimes", 'd'),
+    (u"formats", 'i'),
+    (u"line_starts", 'i'),
+    (u"lines", 'i'),
+    (u"keys", 'i'),
+    (u"posting_starts", 'i'),
+    (u"postings", 'i'),
+]
+
+# Bytes que se analizan de una vez al extraer los trigramas de un fichero.
+_TRIGRAM_CHUNK = 64 * 1024
+
+# Tabla para pasar a minúsculas solo las letras ASCII de unos bytes (igual
+# que hacen las búsquedas sin distinguir mayúsculas y minúsculas).
+_ASCII_LOWER = bytearray(range(256))
+_ASCII_LOWER[ord(u"A"):ord(u"Z") + 1] = range(ord(u"a"), ord(u"z") + 1)
+_ASCII_LOWER = bytes(_ASCII_LOWER)
+
+
+class ContentIndex():
+    """
+    Clase ContentIndex: Índice persistente del contenido de los ficheros de
+    una carpeta.
+
+    Puede usarse desde varios hilos a la vez: las consultas siempre ven una
+    versión completa del índice, y update escribe una versión nueva y la
+    sustituye de una vez.
+
+    Argumentos:
+        root_path: String con la ruta a la carpeta indexada.
+        cache_folder: String con la ruta a la carpeta en la que se guardan
+            los índices.
+
+    Atributos:
+        root_path: String con la ruta a la carpeta indexada.
+        index_path: String con la ruta al fichero de índice.
+    """
+
+    def __init__(self, root_path, cache_folder=INDEX_FOLDER):
+        self.root_path = root_path
+
+        name = hashlib.sha1(root_path.encode('utf-8')).hexdigest()
+        self.index_path = os.path.join(cache_folder, name, _INDEX_NAME)
+
+        self._lock = threading.Lock()
+        self._data = _IndexData()
+
+        # Se mantiene bloqueado mientras se guarda una versión del índice,
+        # que se construye a partir de la proyección en memoria de la
+        # anterior, para que close no la cierre mientras tanto.
+        self._save_lock = threading.Lock()
+        self._closed = False
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data.ids)
+
+    def open(self):
+        """
+        Proyecta en memoria el índice guardado en el disco.
+
+        Devuelve:
+            True si se ha abierto; False si no existe o no es válido (en ese
+            caso el índice queda vacío hasta que se actualice).
+        """
+        data = _read_index(self.index_path)
+        if (data is None):
+            return False
+
+        self._replace_data(data)
+        return True
+
+    def close(self):
+        """
+        Cierra la proyección en memoria del índice, que queda vacío. Si se
+        está guardando una versión del índice, espera a que termine; después
+        ya no se guarda ninguna más.
+        """
+        with self._save_lock:
+            self._closed = True
+            self._replace_data(_IndexData())
+
+    def text_format(self, path, size, mtime):
+        """
+        Devuelve el formato (objeto TextFormat) detectado al indexar el
+        fichero con la ruta relativa path (con / como separador) o None si no
+        está indexado o su tamaño (size) o fecha (mtime) han cambiado.
+        """
+        with self._lock:
+            id = self._data.current_id(path, size, mtime)
+            if (id is None):
+                return None
+            return TextFormat(*self._data.text_formats[self._data.formats[id]])
+
+    def line_starts(self, path, size, mtime):
+        """
+        Devuelve un array con la posición de comienzo de cada línea del texto
+        del fichero con la ruta relativa path (una vez decodificado y con los
+        saltos de línea convertidos a u"\\n") o None si no está indexado o su
+        tamaño (size) o fecha (mtime) han cambiado.
+        """
+        with self._lock:
+            id = self._data.current_id(path, size, mtime)
+            if (id is None):
+                return None
+            return array('l', self._data.entry_lines(id))
+
+    def filter_paths(self, paths, query, ignore_case=False):
+        """
+        Generador que devuelve las rutas relativas del iterable paths en las
+        que puede aparecer el texto query. Solo se descartan los ficheros
+        indexados que no han cambiado desde entonces y a los que les falta
+        alguno de los trigramas de query; el resto se devuelven para buscar
+        en ellos.
+
+        Los trigramas son de los bytes de cada fichero (con las letras ASCII
+        en minúsculas), así que si query es ASCII solo se descartan ficheros
+        con codificaciones compatibles con ASCII, y si no lo es, solo ficheros
+        UTF-8 y cuando se distinguen mayúsculas y minúsculas (ignore_case es
+        False).
+        """
+        try:
+            query.encode('ascii')
+            ascii_query = True
+        except UnicodeError:
+            ascii_query = False
+
+        keys = None
+        if (ascii_query or not ignore_case):
+            keys = _trigram_keys(query.encode('utf-8'))
+
+        with self._lock:
+            data = self._data
+            candidates = data.candidates(keys) if keys else None
+            filtered_formats = set(
+                format_id for format_id, (encoding, _, _)
+                in enumerate(data.text_formats)
+                if (is_ascii_compatible(encoding) if ascii_query else
+                    codecs.lookup(encoding).name == u"utf-8"))
+
+        for path in paths:
+            if (candidates is None):
+                yield path
+                continue
+
+            # Solo hace falta comprobar si el fichero ha cambiado cuando el
+            # índice dice que puede descartarse.
+            id = data.ids.get(path)
+            if (id is None or id in candidates or
+                    data.formats[id] not in filtered_formats or
+                    not self._is_current(data, id, path)):
+                yield path
+
+    def update(self, paths, fallback_encoding=FALLBACK_ENCODING,
+               cancelled=None):
+        """
+        Actualiza el índice para que contenga los ficheros con las rutas
+        relativas (con / como separador) del iterable paths. Solo se leen los
+        ficheros nuevos o cuyo tamaño o fecha han cambiado; los demás
+        conservan sus datos. El índice se guarda en el disco cada
+        CHECKPOINT_FILES ficheros leídos y al terminar.
+
+        Argumentos:
+            paths: Iterable con las rutas de todos los ficheros del proyecto
+                (los que no estén se eliminan del índice).
+            fallback_encoding: String con la codificación con la que se leen
+                los ficheros que no son UTF-8.
+            cancelled: Función que devuelve True si hay que dejar de
+                actualizar el índice (opcional).
+
+        Devuelve:
+            Número de ficheros leídos (o None si se ha cancelado).
+
+        Lanza:
+            IOError u OSError si no se puede guardar el índice.
+        """
+        with self._lock:
+            builder = _IndexBuilder(self._data)
+
+        read_count = 0
+        pending = 0
+        seen = set()
+
+        for path in paths:
+            if (cancelled is not None and cancelled()):
+                return None
+
+            seen.add(path)
+            file_path = os.path.join(self.root_path, *path.split(u"/"))
+            try:
+                status = os.stat(file_path)
+            except OSError:
+                continue
+
+            if (builder.is_current(path, status.st_size, status.st_mtime)):
+                continue
+
+            builder.add(path, status.st_size, status.st_mtime,
+                        *_read_entry(file_path, status.st_size,
+                                     fallback_encoding))
+            read_count += 1
+            pending += 1
+
+            if (pending >= CHECKPOINT_FILES):
+                self._save(builder)
+                with self._lock:
+                    builder = _IndexBuilder(self._data)
+                pending = 0
+
+        removed = [path for path in builder.ids if path not in seen]
+        for path in removed:
+            builder.remove(path)
+
+        if (pending or removed or not os.path.exists(self.index_path)):
+            self._save(builder)
+
+        return read_count
+
+    def _save(self, builder):
+        """
+        Escribe en el disco el índice del constructor builder (objeto
+        _IndexBuilder) y pasa a usarlo (salvo que el índice se haya cerrado).
+        """
+        with self._save_lock:
+            if (self._closed):
+                return
+
+            folder_path = os.path.dirname(self.index_path)
+            if (not os.path.isdir(folder_path)):
+                os.makedirs(folder_path)
+
+            builder.write(self.index_path)
+
+            data = _read_index(self.index_path)
+            if (data is not None):
+                self._replace_data(data)
+
+    def _replace_data(self, data):
+        """
+        Sustituye el contenido del índice por data (objeto _IndexData) y
+        cierra la proyección en memoria del anterior.
+        """
+        with self._lock:
+            old_data = self._data
+            self._data = data
+
+        old_data.close()
+
+    def _is_current(self, data, id, path):
+        """
+        Devuelve True si el fichero path no ha cambiado desde que se guardó
+        en la entrada id del índice data.
+        """
+        try:
+            status = os.stat(os.path.join(self.root_path, *path.split(u"/")))
+        except OSError:
+            return False
+
+        return (data.sizes[id] == status.st_size and
+                data.mtimes[id] == status.st_mtime)
+
+
+class ContentIndexer():
+    """
+    Clase ContentIndexer: Actualiza un índice de contenido en un hilo
+    secundario.
+
+    Argumentos:
+        index: Objeto ContentIndex.
+        paths: Lista con las rutas relativas de los ficheros del proyecto.
+        fallback_encoding: String con la codificación con la que se leen los
+            ficheros que no son UTF-8.
+
+    Atributos:
+        done: True cuando la actualización ha terminado.
+    """
+
+    def __init__(self, index, paths, fallback_encoding=FALLBACK_ENCODING):
+        self.done = False
+
+        self._index = index
+        self._paths = paths
+        self._fallback_encoding = fallback_encoding
+        self._cancelled = False
+
+    def start(self):
+        """
+        Empieza la actualización.
+        """
+        thread = threading.Thread(target=self._work)
+        thread.daemon = True
+        thread.start()
+
+    def cancel(self):
+        """
+        Detiene la actualización (lo ya guardado en el disco se conserva).
+        """
+        self._cancelled = True
+
+    def _work(self):
+        """
+        Actualiza el índice (en el hilo secundario).
+        """
+        try:
+            self._index.update(self._paths, self._fallback_encoding,
+                               lambda: self._cancelled)
+        except (IOError, OSError, ValueError):
+            # El índice es solo una caché: si no puede guardarse (o se ha
+            # cerrado su proyección en memoria mientras se actualizaba), el
+            # editor sigue funcionando sin él.
+            pass
+        finally:
+            self.done = True
+
+
+class _IndexData():
+    """
+    Clase _IndexData: Contenido de una versión del índice.
+
+    Las columnas de las entradas y la lista de trigramas están en memoria;
+    las líneas y las listas de apariciones se leen de la proyección en
+    memoria del fichero de índice (o de los arrays lines y postings si el
+    índice no se ha leído de un fichero).
+    """
+
+    def __init__(self):
+        self.paths = []
+        self.ids = {}
+        self.text_formats = []
+
+        self.sizes = array('d')
+        self.mtimes = array('d')
+        self.formats = array('i')
+        self.line_starts = array('i', [0])
+        self.keys = array('i')
+        self.posting_starts = array('i', [0])
+        self.lines = array('i')
+        self.postings = array('i')
+
+        self._map = None
+        self._file = None
+        self._sections = {}
+
+    def current_id(self, path, size, mtime):
+        """
+        Devuelve el identificador de la entrada con texto del fichero path si
+        su tamaño y fecha siguen siendo size y mtime (o None si no).
+        """
+        id = self.ids.get(path)
+        if (id is None or self.formats[id] < 0 or
+                self.sizes[id] != size or self.mtimes[id] != mtime):
+            return None
+        return id
+
+    def entry_lines(self, id):
+        """
+        Devuelve el array con el comienzo de cada línea de la entrada id.
+        """
+        return self._slice(u"lines", self.lines, self.line_starts[id],
+                           self.line_starts[id + 1])
+
+    def key_postings(self, position):
+        """
+        Devuelve el array con los identificadores de los ficheros que
+        contienen el trigrama de la posición position de la lista de
+        trigramas.
+        """
+        return self._slice(u"postings", self.postings,
+                           self.posting_starts[position],
+                           self.posting_starts[position + 1])
+
+    def candidates(self, keys):
+        """
+        Devuelve el conjunto de identificadores de los ficheros que contienen
+        todos los trigramas del array keys.
+        """
+        positions = []
+        for key in keys:
+            position = bisect_left(self.keys, key)
+            if (position == len(self.keys) or self.keys[position] != key):
+                return set()
+            positions.append(position)
+
+        # Empezamos por las listas más cortas para reducir el conjunto lo
+        # antes posible.
+        positions.sort(key=lambda position: (self.posting_starts[position + 1] -
+                                             self.posting_starts[position]))
+
+        ids = set(self.key_postings(positions[0]))
+        for position in positions[1:]:
+            if (not ids):
+                break
+            ids.intersection_update(self.key_postings(position))
+
+        return ids
+
+    def section_bytes(self, name, values):
+        """
+        Devuelve los bytes de la sección name (o del array values si el
+        índice no se ha leído de un fichero).
+        """
+        if (self._map is None):
+            return _array_bytes(values)
+
+        offset, length = self._sections[name]
+        return self._map[offset:offset + length]
+
+    def close(self):
+        """
+        Cierra la proyección en memoria del fichero de índice (si la hay).
+        """
+        if (self._map is not None):
+            self._map.close()
+            self._file.close()
+            self._map = None
+            self._file = None
+
+    def _slice(self, name, values, start, end):
+        """
+        Devuelve el array con los elementos start a end de la sección name
+        (o del array values si el índice no se ha leído de un fichero).
+        """
+        if (self._map is None):
+            return values[start:end]
+
+        offset = self._sections[name][0]
+        item_size = values.itemsize
+        return array(values.typecode,
+                     self._map[offset + start * item_size:
+                               offset + end * item_size])
+
+
+class _IndexBuilder():
+    """
+    Clase _IndexBuilder: Versión nueva de un índice que se va construyendo a
+    partir de la anterior.
+
+    Las entradas que no cambian conservan su identificador, así que sus
+    líneas y sus apariciones se copian tal cual; las de los ficheros que han
+    cambiado o desaparecido se marcan como borradas y los ficheros nuevos se
+    añaden al final. Cuando hay más entradas borradas que vivas, al
+    escribirlo se compacta.
+
+    Argumentos:
+        data: Objeto _IndexData con la versión anterior del índice.
+    """
+
+    def __init__(self, data):
+        self.ids = dict(data.ids)
+
+        self._data = data
+        self._paths = list(data.paths)
+        self._text_formats = [list(text_format)
+                              for text_format in data.text_formats]
+        self._sizes = array('d', data.sizes)
+        self._mtimes = array('d', data.mtimes)
+        self._formats = array('i', data.formats)
+        self._line_starts = array('i', data.line_starts)
+        self._removed = data.formats.count(_REMOVED)
+
+        # Líneas de las entradas nuevas (por identificador) y apariciones
+        # nuevas de cada trigrama.
+        self._new_lines = {}
+        self._new_postings = {}
+
+    def is_current(self, path, size, mtime):
+        """
+        Devuelve True si el índice ya tiene el fichero path con el tamaño
+        size y la fecha mtime.
+        """
+        id = self.ids.get(path)
+        return (id is not None and self._sizes[id] == size and
+                self._mtimes[id] == mtime)
+
+    def add(self, path, size, mtime, text_format, lines, keys):
+        """
+        Añade (o sustituye) la entrada del fichero path con su tamaño, su
+        fecha, su formato (objeto TextFormat o None si no se ha indexado su
+        contenido), el array con el comienzo de sus líneas y el array de
+        claves de sus trigramas.
+        """
+        self.remove(path)
+
+        format_id = _NO_TEXT
+        if (text_format is not None):
+            description = [text_format.encoding, text_format.bom,
+                           text_format.newline]
+            if (description not in self._text_formats):
+                self._text_formats.append(description)
+            format_id = self._text_formats.index(description)
+
+        id = len(self._paths)
+        self.ids[path] = id
+        self._paths.append(path)
+        self._sizes.append(size)
+        self._mtimes.append(mtime)
+        self._formats.append(format_id)
+        self._line_starts.append(self._line_starts[-1] + len(lines))
+        self._new_lines[id] = lines
+
+        for key in keys:
+            postings = self._new_postings.get(key)
+            if (postings is None):
+                postings = self._new_postings[key] = array('i')
+            postings.append(id)
+
+    def remove(self, path):
+        """
+        Marca como borrada la entrada del fichero path (si la hay).
+        """
+        id = self.ids.pop(path, None)
+        if (id is not None):
+            self._paths[id] = u""
+            self._formats[id] = _REMOVED
+            self._removed += 1
+
+    def write(self, index_path):
+        """
+        Escribe el índice de forma atómica en el fichero index_path.
+        """
+        if (self._removed > len(self.ids)):
+            _IndexBuilder(self._compact()).write(index_path)
+            return
+
+        data = self._data
+        lines = [data.section_bytes(u"lines", data.lines)]
+        lines.extend(_array_bytes(self._new_lines[id])
+                     for id in sorted(self._new_lines))
+
+        keys, posting_starts, postings = self._merge_postings()
+
+        sections = [
+            _array_bytes(self._sizes),
+            _array_bytes(self._mtimes),
+            _array_bytes(self._formats),
+            _array_bytes(self._line_starts),
+            lines,
+            _array_bytes(keys),
+            _array_bytes(posting_starts),
+            postings,
+        ]
+        paths = u"\n".join(self._paths).encode('utf-8')
+
+        # La cabecera indica dónde empieza cada sección a partir del final de
+        # la propia cabecera.
+        offsets = {u"paths": [0, len(paths)]}
+        position = len(paths)
+        for (name, _), section in zip(_SECTIONS, sections):
+            if (not isinstance(section, list)):
+                section = [section]
+            length = sum(len(chunk) for chunk in section)
+            offsets[name] = [position, length]
+            position += length
+
+        header = {
+            u"version": _INDEX_VERSION,
+            u"byteorder": sys.byteorder,
+            u"itemsizes": [array('i').itemsize, array('d').itemsize],
+            u"count": len(self._paths),
+            u"formats": self._text_formats,
+            u"sections": offsets,
+        }
+
+        chunks = [(json.dumps(header) + u"\n").encode('ascii'), paths]
+        for section in sections:
+            if (isinstance(section, list)):
+                chunks.extend(section)
+            else:
+                chunks.append(section)
+
+        write_atomic(index_path, chunks)
+
+    def _merge_postings(self):
+        """
+        Junta las apariciones de cada trigrama del índice anterior con las
+        nuevas.
+
+        Devuelve:
+            Tupla (claves, comienzos, apariciones): el array ordenado de
+            claves de los trigramas, el array con el comienzo de la lista de
+            apariciones de cada una y la lista de bloques de bytes con las
+            apariciones.
+        """
+        data = self._data
+        old_keys = data.keys
+        new_keys = sorted(self._new_postings)
+
+        keys = array('i')
+        posting_starts = array('i', [0])
+        postings = []
+
+        old_position = 0
+        new_position = 0
+        while (old_position < len(old_keys) or new_position < len(new_keys)):
+            if (new_position == len(new_keys) or
+                    (old_position < len(old_keys) and
+                     old_keys[old_position] < new_keys[new_position])):
+                key = old_keys[old_position]
+                ids = data.key_postings(old_position)
+                old_position += 1
+            else:
+                key = new_keys[new_position]
+                ids = array('i')
+                if (old_position < len(old_keys) and
+                        old_keys[old_position] == key):
+                    ids = data.key_postings(old_position)
+                    old_position += 1
+                ids.extend(self._new_postings[key])
+                new_position += 1
+
+            keys.append(key)
+            posting_starts.append(posting_starts[-1] + len(ids))
+            postings.append(_array_bytes(ids))
+
+        return (keys, posting_starts, postings)
+
+    def _compact(self):
+        """
+        Devuelve el contenido del índice (objeto _IndexData) sin las entradas
+        borradas, renumerando las demás.
+        """
+        data = self._data
+        live = [id for id in range(len(self._paths))
+                if self._formats[id] != _REMOVED]
+        new_ids = dict((id, new_id) for new_id, id in enumerate(live))
+
+        compacted = _IndexData()
+        compacted.paths = [self._paths[id] for id in live]
+        compacted.ids = dict((path, new_ids[id])
+                             for path, id in self.ids.items())
+        compacted.text_formats = self._text_formats
+        compacted.sizes = array('d', (self._sizes[id] for id in live))
+        compacted.mtimes = array('d', (self._mtimes[id] for id in live))
+        compacted.formats = array('i', (self._formats[id] for id in live))
+
+        for id in live:
+            lines = self._new_lines.get(id)
+            if (lines is None):
+                lines = data.entry_lines(id)
+            compacted.lines.extend(lines)
+            compacted.line_starts.append(len(compacted.lines))
+
+        keys = sorted(set(data.keys) | set(self._new_postings))
+        for key in keys:
+            ids = array('i')
+            position = bisect_left(data.keys, key)
+            if (position < len(data.keys) and data.keys[position] == key):
+                ids.extend(data.key_postings(position))
+            ids.extend(self._new_postings.get(key, ()))
+
+            ids = [new_ids[id] for id in ids if id in new_ids]
+            if (ids):
+                compacted.keys.append(key)
+                compacted.postings.extend(ids)
+                compacted.posting_starts.append(len(compacted.postings))
+
+        return compacted
+
+
+def _read_entry(file_path, size, fallback_encoding):
+    """
+    Lee un fichero para indexarlo.
+
+    Devuelve:
+        Tupla (formato, líneas, trigramas) con el formato detectado (objeto
+        TextFormat, o None si no se indexa su contenido porque es binario,
+        demasiado grande o no se puede leer), el array con el comienzo de
+        cada línea y el array de claves de los trigramas.
+    """
+    try:
+        if (size > MAX_INDEXED_SIZE or classify_file(file_path) != EDIT_MODE):
+            return (None, array('i'), array('i'))
+
+        with open(file_path, 'rb') as file:
+            keys = _trigram_keys(file.read())
+        text, text_format = read_document(
+            file_path, fallback_encoding=fallback_encoding)
+    except (IOError, OSError, UnicodeError):
+        return (None, array('i'), array('i'))
+
+    return (text_format, array('i', index_lines(text)), keys)
+
+
+def _trigram_keys(data):
+    """
+    Devuelve un array ordenado con las claves de los trigramas distintos
+    (tres bytes seguidos, con las letras ASCII en minúsculas) de los bytes
+    data.
+    """
+    trigrams = set()
+    for start in range(0, max(len(data) - 2, 0), _TRIGRAM_CHUNK):
+        chunk = bytearray(
+            data[start:start + _TRIGRAM_CHUNK + 2].translate(_ASCII_LOWER))
+        trigrams.update(zip(chunk, chunk[1:], chunk[2:]))
+
+    return array('i', sorted((first << 16) | (second << 8) | third
+                             for first, second, third in trigrams))
+
+
+def _read_index(index_path):
+    """
+    Abre y proyecta en memoria el fichero de índice index_path.
+
+    Devuelve:
+        Objeto _IndexData (o None si el fichero no existe o no es válido, por
+        ejemplo porque se creó con otra versión o en otra máquina).
+    """
+    try:
+        file = open(index_path, 'rb')
+    except (IOError, OSError):
+        return None
+
+    try:
+        index_map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    except (IOError, OSError, ValueError):
+        file.close()
+        return None
+
+    try:
+        header_end = index_map.find(b"\n") + 1
+        header = json.loads(index_map[:header_end].decode('ascii'))
+        if (header.get(u"version") != _INDEX_VERSION or
+                header.get(u"byteorder") != sys.byteorder or
+                header.get(u"itemsizes") != [array('i').itemsize,
+                                             array('d').itemsize]):
+            raise ValueError(u"Índice incompatible")
+
+        data = _IndexData()
+        data.text_formats = header[u"formats"]
+        data._sections = dict(
+            (name, (header_end + offset, length))
+            for name, (offset, length) in header[u"sections"].items())
+
+        offset, length = data._sections[u"paths"]
+        if (header[u"count"]):
+            data.paths = index_map[offset:offset + length].decode(
+                'utf-8').split(u"\n")
+        data.ids = dict((path, id) for id, path in enumerate(data.paths)
+                        if path)
+
+        # Las columnas y la lista de trigramas se leen enteras; las líneas y
+        # las apariciones se quedan en la proyección.
+        for name, typecode in _SECTIONS:
+            if (name in (u"lines", u"postings")):
+                continue
+            offset, length = data._sections[name]
+            setattr(data, name,
+                    array(typecode, index_map[offset:offset + length]))
+
+        if (len(data.paths) != header[u"count"] or
+                len(data.sizes) != header[u"count"]):
+            raise ValueError(u"Índice incompleto")
+    except (ValueError, KeyError, TypeError, IndexError):
+        index_map.close()
+        file.close()
+        return None
+
+    data._map = index_map
+    data._file = file
+    return data
+
+
+def _array_bytes(values):
+    """
+    Devuelve los bytes del array values.
+    """
+    if (hasattr(values, 'tobytes')):
+        return values.tobytes()
+    return values.tostring()
+
+
+if __name__ == "__main__":
+    """
+    En caso de que intentemos ejecutar este módulo.
+    """
+    print(u"Este módulo no puede ser ejecutado", file=sys.stderr)
@@ -0,0 +1,707 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Módulo con utilidades de entrada/salida de ficheros del editor de texto.
+
+Autor: Andrés Salinas Lima <i52salia@uco.es>.
+"""
+
+from __future__ import print_function
+from collections import OrderedDict
+import codecs
+import mmap
+import shutil
+import stat
+import sys
+import os
+import tempfile
+
+
+# Tamaño (en bytes) a partir del cual un fichero se abre en modo fichero
+# grande (proyectado en memoria y paginado) en lugar de leerse entero.
+LARGE_FILE_THRESHOLD = 16 * 1024 * 1024
+
+# Tamaño aproximado (en bytes) de cada página de un fichero grande.
+PAGE_SIZE = 1024 * 1024
+
+# Distancia máxima (en bytes) que se busca un salto de línea para terminar una
+# página en una línea completa.
+_NEWLINE_LOOKAHEAD = 4096
+
+# Número de páginas decodificadas que se mantienen en caché.
+_PAGE_CACHE_SIZE = 8
+
+# Tamaño (en bytes) de los bloques en los que se leen y escriben los ficheros.
+IO_CHUNK_SIZE = 1024 * 1024
+
+# Sufijo de las copias de seguridad que se hacen al guardar.
+BACKUP_SUFFIX = u"~"
+
+# Bytes del principio de cada fichero con los que se detecta su codificación
+# y sus saltos de línea.
+SNIFF_SIZE = 8 * 1024
+
+# Codificación con la que se leen los ficheros que no son UTF-8 (latin-1
+# puede decodificar cualquier secuencia de bytes).
+FALLBACK_ENCODING = u"latin-1"
+
+# Modos en los que se puede abrir un fichero (ver classify_file): edición,
+# solo lectura por páginas (ficheros de texto grandes) y vista hexadecimal
+# (ficheros binarios).
+EDIT_MODE = u"edit"
+PAGED_MODE = u"paged"
+HEX_MODE = u"hex"
+
+# Proporción máxima de bytes de control y de errores de decodificación UTF-8
+# en el principio de un fichero de texto. Por encima se considera binario.
+_BINARY_CONTROL_RATIO = 0.1
+_BINARY_ERROR_RATIO = 0.3
+
+# Bytes que pueden aparecer en un fichero de texto: los imprimibles y los
+# caracteres de control habituales (tabulador, saltos de línea, retroceso,
+# salto de página y escape).
+_TEXT_BYTES = bytes(bytearray(range(0x20, 0x7f)) +
+                    bytearray(range(0x80, 0x100)) +
+                    bytearray(b"\t\n\r\b\f\x1b"))
+
+# Marcas de orden de bytes (BOM) y su codificación. Las de UTF-32 van antes
+# porque la de UTF-32 LE empieza igual que la de UTF-16 LE.
+_BOMS = [
+    (codecs.BOM_UTF32_LE, u"utf-32-le"),
+    (codecs.BOM_UTF32_BE, u"utf-32-be"),
+    (codecs.BOM_UTF8, u"utf-8"),
+    (codecs.BOM_UTF16_LE, u"utf-16-le"),
+    (codecs.BOM_UTF16_BE, u"utf-16-be"),
+]
+
+
+# Texto con el que se comprueba si una codificación es compatible con ASCII.
+_ASCII_SAMPLE = u"Az09\n"
+_ASCII_SAMPLE_BYTES = b"Az09\n"
+
+
+class OperationCancelled(Exception):
+    """
+    Excepción OperationCancelled: Se lanza cuando el usuario cancela una
+    operación de lectura o escritura de un fichero.
+    """
+    pass
+
+
+class TextFormat():
+    """
+    Clase TextFormat: Formato de un fichero de texto (codificación, marca de
+    orden de bytes y saltos de línea), que se conserva al guardarlo.
+
+    Argumentos:
+        encoding: String con el nombre de la codificación.
+        bom: True si el fichero empieza con una marca de orden de bytes.
+        newline: String con el salto de línea del fichero (u"\\n", u"\\r\\n"
+            o u"\\r").
+
+    Atributos:
+        encoding, bom, newline: Ver argumentos.
+    """
+
+    def __init__(self, encoding=u"utf-8", bom=False, newline=u"\n"):
+        self.encoding = encoding
+        self.bom = bom
+        self.newline = newline
+
+    def bom_bytes(self):
+        """
+        Devuelve los bytes de la marca de orden de bytes del fichero (vacíos
+        si no tiene).
+        """
+        if (self.bom):
+            for data, encoding in _BOMS:
+                if (encoding == self.encoding):
+                    return data
+        return b""
+
+    def is_default(self):
+        """
+        Devuelve True si es el formato con el que se guarda el texto del
+        editor sin convertirlo (UTF-8 sin BOM y saltos de línea u"\\n").
+        """
+        return (codecs.lookup(self.encoding).name == u"utf-8" and
+                not self.bom and self.newline == u"\n")
+
+
+class MappedTextFile():
+    """
+    Clase MappedTextFile: Fichero de texto proyectado en memoria (mmap) que
+    se decodifica página a página bajo demanda.
+
+    Solo se decodifican las páginas que se piden, por lo que la memoria usada
+    no depende del tamaño del fichero. Los límites de página se colocan
+    siempre tras un salto de línea o, si no hay ninguno cerca, al principio de
+    un carácter completo (en UTF-8, fuera de una secuencia multibyte; en
+    UTF-16 y UTF-32, al principio de una unidad de código y fuera de un par
+    subrogado), de forma que ningún carácter quede partido entre dos páginas.
+
+    Argumentos:
+        file_path: String con la ruta al fichero.
+        page_size: Tamaño aproximado (en bytes) de cada página.
+        encoding: String con la codificación del fichero (por defecto,
+            UTF-8).
+        offset: Número de bytes del principio del fichero que se saltan (por
+            ejemplo, la marca de orden de bytes).
+
+    Atributos:
+        file_path: String con la ruta al fichero.
+        encoding: String con la codificación del fichero.
+        size: Tamaño del fichero en bytes.
+        page_count: Número de páginas del fichero.
+    """
+
+    def __init__(self, file_path, page_size=PAGE_SIZE, encoding=u"utf-8",
+                 offset=0):
+        self.file_path = file_path
+        self.encoding = encoding
+        self.size = 0
+        self.page_count = 0
+
+        # Tamaño de la unidad de código de la codificación y bytes del salto
+        # de línea en ella.
+        name = codecs.lookup(encoding).name
+        self._unit = (2 if name.startswith(u"utf-16") else
+                      4 if name.startswith(u"utf-32") else 1)
+        self._utf8 = (name == u"utf-8")
+        self._newline = codecs.getencoder(encoding)(u"\n")[0][-self._unit:]
+
+        self._offset = offset
+        self._page_size = page_size
+        self._pages = OrderedDict()  # Caché LRU de páginas decodificadas.
+        self._map = None
+        self._file = open(file_path, 'rb')
+
+        try:
+            self.size = os.fstat(self._file.fileno()).st_size
+
+            # No se puede proyectar en memoria un fichero vacío.
+            if (self.size > 0):
+                self._map = mmap.mmap(self._file.fileno(), 0,
+                                      access=mmap.ACCESS_READ)
+
+            self.page_count = (max(self.size - offset, 0) + page_size -
+                               1) // page_size
+        except:
+            self.close()
+            raise
+
+    def page(self, index):
+        """
+        Devuelve un string unicode con el contenido de la página indicada en
+        el argumento index.
+        """
+        if (index in self._pages):
+            # Marcamos la página como usada recientemente.
+            data = self._pages.pop(index)
+            self._pages[index] = data
+            return data
+
+        start, end = self.page_bounds(index)
+        data = codecs.getincrementaldecoder(self.encoding)(
+            errors='replace').decode(self._map[start:end], final=True)
+
+        self._pages[index] = data
+        if (len(self._pages) > _PAGE_CACHE_SIZE):
+            self._pages.popitem(last=False)
+
+        return data
+
+    def page_bounds(self, index):
+        """
+        Devuelve una tupla (inicio, fin) con las posiciones en bytes de la
+        página indicada en el argumento index.
+        """
+        if (index < 0 or index >= self.page_count):
+            raise IndexError(u"Página fuera de rango")
+
+        return (self._boundary(self._offset + index * self._page_size),
+                self._boundary(self._offset + (index + 1) * self._page_size))
+
+    def iter_chunks(self, chunk_size=PAGE_SIZE):
+        """
+        Generador que recorre el fichero completo devolviendo trozos de texto
+        unicode de aproximadamente chunk_size bytes.
+
+        Usa un decodificador incremental, por lo que las secuencias multibyte
+        partidas entre dos trozos se decodifican correctamente.
+        """
+        decoder = codecs.getincrementaldecoder(self.encoding)(
+            errors='replace')
+
+        for offset in range(self._offset, self.size, chunk_size):
+            data = decoder.decode(self._map[offset:offset + chunk_size])
+            if (data):
+                yield data
+
+        data = decoder.decode(b"", final=True)
+        if (data):
+            yield data
+
+    def close(self):
+        """
+        Libera la proyección en memoria y cierra el fichero.
+        """
+        self._pages.clear()
+
+        if (self._map is not None):
+            self._map.close()
+            self._map = None
+
+        if (self._file is not None):
+            self._file.close()
+            self._file = None
+
+    def _boundary(self, offset):
+        """
+        Ajusta la posición en bytes indicada en el argumento offset al límite
+        de página más cercano por delante (tras un salto de línea o al
+        principio de un carácter).
+        """
+        if (offset <= self._offset):
+            return self._offset
+        if (offset >= self.size):
+            return self.size
+
+        # Las páginas siempre empiezan al principio de una unidad de código.
+        offset -= (offset - self._offset) % self._unit
+
+        # Preferimos terminar la página con una línea completa...
+        end = min(offset + _NEWLINE_LOOKAHEAD, self.size)
+        newline = self._map.find(self._newline, offset, end)
+        while (newline != -1 and (newline - self._offset) % self._unit):
+            newline = self._map.find(self._newline, newline + 1, end)
+        if (newline != -1):
+            return newline + self._unit
+
+        # ... y si no, retrocedemos hasta el primer byte de un carácter (los
+        # bytes de continuación UTF-8 tienen la forma 10xxxxxx y la segunda
+        # mitad de un par subrogado UTF-16 está entre 0xDC00 y 0xDFFF).
+        if (self._utf8):
+            for _ in range(3):
+                if ((ord(self._map[offset:offset + 1]) & 0xC0) != 0x80):
+                    break
+                offset -= 1
+        elif (self._unit == 2 and offset - 2 >= self._offset):
+            unit = bytearray(self._map[offset:offset + 2])
+            high = unit[1] if self.encoding.endswith(u"le") else unit[0]
+            if (0xDC <= high <= 0xDF):
+                offset -= 2
+
+        return offset
+
+
+def read_text(file_path, progress=None, cancelled=None, encoding=u"utf-8",
+              offset=0):
+    """
+    Lee el fichero indicado en el argumento file_path por bloques.
+
+    Argumentos:
+        file_path: String con la ruta al fichero.
+        progress: Función a la que se llama tras cada bloque con los bytes
+            leídos y el tamaño total del fichero (opcional).
+        cancelled: Función que devuelve True si la operación se ha cancelado
+            (opcional).
+        encoding: String con la codificación del fichero (por defecto,
+            UTF-8).
+        offset: Número de bytes del principio del fichero que se saltan (por
+            ejemplo, la marca de orden de bytes).
+
+    Devuelve:
+        String unicode con el contenido del fichero.
+
+    Lanza:
+        OperationCancelled si la operación se cancela.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)()
+    chunks = []
+    done = offset
+
+    with open(file_path, 'rb') as file:
+        total = os.fstat(file.fileno()).st_size
+        file.seek(offset)
+
+        while (True):
+            if (cancelled is not None and cancelled()):
+                raise OperationCancelled()
+
+            data = file.read(IO_CHUNK_SIZE)
+            chunks.append(decoder.decode(data, final=not data))
+            if (not data):
+                break
+
+            done += len(data)
+            if (progress is not None):
+                progress(done, total)
+
+    return u"".join(chunks)
+
+
+class MappedBinaryFile():
+    """
+    Clase MappedBinaryFile: Fichero binario proyectado en memoria (mmap) del
+    que solo se leen los bytes que se piden.
+
+    Argumentos:
+        file_path: String con la ruta al fichero.
+
+    Atributos:
+        file_path: String con la ruta al fichero.
+        size: Tamaño del fichero en bytes.
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.size = 0
+
+        self._map = None
+        self._file = open(file_path, 'rb')
+
+        try:
+            self.size = os.fstat(self._file.fileno()).st_size
+            if (self.size > 0):
+                self._map = mmap.mmap(self._file.fileno(), 0,
+                                      access=mmap.ACCESS_READ)
+        except:
+            self.close()
+            raise
+
+    def read(self, offset, count):
+        """
+        Devuelve los count bytes del fichero a partir de la posición offset
+        (menos si se llega al final).
+        """
+        if (self._map is None):
+            return b""
+        return self._map[offset:offset + count]
+
+    def close(self):
+        """
+        Cierra el fichero y libera su proyección en memoria.
+        """
+        if (self._map is not None):
+            self._map.close()
+            self._map = None
+        if (self._file is not None):
+            self._file.close()
+            self._file = None
+
+
+def classify_file(file_path):
+    """
+    Decide cómo abrir un fichero mirando solo su tamaño y sus primeros bytes
+    (ver SNIFF_SIZE), sin leerlo entero.
+
+    Devuelve:
+        HEX_MODE si el fichero parece binario, PAGED_MODE si es un fichero de
+        texto grande y EDIT_MODE en caso contrario.
+    """
+    with open(file_path, 'rb') as file:
+        size = os.fstat(file.fileno()).st_size
+        head = file.read(SNIFF_SIZE)
+
+    if (is_binary(head)):
+        return HEX_MODE
+    if (size > LARGE_FILE_THRESHOLD):
+        return PAGED_MODE
+    return EDIT_MODE
+
+
+def is_binary(head):
+    """
+    Devuelve True si los primeros bytes head de un fichero parecen de un
+    fichero binario: tienen bytes nulos (sin ser UTF-16 o UTF-32), demasiados
+    bytes de control o demasiados errores al decodificarlos como UTF-8.
+    """
+    if (not head):
+        return False
+
+    for data, _ in _BOMS:
+        if (head.startswith(data)):
+            return False
+
+    if (b"\0" in head):
+        return _utf16_encoding(head) is None
+
+    control = len(head.translate(None, _TEXT_BYTES))
+    if (control > len(head) * _BINARY_CONTROL_RATIO):
+        return True
+
+    text = codecs.getincrementaldecoder('utf-8')('replace').decode(head)
+    return text.count(u"\ufffd") > len(head) * _BINARY_ERROR_RATIO
+
+
+def sniff_format(head, fallback_encoding=FALLBACK_ENCODING):
+    """
+    Detecta el formato de un fichero de texto a partir de sus primeros bytes
+    (ver SNIFF_SIZE): la marca de orden de bytes, si es UTF-8 válido (o UTF-16
+    sin marca) y el salto de línea más frecuente.
+
+    Argumentos:
+        head: Bytes del principio del fichero.
+        fallback_encoding: String con la codificación que se supone si el
+            fichero no es UTF-8.
+
+    Devuelve:
+        Objeto TextFormat con el formato detectado.
+    """
+    text_format = TextFormat()
+
+    for data, encoding in _BOMS:
+        if (head.startswith(data)):
+            text_format.encoding = encoding
+            text_format.bom = True
+            head = head[len(data):]
+            break
+    else:
+        text_format.encoding = _guess_encoding(head, fallback_encoding)
+
+    # La última secuencia puede estar partida, así que no se decodifica como
+    # final.
+    decoder = codecs.getincrementaldecoder(text_format.encoding)('replace')
+    text = decoder.decode(head, final=False)
+
+    crlf = text.count(u"\r\n")
+    lf = text.count(u"\n") - crlf
+    cr = text.count(u"\r") - crlf
+    if (crlf > lf and crlf >= cr):
+        text_format.newline = u"\r\n"
+    elif (cr > lf):
+        text_format.newline = u"\r"
+
+    return text_format
+
+
+def is_ascii_compatible(encoding):
+    """
+    Devuelve True si la codificación encoding representa los caracteres
+    ASCII con sus mismos bytes (como UTF-8 o Latin-1, pero no UTF-16), de
+    forma que un texto ASCII puede buscarse directamente en los bytes del
+    fichero; False en caso contrario.
+    """
+    try:
+        return codecs.encode(_ASCII_SAMPLE, encoding) == _ASCII_SAMPLE_BYTES
+    except LookupError:
+        return False
+
+
+def _guess_encoding(head, fallback_encoding):
+    """
+    Devuelve la codificación de un fichero sin marca de orden de bytes a
+    partir de sus primeros bytes head.
+    """
+    if (b"\0" in head):
+        encoding = _utf16_encoding(head)
+        if (encoding is not None):
+            return encoding
+
+    try:
+        codecs.getincrementaldecoder('utf-8')().decode(head, final=False)
+        return u"utf-8"
+    except UnicodeDecodeError:
+        return fallback_encoding
+
+
+def _utf16_encoding(head):
+    """
+    Devuelve la codificación UTF-16 (little o big endian) de un fichero sin
+    marca de orden de bytes a partir de sus primeros bytes head, o None si no
+    parece UTF-16.
+    """
+    # El texto UTF-16 con caracteres latinos tiene un byte nulo en casi todas
+    # las posiciones pares (big endian) o impares (little endian).
+    pairs = len(head) // 2
+    if (pairs >= 2):
+        even_nulls = head[0:pairs * 2:2].count(b"\0")
+        odd_nulls = head[1:pairs * 2:2].count(b"\0")
+        if (odd_nulls > pairs * 0.6 and even_nulls < pairs * 0.1):
+            return u"utf-16-le"
+        if (even_nulls > pairs * 0.6 and odd_nulls < pairs * 0.1):
+            return u"utf-16-be"
+
+    return None
+
+
+def read_document(file_path, progress=None, cancelled=None,
+                  fallback_encoding=FALLBACK_ENCODING, text_format=None):
+    """
+    Lee un fichero de texto detectando antes su formato (ver sniff_format).
+    Los saltos de línea se convierten a u"\\n".
+
+    Argumentos:
+        file_path: String con la ruta al fichero.
+        progress, cancelled: Ver read_text.
+        fallback_encoding: String con la codificación que se usa si el
+            fichero no es UTF-8.
+        text_format: Formato del fichero (objeto TextFormat) si ya se conoce,
+            por ejemplo del índice de contenido (opcional; si no se indica,
+            se detecta).
+
+    Devuelve:
+        Tupla (string unicode con el contenido, objeto TextFormat con su
+        formato).
+
+    Lanza:
+        OperationCancelled si la operación se cancela.
+    """
+    if (text_format is None):
+        with open(file_path, 'rb') as file:
+            text_format = sniff_format(file.read(SNIFF_SIZE),
+                                       fallback_encoding)
+
+    try:
+        text = read_text(file_path, progress, cancelled, text_format.encoding,
+                         len(text_format.bom_bytes()))
+    except UnicodeDecodeError:
+        # El principio del fichero era UTF-8 válido, pero el resto no. Se
+        # vuelve a leer entero (con los bytes de la marca de orden de bytes,
+        # si la tenía, como texto), así que se guarda igual que estaba.
+        if (text_format.encoding != u"utf-8"):
+            raise
+        text_format.encoding = fallback_encoding
+        text_format.bom = False
+        text = read_text(file_path, progress, cancelled, fallback_encoding)
+
+    if (u"\r" in text):
+        text = text.replace(u"\r\n", u"\n").replace(u"\r", u"\n")
+
+    return (text, text_format)
+
+
+def encode_text(chunks, text_format):
+    """
+    Generador que codifica con el formato text_format (objeto TextFormat) los
+    trozos de texto unicode (con saltos de línea u"\\n") del iterable chunks.
+
+    Lanza:
+        UnicodeEncodeError si el texto tiene caracteres que no existen en la
+        codificación del formato.
+    """
+    encoder = codecs.getincrementalencoder(text_format.encoding)()
+    newline = text_format.newline
+
+    bom = text_format.bom_bytes()
+    if (bom):
+        yield bom
+
+    for chunk in chunks:
+        if (newline != u"\n"):
+            chunk = chunk.replace(u"\n", newline)
+        yield encoder.encode(chunk)
+
+    yield encoder.encode(u"", final=True)
+
+
+def write_atomic(file_path, chunks, keep_backup=False,
+                 backup_suffix=BACKUP_SUFFIX):
+    """
+    Escribe de forma atómica en el fichero indicado en el argumento file_path
+    los bloques de bytes que devuelve el iterable chunks.
+
+    Los bloques se escriben según llegan en un fichero temporal de la misma
+    carpeta, que se sincroniza con el disco (fsync) y después se renombra
+    sobre el fichero de destino. Si algo falla (o se cancela) antes del
+    renombrado, el fichero original queda intacto.
+
+    Si file_path es un enlace simbólico, se escribe en el fichero al que
+    apunta (el enlace se conserva).
+
+    Argumentos:
+        file_path: String con la ruta al fichero.
+        chunks: Iterable con los bloques de bytes a escribir.
+        keep_backup: Si es True, se conserva una copia del fichero anterior
+            con el sufijo backup_suffix.
+        backup_suffix: String con el sufijo de la copia de seguridad.
+    """
+    # El fichero temporal se crea junto al fichero real para que el
+    # renombrado no sustituya el enlace.
+    file_path = os.path.realpath(file_path)
+    folder_path, file_name = os.path.split(file_path)
+    descriptor, temp_path = tempfile.mkstemp(
+        prefix=u"." + file_name + u".", suffix=u".tmp", dir=folder_path)
+
+    try:
+        with os.fdopen(descriptor, 'wb') as file:
+            for chunk in chunks:
+                file.write(chunk)
+
+            file.flush()
+            os.fsync(file.fileno())
+
+        if (os.path.exists(file_path)):
+            # El fichero temporal se crea solo con permisos para el usuario:
+            # le damos los permisos del fichero que va a sustituir.
+            os.chmod(temp_path, stat.S_IMODE(os.stat(file_path).st_mode))
+
+            if (keep_backup):
+                _make_backup(file_path, file_path + backup_suffix)
+
+        _replace(temp_path, file_path)
+    except:
+        if (os.path.exists(temp_path)):
+            os.remove(temp_path)
+        raise
+
+    _fsync_folder(folder_path)
+
+
+def _make_backup(file_path, backup_path):
+    """
+    Crea (o sustituye) en backup_path una copia del fichero file_path. Si es
+    posible se usa un enlace duro, que no copia los datos.
+    """
+    if (os.path.exists(backup_path)):
+        os.remove(backup_path)
+
+    try:
+        os.link(file_path, backup_path)
+    except (AttributeError, OSError):
+        shutil.copy2(file_path, backup_path)
+
+
+def _replace(source_path, destination_path):
+    """
+    Renombra el fichero source_path a destination_path, sustituyéndolo si ya
+    existe.
+    """
+    if (hasattr(os, 'replace')):
+        os.replace(source_path, destination_path)
+    elif (os.name == 'nt' and os.path.exists(destination_path)):
+        # En Windows os.rename no sustituye ficheros existentes.
+        os.remove(destination_path)
+        os.rename(source_path, destination_path)
+    else:
+        os.rename(source_path, destination_path)
+
+
+def _fsync_folder(folder_path):
+    """
+    Sincroniza con el disco la carpeta indicada para que el renombrado sea
+    persistente (solo en sistemas que lo permiten).
+    """
+    if (not hasattr(os, 'O_DIRECTORY')):
+        return
+
+    try:
+        descriptor = os.open(folder_path, os.O_RDONLY | os.O_DIRECTORY)
+    except OSError:
+        return
+
+    try:
+        os.fsync(descriptor)
+    except OSError:
+        pass
+    finally:
+        os.close(descriptor)
+
+
+if __name__ == "__main__":
+    """
+    En caso de que intentemos ejecutar este módulo.
+    """
+    print(u"Este módulo no puede ser ejecutado", file=sys.stderr)
@@ -0,0 +1,301 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Módulo con el diario de ediciones del editor de texto, que permite recuperar
+los cambios sin guardar tras un cierre inesperado del programa.
+
+Autor: Andrés Salinas Lima <i52salia@uco.es>.
+"""
+
+from __future__ import print_function
+from text_editor_io import write_atomic
+import atexit
+import hashlib
+import json
+import sys
+import os
+import threading
+import time
+
+
+# Carpeta en la que se guardan los diarios de ediciones.
+JOURNAL_FOLDER = os.path.join(os.path.expanduser(u"~"), u".text_editor",
+                              u"journal")
+
+# Segundos entre dos escrituras de las ediciones pendientes al disco.
+FLUSH_INTERVAL = 0.3
+
+# Operaciones que se guardan en el diario.
+INSERT = u"insert"  # Argumentos: (posición, texto).
+DELETE = u"delete"  # Argumentos: (posición, número de caracteres).
+SET_TEXT = u"set"  # Argumentos: (texto).
+
+
+class EditJournal():
+    """
+    Clase EditJournal: Diario de las ediciones sin guardar de los documentos
+    abiertos.
+
+    Cada documento tiene su propio fichero de diario, en el que solo se
+    añaden líneas JSON: una cabecera con el tamaño y la fecha de modificación
+    del fichero cuando se leyó o guardó por última vez, seguida de las
+    inserciones y borrados hechos desde entonces. Las ediciones se acumulan
+    en memoria y un hilo secundario las escribe cada FLUSH_INTERVAL segundos,
+    por lo que cada escritura es proporcional a lo editado y no al tamaño del
+    documento.
+
+    Argumentos:
+        folder_path: String con la ruta a la carpeta de los diarios.
+        interval: Segundos entre dos escrituras al disco.
+
+    Atributos:
+        folder_path: String con la ruta a la carpeta de los diarios.
+    """
+
+    def __init__(self, folder_path=JOURNAL_FOLDER, interval=FLUSH_INTERVAL):
+        self.folder_path = folder_path
+
+        self._interval = interval
+        self._lock = threading.Lock()  # Protege el estado en memoria.
+        self._io_lock = threading.Lock()  # Protege los ficheros de diario.
+        self._pending = {}  # Líneas por escribir de cada documento.
+        self._stamps = {}  # Tamaño y fecha de cada fichero al leerlo.
+        self._started = set()  # Documentos con la cabecera ya añadida.
+        self._thread = None
+
+    def track(self, file_path):
+        """
+        Empieza un diario nuevo (vacío) para el fichero file_path, que se
+        acaba de leer o guardar, descartando las ediciones anteriores.
+        """
+        self.discard(file_path)
+
+        with self._lock:
+            self._stamps[file_path] = _file_stamp(file_path)
+
+    def restore(self, file_path, operations):
+        """
+        Sustituye el diario del fichero file_path, que se acaba de leer, por
+        uno con las ediciones recuperadas operations (ver recover) que se le
+        han aplicado, y sigue anotando las siguientes a continuación.
+
+        El diario anterior se sustituye de forma atómica, así que las
+        ediciones recuperadas no se pierden aunque el programa vuelva a
+        cerrarse mientras se recuperan.
+        """
+        stamp = _file_stamp(file_path)
+        lines = [_json_line({u"file": file_path, u"stamp": stamp})]
+        lines.extend(_json_line(list(operation)) for operation in operations)
+
+        with self._io_lock:
+            with self._lock:
+                self._pending.pop(file_path, None)
+                self._stamps[file_path] = stamp
+                self._started.add(file_path)
+
+            try:
+                write_atomic(self._journal_path(file_path), lines)
+            except (IOError, OSError):
+                pass
+
+    def record_insert(self, file_path, position, text):
+        """
+        Anota en el diario del fichero file_path la inserción del string
+        unicode text en la posición position.
+        """
+        self._record(file_path, [INSERT, position, text])
+
+    def record_delete(self, file_path, position, count):
+        """
+        Anota en el diario del fichero file_path el borrado de count
+        caracteres a partir de la posición position.
+        """
+        self._record(file_path, [DELETE, position, count])
+
+    def record_text(self, file_path, text):
+        """
+        Anota en el diario del fichero file_path la sustitución de todo su
+        contenido por el string unicode text.
+        """
+        self._record(file_path, [SET_TEXT, text])
+
+    def discard(self, file_path):
+        """
+        Borra el diario del fichero file_path (por ejemplo, porque se ha
+        guardado o se han descartado sus cambios).
+        """
+        with self._io_lock:
+            with self._lock:
+                self._pending.pop(file_path, None)
+                self._started.discard(file_path)
+                self._stamps.pop(file_path, None)
+
+            try:
+                os.remove(self._journal_path(file_path))
+            except OSError:
+                pass
+
+    def flush(self):
+        """
+        Escribe en el disco las ediciones pendientes de todos los documentos.
+        """
+        with self._io_lock:
+            with self._lock:
+                pending = self._pending
+                self._pending = {}
+
+            if (not pending):
+                return
+
+            try:
+                if (not os.path.isdir(self.folder_path)):
+                    os.makedirs(self.folder_path)
+
+                for file_path, lines in pending.items():
+                    with open(self._journal_path(file_path), 'ab') as file:
+                        file.write(b"".join(lines))
+                        file.flush()
+                        os.fsync(file.fileno())
+            except (IOError, OSError):
+                # El diario es solo una copia de seguridad: si no puede
+                # escribirse, el editor sigue funcionando sin él.
+                pass
+
+    def recover(self):
+        """
+        Lee los diarios que quedan en la carpeta de diarios (los de ficheros
+        que no se guardaron antes de cerrar el programa). Los diarios de
+        ficheros que han cambiado en el disco desde entonces no pueden
+        aplicarse y se borran.
+
+        Devuelve:
+            Lista de tuplas (ruta, operaciones) con la ruta de cada fichero y
+            la lista de sus ediciones: tuplas (INSERT, posición, texto),
+            (DELETE, posición, número de caracteres) o (SET_TEXT, texto).
+        """
+        try:
+            names = sorted(os.listdir(self.folder_path))
+        except OSError:
+            return []
+
+        recovered = []
+        for name in names:
+            if (not name.endswith(u".journal")):
+                continue
+
+            journal_path = os.path.join(self.folder_path, name)
+            header, operations = _read_journal(journal_path)
+
+            if (header is not None and operations and
+                    _file_stamp(header[u"file"]) == header[u"stamp"]):
+                recovered.append((header[u"file"], operations))
+            else:
+                try:
+                    os.remove(journal_path)
+                except OSError:
+                    pass
+
+        return recovered
+
+    def _record(self, file_path, entry):
+        """
+        Añade la línea JSON de la lista entry a las ediciones pendientes del
+        fichero file_path (con la cabecera del diario si es la primera).
+        """
+        with self._lock:
+            lines = self._pending.setdefault(file_path, [])
+
+            if (file_path not in self._started):
+                stamp = self._stamps.get(file_path)
+                if (stamp is None):
+                    stamp = self._stamps[file_path] = _file_stamp(file_path)
+                lines.append(_json_line({u"file": file_path,
+                                         u"stamp": stamp}))
+                self._started.add(file_path)
+
+            lines.append(_json_line(entry))
+
+            if (self._thread is None):
+                self._thread = threading.Thread(target=self._work)
+                self._thread.daemon = True
+                self._thread.start()
+                # Las ediciones de los últimos instantes también se guardan
+                # al salir del programa.
+                atexit.register(self.flush)
+
+    def _work(self):
+        """
+        Bucle del hilo secundario que escribe las ediciones pendientes.
+        """
+        while (True):
+            time.sleep(self._interval)
+            self.flush()
+
+    def _journal_path(self, file_path):
+        """
+        Devuelve la ruta al fichero de diario del fichero file_path.
+        """
+        name = hashlib.sha1(file_path.encode('utf-8')).hexdigest()
+        return os.path.join(self.folder_path, name + u".journal")
+
+
+def _file_stamp(file_path):
+    """
+    Devuelve una lista [tamaño, fecha de modificación] del fichero file_path
+    (o None si no existe) para saber si ha cambiado en el disco.
+    """
+    try:
+        status = os.stat(file_path)
+    except OSError:
+        return None
+    return [status.st_size, status.st_mtime]
+
+
+def _json_line(entry):
+    """
+    Devuelve la línea (bytes terminados en salto de línea) del diario con la
+    entrada entry codificada en JSON.
+    """
+    return (json.dumps(entry) + u"\n").encode('ascii')
+
+
+def _read_journal(journal_path):
+    """
+    Lee el fichero de diario journal_path.
+
+    Devuelve:
+        Tupla (cabecera, operaciones) con el diccionario de la cabecera (o
+        None si el diario no es válido) y la lista de operaciones. Si el
+        programa se cerró mientras se escribía la última línea, esta se
+        ignora.
+    """
+    header = None
+    operations = []
+
+    try:
+        with open(journal_path, 'rb') as file:
+            for line in file:
+                try:
+                    entry = json.loads(line.decode('ascii'))
+                except ValueError:
+                    break
+
+                if (header is None):
+                    if (not isinstance(entry, dict) or
+                            entry.get(u"stamp") is None):
+                        return (None, [])
+                    header = entry
+                else:
+                    operations.append(tuple(entry))
+    except (IOError, OSError):
+        return (None, [])
+
+    return (header, operations)
+
+
+if __name__ == "__main__":
+    """
+    En caso de que intentemos ejecutar este módulo.
+    """
+    print(u"Este módulo no puede ser ejecutado", file=sys.stderr)
@@ -8,10 +8,76 @@ Autor: Andrés Salinas Lima <i52salia@uco.es>.
 """
 
 from __future__ import print_function
-from text_editor_view import TextEditorDialogs
-import codecs
+from text_editor_io import MappedTextFile, OperationCancelled, TextFormat
+from text_editor_io import MappedBinaryFile, HEX_MODE, PAGED_MODE
+from text_editor_io import IO_CHUNK_SIZE, FALLBACK_ENCODING, classify_file
+from text_editor_io import SNIFF_SIZE, sniff_format
+from text_editor_io import encode_text, read_document, read_text, write_atomic
+from text_editor_buffer import PieceTable
+from text_editor_folder import FolderIndex, IgnoreRules, ProjectCrawler
+from text_editor_folder import scan_folder, walk_project
+from text_editor_search import FolderSearch, QuickOpenIndex, MAX_RESULTS
+from text_editor_journal import EditJournal, INSERT, DELETE, SET_TEXT
+from text_editor_index import ContentIndex, ContentIndexer
+from text_editor_trace import traced
+from collections import OrderedDict
+import atexit
+import hashlib
+import re
+import shutil
 import sys
 import os
+import tempfile
+import time
+
+
+# Eventos que el modelo notifica a sus observadores (ver add_observer).
+FOLDER_OPENED = u"folder_opened"  # Se ha abierto otra carpeta.
+FOLDER_CHANGED = u"folder_changed"  # Argumentos: (añadidos, eliminados).
+FILE_OPENED = u"file_opened"  # Se ha abierto otro fichero.
+FILE_SAVED = u"file_saved"  # Argumentos: (ruta anterior, ruta nueva).
+PROJECT_FILES_FOUND = u"project_files_found"  # Argumentos: (rutas, terminado).
+DOCUMENT_SWITCHED = u"document_switched"  # Se ha cambiado de documento.
+DOCUMENT_CLOSED = u"document_closed"  # Argumentos: (ruta).
+DOCUMENT_EVICTED = u"document_evicted"  # Argumentos: (ruta).
+
+
+class TextEditorError(Exception):
+    """
+    Excepción TextEditorError: Error de una operación del modelo. Su mensaje
+    explica el error al usuario.
+    """
+    pass
+
+
+class FolderOpenError(TextEditorError):
+    """
+    Excepción FolderOpenError: Se lanza cuando no se puede abrir o volver a
+    leer una carpeta.
+    """
+    pass
+
+
+class FileOpenError(TextEditorError):
+    """
+    Excepción FileOpenError: Se lanza cuando no se puede abrir un fichero.
+    """
+    pass
+
+
+class FileSaveError(TextEditorError):
+    """
+    Excepción FileSaveError: Se lanza cuando no se puede guardar un fichero.
+    """
+    pass
+
+
+class ReadOnlyFileError(FileSaveError):
+    """
+    Excepción ReadOnlyFileError: Se lanza al intentar guardar un fichero
+    abierto en modo solo lectura (ficheros grandes y binarios).
+    """
+    pass
 
 
 class TextEditorModel():
@@ -20,94 +86,1445 @@ class TextEditorModel():
 
     Atributos:
         opened_file_path: String con la ruta al fichero abierto.
-        opened_file_data: String con el contenido del fichero abierto.
+        opened_file_data: Documento (objeto de la clase PieceTable) con el
+            contenido del fichero abierto.
+        opened_file_pages: Objeto MappedTextFile con el fichero abierto si
+            este es demasiado grande para cargarse entero (modo fichero grande,
+            solo lectura); None en caso contrario.
+        opened_file_binary: Objeto MappedBinaryFile con el fichero abierto si
+            este es binario (se muestra en hexadecimal, solo lectura); None en
+            caso contrario.
+        opened_file_generation: Contador de modificaciones del fichero abierto.
+        opened_file_format: Formato (objeto de la clase TextFormat) del
+            fichero abierto, con el que se vuelve a guardar.
+        fallback_encoding: String con la codificación con la que se leen los
+            ficheros que no son UTF-8.
+        max_edit_lines: Número máximo de líneas de un fichero para abrirlo en
+            modo edición; los que tienen más se abren como ficheros grandes
+            (None para no poner límite).
+        check_content_hash: Si es True, se guarda un hash del contenido del
+            fichero abierto para detectar cuándo el usuario deshace a mano sus
+            cambios.
+        keep_backup: Si es True, al guardar un fichero se conserva una copia
+            del anterior con el sufijo BACKUP_SUFFIX (de text_editor_io).
+        last_save_time: Segundos que tardó el último guardado.
         opened_folder_path: String con la ruta a la carpeta abierta.
-        opened_folder_files: Lista con los ficheros de la carpeta abierta.
+        opened_folder_files: Lista ordenada con los ficheros de la carpeta
+            abierta.
+        project_files: Lista con las rutas relativas (con / como separador)
+            de los ficheros de la carpeta abierta y todas sus subcarpetas
+            encontrados hasta ahora por el recorrido en segundo plano.
+        crawl_project: Si es True, al abrir una carpeta se recorren en segundo
+            plano todas sus subcarpetas para llenar project_files.
+        quick_open_index: Índice (objeto de la clase QuickOpenIndex) con los
+            ficheros de la carpeta abierta (y de sus subcarpetas a medida que
+            se van encontrando) para buscarlos por nombre.
+        index_content: Si es True, se mantiene en el disco un índice del
+            contenido de los ficheros de la carpeta abierta, que se actualiza
+            en segundo plano al terminar el recorrido del proyecto.
+        content_index: Índice de contenido (objeto de la clase ContentIndex)
+            de la carpeta abierta (None si index_content es False). Con él se
+            evita volver a analizar los ficheros al abrirlos y se descartan
+            sin leerlos los que no pueden contener el texto buscado en la
+            carpeta.
+        open_documents: Lista con las rutas de los documentos abiertos (en
+            el orden de sus pestañas). Los atributos opened_file_* son los del
+            documento activo.
+        inactive_documents_budget: Número máximo de caracteres que pueden
+            ocupar en memoria los documentos abiertos que no son el activo.
+            Al superarlo se descargan los menos usados: los que no tienen
+            cambios se vuelven a leer del disco cuando hacen falta y los que
+            tienen cambios se vuelcan a un fichero de intercambio.
+        journal: Diario de ediciones (objeto de la clase EditJournal) en el
+            que se anotan los cambios sin guardar de los documentos abiertos
+            para poder recuperarlos con recover_documents si el programa se
+            cierra inesperadamente (None para no usar diario).
     """
 
     def __init__(self):
         self.opened_file_path = u""
-        self.opened_file_data = u""
+        self.opened_file_data = PieceTable()
+        self.opened_file_pages = None
+        self.opened_file_binary = None
+        self.opened_file_generation = 0
+        self.opened_file_format = TextFormat()
+        self.fallback_encoding = FALLBACK_ENCODING
+        self.max_edit_lines = 1000000
+        self.check_content_hash = True
+        self.keep_backup = False
+        self.last_save_time = 0.0
         self.opened_folder_path = u""
         self.opened_folder_files = []
 
+        self.project_files = []
+        self.crawl_project = True
+        self.quick_open_index = QuickOpenIndex()
+        self.index_content = True
+        self.content_index = None
+
+        self.open_documents = []
+        self.inactive_documents_budget = 64 * 1024 * 1024
+        self.journal = EditJournal()
+
+        # Estado de cada documento abierto (objetos _Document), del menos al
+        # más usado recientemente. El del documento activo solo se actualiza
+        # al cambiar de documento.
+        self._documents = OrderedDict()
+
+        # Carpeta temporal con los ficheros de intercambio.
+        self._swap_folder = None
+
+        # Índice (objeto FolderIndex) con los ficheros de la carpeta abierta.
+        self._folder_index = None
+
+        # Reglas de exclusión (objeto IgnoreRules) y recorrido en segundo plano
+        # (objeto ProjectCrawler) del proyecto de la carpeta abierta.
+        self._ignore_rules = None
+        self._crawler = None
+
+        # Actualización en segundo plano del índice de contenido (objeto
+        # ContentIndexer).
+        self._indexer = None
+
+        # Búsqueda de texto en los ficheros de la carpeta abierta (objeto
+        # FolderSearch, con sus procesos de búsqueda).
+        self._folder_search = FolderSearch()
+
+        # Estado de la última versión guardada del fichero abierto.
+        self._saved_generation = 0
+        self._saved_length = 0
+        self._saved_hash = None
+        self._saved_text = None
+
+        # Hash del contenido actual (y generación a la que corresponde).
+        self._hash_cache = (None, None)
+
+        # Texto completo del fichero abierto para las búsquedas (documento y
+        # generación a los que corresponde) y última expresión compilada.
+        self._text_cache = (None, None, None)
+        self._find_cache = (None, None)
+
+        # Funciones a las que se notifican los cambios del modelo.
+        self._observers = []
+
+    def add_observer(self, observer):
+        """
+        Registra la función observer para que se le notifiquen los cambios del
+        modelo. Se le llamará con el evento (FOLDER_OPENED, FOLDER_CHANGED,
+        FILE_OPENED, FILE_SAVED, PROJECT_FILES_FOUND, DOCUMENT_SWITCHED,
+        DOCUMENT_CLOSED o DOCUMENT_EVICTED) seguido de sus argumentos.
+        """
+        self._observers.append(observer)
+
+    def _notify(self, event, *args):
+        """
+        Notifica el evento indicado (con sus argumentos) a los observadores.
+        """
+        for observer in self._observers:
+            observer(event, *args)
+
+    @traced(u"model.open_folder")
     def open_folder(self, folder_path):
         """
         Abre la carpeta indicada en el argumento folder_path para cargar todos
         sus ficheros en la lista de ficheros self.opened_folder_files.
+
+        Lanza:
+            FolderOpenError si no se puede abrir la carpeta.
         """
         try:
-            folder_path = folder_path
-            folder_path = unicode(os.path.abspath(folder_path))
-
-            # Obtenemos la lista con los ficheros de la carpeta.
-            self.opened_folder_files = self._list_not_hidden_files(folder_path)
-
-            # Añadimos el separador de fichero ('/' en Linux y Mac, '\' en
-            # Windows) al final de la ruta que se almacena en la etiqueta.
-            if (folder_path[-1] != os.path.sep):
-                self.opened_folder_path = folder_path + os.path.sep
-            else:
-                self.opened_folder_path = folder_path
-        except:
-            TextEditorDialogs.show_error_message(
+            folder = self.load_folder(folder_path)
+        except (IOError, OSError, UnicodeError):
+            raise FolderOpenError(
                 u"No se pudo abrir la carpeta \"" + folder_path + u"\"")
 
+        self.set_opened_folder(*folder)
+
+    @traced(u"model.load_folder")
+    def load_folder(self, folder_path, progress=None, cancelled=None):
+        """
+        Lee la lista de ficheros de la carpeta indicada en el argumento
+        folder_path sin modificar el modelo, por lo que puede llamarse desde
+        un hilo secundario. El resultado se pasa después a set_opened_folder.
+
+        Los argumentos progress y cancelled solo están por compatibilidad con
+        las demás operaciones en segundo plano (ver load_file).
+
+        Devuelve:
+            Tupla (ruta, índice) con la ruta absoluta a la carpeta y su índice
+            de ficheros (objeto FolderIndex).
+
+        Lanza:
+            IOError u OSError si no se puede leer la carpeta; UnicodeError si
+            su ruta no puede decodificarse.
+        """
+        folder_path = unicode(os.path.abspath(folder_path))
+
+        folder_index = FolderIndex(folder_path)
+        folder_index.refresh()
+
+        return (folder_path, folder_index)
+
+    def set_opened_folder(self, folder_path, folder_index):
+        """
+        Establece como carpeta abierta la leída por load_folder (ruta absoluta
+        folder_path e índice folder_index).
+
+        Si es la carpeta que ya se estaba mostrando con la lista guardada en
+        la sesión anterior (ver restore_folder), solo se notifican los
+        ficheros que han aparecido o desaparecido desde entonces.
+        """
+        if (self._folder_index is None and
+                _folder_path_with_separator(folder_path) ==
+                self.opened_folder_path):
+            cached_files = set(self.opened_folder_files)
+            files = set(folder_index.files)
+            added = sorted(files - cached_files)
+            removed = sorted(cached_files - files)
+
+            self._folder_index = folder_index
+            self.opened_folder_files = folder_index.files
+
+            if (added or removed):
+                self.quick_open_index.remove(removed)
+                self.quick_open_index.add(added)
+                self._notify(FOLDER_CHANGED, added, removed)
+            return
+
+        self._folder_index = folder_index
+        self._show_folder(folder_path, folder_index.files)
+
+    def restore_folder(self, folder_path, files):
+        """
+        Abre la carpeta folder_path con la lista de ficheros files guardada en
+        la sesión anterior, sin leerla del disco, para poder mostrarla al
+        instante. La lista debe revalidarse después leyendo la carpeta con
+        load_folder y set_opened_folder.
+        """
+        self._folder_index = None
+        self._show_folder(unicode(os.path.abspath(folder_path)),
+                          sorted(files))
+
+    def _show_folder(self, folder_path, files):
+        """
+        Establece como carpeta abierta folder_path (ruta absoluta) con la
+        lista ordenada de ficheros files y notifica el cambio.
+        """
+        self.opened_folder_path = _folder_path_with_separator(folder_path)
+        self.opened_folder_files = files
+        self._ignore_rules = IgnoreRules(folder_path)
+
+        # El índice guardado se proyecta en memoria sin leer ningún fichero;
+        # se pone al día cuando termina el recorrido del proyecto.
+        self._close_content_index()
+        if (self.index_content):
+            self.content_index = ContentIndex(folder_path)
+            self.content_index.open()
+
+        self._cancel_crawl()
+        self._folder_search.cancel()
+        self.project_files = []
+        self.quick_open_index = QuickOpenIndex()
+        self.quick_open_index.add(self.opened_folder_files)
+
+        self._notify(FOLDER_OPENED)
+
+    @traced(u"model.open_file")
     def open_file(self, file_path):
         """
         Abre el fichero indicado en el argumento file_path.
+
+        Lanza:
+            FileOpenError si no se puede leer el fichero.
         """
         try:
-            with codecs.open(file_path, 'r', encoding='utf-8') as file:
-                self.opened_file_data = unicode(file.read())
-                self.opened_file_path = file_path
-
-                file.close()
-        except:
-            TextEditorDialogs.show_error_message(
+            content = self.load_file(file_path)
+        except (IOError, OSError, UnicodeError):
+            raise FileOpenError(
                 u"No se pudo abrir el fichero \"" + file_path + u"\"")
 
+        self.set_opened_file(file_path, *content)
+
+    @traced(u"model.load_file")
+    def load_file(self, file_path, progress=None, cancelled=None):
+        """
+        Lee el fichero indicado en el argumento file_path sin modificar el
+        modelo, por lo que puede llamarse desde un hilo secundario. El
+        resultado se pasa después a set_opened_file.
+
+        Argumentos:
+            file_path: String con la ruta al fichero.
+            progress: Función a la que se llama con los bytes leídos y el
+                tamaño total del fichero (opcional).
+            cancelled: Función que devuelve True si la operación se ha
+                cancelado (opcional).
+
+        Devuelve:
+            Tupla (contenido, formato): el contenido es un string unicode
+            (con saltos de línea u"\\n"), un objeto MappedTextFile si el
+            fichero es demasiado grande para cargarse entero o un objeto
+            MappedBinaryFile si es binario; el formato es un objeto TextFormat
+            con la codificación y los saltos de línea detectados (None para
+            los ficheros binarios).
+        """
+        # Antes de leerlo entero miramos su tamaño y su principio: los
+        # ficheros binarios se muestran en hexadecimal y los grandes no se
+        # leen enteros, sino que se proyectan en memoria y la vista solo
+        # recibe las páginas (o filas) que se están mostrando.
+        mode = classify_file(file_path)
+        if (mode == HEX_MODE):
+            return (MappedBinaryFile(file_path), None)
+        if (mode == PAGED_MODE):
+            with open(file_path, 'rb') as file:
+                text_format = sniff_format(file.read(SNIFF_SIZE),
+                                           self.fallback_encoding)
+            return (self._mapped_text_file(file_path, text_format),
+                    text_format)
+
+        # Si el fichero está en el índice de contenido, no hace falta volver
+        # a detectar su formato. Se lee una sola vez content_index, porque el
+        # hilo principal puede cerrarlo mientras tanto.
+        text_format = None
+        index = self.content_index
+        indexed_file = self._indexed_file(index, file_path)
+        if (indexed_file is not None):
+            text_format = index.text_format(*indexed_file)
+
+        text, text_format = read_document(file_path, progress, cancelled,
+                                          self.fallback_encoding, text_format)
+        text = unicode(text)
+
+        # Los ficheros con demasiadas líneas (aunque sean cortas) también se
+        # muestran por páginas.
+        if (self.max_edit_lines is not None and
+                text.count(u"\n") >= self.max_edit_lines):
+            return (self._mapped_text_file(file_path, text_format),
+                    text_format)
+
+        return (text, text_format)
+
+    def _mapped_text_file(self, file_path, text_format):
+        """
+        Devuelve un objeto MappedTextFile con el fichero indicado en el
+        argumento file_path, que se decodifica con la codificación del
+        formato text_format saltando su marca de orden de bytes.
+        """
+        return MappedTextFile(file_path, encoding=text_format.encoding,
+                              offset=len(text_format.bom_bytes()))
+
+    @traced(u"model.set_opened_file")
+    def set_opened_file(self, file_path, content, text_format=None):
+        """
+        Establece como fichero abierto el indicado en el argumento file_path
+        con el contenido content y el formato text_format obtenidos con
+        load_file. Si el fichero ya estaba abierto, su contenido se sustituye;
+        si no, se añade a los documentos abiertos.
+        """
+        if (file_path == self.opened_file_path):
+            self._close_pages()
+            self._documents.pop(file_path, None)
+        else:
+            self._store_document()
+            self._discard_document(self._documents.pop(file_path, None))
+
+        document = _Document(file_path)
+        if (text_format is not None):
+            document.text_format = text_format
+        if (isinstance(content, MappedTextFile)):
+            document.pages = content
+            content = None
+        elif (isinstance(content, MappedBinaryFile)):
+            document.binary = content
+            content = None
+        else:
+            document.data = PieceTable(
+                content, self._indexed_line_starts(file_path, content))
+
+        self._restore_document(document)
+        # El hash del contenido leído solo se calcula si llega a hacer falta.
+        self._mark_saved(None, self.opened_file_generation,
+                         len(self.opened_file_data), content)
+
+        self._add_document(file_path, document)
+        self._evict_documents()
+
+        if (self.journal is not None and file_path):
+            self.journal.track(file_path)
+
+        self._notify(FILE_OPENED)
+
+    def switch_document(self, file_path):
+        """
+        Cambia el documento activo por el documento abierto file_path sin
+        leerlo del disco (salvo su fichero de intercambio, si se había
+        volcado).
+
+        Devuelve:
+            True si se ha cambiado de documento; False si el documento no está
+            abierto o se descargó de memoria sin cambios, en cuyo caso hay que
+            volver a leerlo con load_file y set_opened_file.
+        """
+        if (file_path == self.opened_file_path):
+            return True
+
+        document = self._documents.get(file_path)
+        if (document is None or (document.data is None and
+                                 document.pages is None and
+                                 document.binary is None and
+                                 document.swap_path is None)):
+            return False
+
+        if (document.swap_path is not None):
+            document.data = PieceTable(unicode(read_text(document.swap_path)))
+            self._remove_swap_file(document)
+
+        self._store_document()
+        self._restore_document(document)
+
+        # Lo marcamos como el más usado recientemente.
+        del self._documents[file_path]
+        self._documents[file_path] = document
+        self._evict_documents()
+
+        self._notify(DOCUMENT_SWITCHED)
+        return True
+
+    def close_document(self, file_path):
+        """
+        Cierra el documento abierto file_path (descartando sus cambios). Si era
+        el documento activo, se sustituye por un documento vacío sin nombre.
+        """
+        document = self._documents.pop(file_path, None)
+        if (document is None):
+            return
+
+        self.open_documents.remove(file_path)
+        if (self.journal is not None):
+            self.journal.discard(file_path)
+
+        if (file_path == self.opened_file_path):
+            self._close_pages()
+            self._restore_document(_Document(u""))
+            self._mark_saved(None, 0, 0, u"")
+        else:
+            self._discard_document(document)
+
+        self._notify(DOCUMENT_CLOSED, file_path)
+
+    def is_document_modified(self, file_path):
+        """
+        Devuelve True si el documento abierto file_path tiene cambios sin
+        guardar; False en caso contrario.
+        """
+        if (file_path == self.opened_file_path):
+            return self.is_modified()
+
+        document = self._documents.get(file_path)
+        return (document is not None and
+                document.generation != document.saved_generation)
+
+    def recent_documents(self):
+        """
+        Devuelve la lista con las rutas de los documentos abiertos que no son
+        el activo, del más al menos usado recientemente.
+        """
+        return [path for path in reversed(self._documents)
+                if path != self.opened_file_path]
+
+    def is_read_only(self):
+        """
+        Devuelve True si el fichero abierto no puede guardarse (los ficheros
+        grandes y los binarios se abren en modo solo lectura); False en caso
+        contrario.
+        """
+        return (self.opened_file_pages is not None or
+                self.opened_file_binary is not None)
+
+    @traced(u"model.save_file")
     def save_file(self, file_path):
         """
-        Guarda el archivo abierto en la ruta indicada en el argumento file_path.
+        Guarda el archivo abierto en la ruta indicada en el argumento file_path
+        (con el formato del fichero abierto).
+
+        Lanza:
+            ReadOnlyFileError si el fichero se ha abierto en modo solo
+            lectura.
+            FileSaveError si no se puede escribir el fichero.
         """
+        if (self.is_read_only()):
+            raise ReadOnlyFileError(
+                u"El fichero \"" + self.opened_file_path + u"\" se ha "
+                u"abierto en modo solo lectura")
+
+        generation = self.opened_file_generation
+        document = self.opened_file_data
         try:
-            with codecs.open(file_path, 'w', encoding='utf-8') as file:
-                file.write(unicode(self.opened_file_data))
+            content_hash = self.write_file(file_path, document,
+                                           text_format=self.opened_file_format)
+        except (IOError, OSError, UnicodeError):
+            raise FileSaveError(
+                u"No se pudo guardar en el fichero \"" + file_path + u"\"")
+
+        self.set_saved_file(file_path, generation, len(document),
+                            content_hash)
+
+    @traced(u"model.write_file")
+    def write_file(self, file_path, document, progress=None, cancelled=None,
+                   text_format=None):
+        """
+        Escribe el documento indicado en el argumento document en el fichero
+        file_path sin modificar el modelo, por lo que puede llamarse desde un
+        hilo secundario (con una copia obtenida con PieceTable.snapshot).
+
+        El documento se escribe por bloques en un fichero temporal que después
+        sustituye de forma atómica al fichero de destino (ver write_atomic).
+
+        Argumentos:
+            file_path: String con la ruta al fichero.
+            document: Objeto PieceTable con el documento a guardar.
+            progress: Función a la que se llama con los caracteres escritos y
+                el total del documento (opcional).
+            cancelled: Función que devuelve True si la operación se ha
+                cancelado (opcional).
+            text_format: Objeto TextFormat con la codificación y los saltos
+                de línea con los que se guarda (por defecto, UTF-8 y u"\\n").
+
+        Devuelve:
+            Hash del contenido guardado (o None si no se guardan hashes del
+            contenido).
+        """
+        hash = hashlib.sha1() if self.check_content_hash else None
+        start_time = time.time()
+
+        write_atomic(file_path,
+                     self._encode_chunks(document, hash, progress, cancelled,
+                                         text_format),
+                     self.keep_backup)
+
+        # Registramos lo que ha tardado el guardado para poder vigilarlo.
+        self.last_save_time = time.time() - start_time
+
+        return hash.digest() if hash is not None else None
+
+    def _encode_chunks(self, document, hash, progress, cancelled,
+                       text_format=None):
+        """
+        Devuelve un generador que recorre el documento indicado en el
+        argumento document devolviendo su contenido codificado en bloques de
+        bytes de tamaño limitado, sin construir una copia completa del texto.
+
+        Argumentos:
+            document: Objeto PieceTable con el documento.
+            hash: Objeto hash que se actualiza con los bloques (o None). Se
+                calcula siempre sobre el texto en UTF-8 con saltos u"\\n", así
+                que no depende del formato.
+            progress: Función a la que se llama con los caracteres codificados
+                y el total del documento (o None).
+            cancelled: Función que devuelve True si la operación se ha
+                cancelado (o None).
+            text_format: Objeto TextFormat con el formato del fichero (o None
+                para UTF-8 y u"\\n").
+        """
+        if (text_format is None or text_format.is_default()):
+            return self._document_chunks(document, hash, progress, cancelled,
+                                         True)
+
+        return encode_text(self._document_chunks(document, hash, progress,
+                                                 cancelled, False),
+                           text_format)
+
+    def _document_chunks(self, document, hash, progress, cancelled, encoded):
+        """
+        Generador que recorre el documento document devolviendo su contenido
+        en bloques de tamaño limitado: bytes UTF-8 si encoded es True o
+        strings unicode en caso contrario (ver _encode_chunks).
+        """
+        total = len(document)
+        done = 0
+
+        for piece in document.iter_chunks():
+            for start in range(0, len(piece), IO_CHUNK_SIZE):
+                if (cancelled is not None and cancelled()):
+                    raise OperationCancelled()
 
-                file.close()
+                chunk = piece[start:start + IO_CHUNK_SIZE]
+                if (encoded or hash is not None):
+                    data = chunk.encode('utf-8')
+                    if (hash is not None):
+                        hash.update(data)
 
+                yield data if encoded else chunk
+
+                done += len(chunk)
+                if (progress is not None):
+                    progress(done, total)
+
+    def set_saved_file(self, file_path, generation, length, content_hash,
+                       document_path=None):
+        """
+        Registra que un documento abierto se ha guardado en la ruta file_path.
+
+        Argumentos:
+            file_path: String con la ruta al fichero guardado.
+            generation: Valor del contador de modificaciones cuando se tomó
+                el documento guardado.
+            length: Longitud del documento guardado.
+            content_hash: Hash del contenido guardado (o None).
+            document_path: String con la ruta que tenía el documento cuando se
+                empezó a guardar (por defecto, el documento activo). Permite
+                cambiar de documento mientras se guarda en segundo plano.
+        """
+        if (document_path is None):
+            document_path = self.opened_file_path
+
+        if (document_path == self.opened_file_path):
             self.opened_file_path = file_path
+            self._mark_saved(content_hash, generation, length)
+            self._rename_document(document_path, file_path)
+        elif (document_path in self._documents):
+            document = self._documents[document_path]
+            document.file_path = file_path
+            document.saved_generation = generation
+            document.saved_length = length
+            document.saved_hash = content_hash
+            document.saved_text = None
+            document.hash_cache = (generation, content_hash)
+            self._rename_document(document_path, file_path)
 
-            # Actualizamos los ficheros de la carpeta para que el nuevo fichero
-            # aparezca en el menú lateral.
-            self.reload_folder()
+        if (self.journal is not None):
+            self._restart_journal(document_path, file_path, generation)
 
-            TextEditorDialogs.show_info_message(u"Fichero guardado con éxito!")
-        except:
-            TextEditorDialogs.show_error_message(
-                u"No se pudo guardar en el fichero \"" + file_path + u"\"")
+        # Añadimos el fichero a la lista de ficheros de la carpeta (si está
+        # en ella) para que el nuevo fichero aparezca en el menú lateral.
+        folder_path, file_name = os.path.split(os.path.abspath(file_path))
+        self._notify(FILE_SAVED, document_path, file_path)
+
+        if (self._folder_index is not None and
+                folder_path == self._folder_index.folder_path and
+                self._folder_index.add(unicode(file_name))):
+            self.quick_open_index.add([unicode(file_name)])
+            self._notify(FOLDER_CHANGED, [unicode(file_name)], [])
+
+    def insert_text(self, position, text):
+        """
+        Inserta el string unicode text en la posición indicada en el argumento
+        position del fichero abierto.
+        """
+        self.opened_file_data.insert(position, text)
+        self.opened_file_generation += 1
+
+        if (self.journal is not None and self.opened_file_path):
+            self.journal.record_insert(self.opened_file_path, position, text)
+
+    def delete_text(self, position, count):
+        """
+        Borra count caracteres a partir de la posición indicada en el argumento
+        position del fichero abierto.
+        """
+        self.opened_file_data.delete(position, count)
+        self.opened_file_generation += 1
+
+        if (self.journal is not None and self.opened_file_path):
+            self.journal.record_delete(self.opened_file_path, position, count)
+
+    def set_text(self, text):
+        """
+        Sustituye todo el contenido del fichero abierto por el string unicode
+        text.
+        """
+        self.opened_file_data.set_text(text)
+        self.opened_file_generation += 1
+
+        if (self.journal is not None and self.opened_file_path):
+            self.journal.record_text(self.opened_file_path, text)
+
+    def load_recovered_documents(self, progress=None, cancelled=None):
+        """
+        Lee los ficheros que tenían cambios sin guardar cuando se cerró el
+        programa por última vez (según el diario de ediciones) sin modificar
+        el modelo, por lo que puede llamarse desde un hilo secundario. El
+        resultado se pasa después a recover_documents.
+
+        Los diarios de los ficheros que no pueden decodificarse se borran, ya
+        que sus ediciones no podrían aplicarse nunca; los de los ficheros que
+        no se pueden leer ahora se conservan para intentarlo la próxima vez.
+
+        Argumentos:
+            progress: Función a la que se llama con los ficheros leídos y el
+                total (opcional).
+            cancelled: Función que devuelve True si la operación se ha
+                cancelado (opcional).
+
+        Devuelve:
+            Lista de tuplas (ruta, contenido, operaciones) con la ruta de cada
+            fichero, su contenido leído con load_file y la lista de sus
+            ediciones (ver EditJournal.recover).
+
+        Lanza:
+            OperationCancelled si la operación se cancela.
+        """
+        journal = self.journal
+        if (journal is None):
+            return []
+
+        journals = journal.recover()
+        loaded = []
+        for done, (file_path, operations) in enumerate(journals, 1):
+            if (cancelled is not None and cancelled()):
+                raise OperationCancelled()
+
+            try:
+                loaded.append((file_path,
+                               self.load_file(file_path, None, cancelled),
+                               operations))
+            except (IOError, OSError):
+                pass
+            except UnicodeError:
+                journal.discard(file_path)
+
+            if (progress is not None):
+                progress(done, len(journals))
+
+        return loaded
+
+    def recover_documents(self, loaded=None):
+        """
+        Vuelve a abrir los ficheros que tenían cambios sin guardar cuando se
+        cerró el programa por última vez y les aplica de nuevo esos cambios.
+        Los ficheros que han cambiado en el disco desde entonces no se
+        recuperan.
+
+        Argumentos:
+            loaded: Ficheros leídos con load_recovered_documents (si no se
+                indica, se leen ahora).
+
+        Devuelve:
+            Lista con las rutas de los documentos recuperados.
+        """
+        journal = self.journal
+        if (journal is None):
+            return []
+        if (loaded is None):
+            loaded = self.load_recovered_documents()
+
+        apply = {INSERT: self.insert_text, DELETE: self.delete_text,
+                 SET_TEXT: self.set_text}
+        recovered = []
+
+        for file_path, content, operations in loaded:
+            # Mientras se abre el fichero y se aplican las ediciones no se
+            # toca el diario: el anterior se conserva en el disco hasta que
+            # se sustituye por uno con las ediciones aplicadas (o se queda si
+            # el documento no puede editarse).
+            self.journal = None
+            try:
+                self.set_opened_file(file_path, *content)
+                if (self.is_read_only()):
+                    continue
+
+                applied = 0
+                try:
+                    for operation in operations:
+                        apply[operation[0]](*operation[1:])
+                        applied += 1
+                except (KeyError, IndexError, TypeError, ValueError):
+                    # Diario dañado: nos quedamos con las ediciones que se
+                    # han podido aplicar.
+                    pass
+            finally:
+                self.journal = journal
+
+            journal.restore(file_path, operations[:applied])
+            recovered.append(file_path)
+
+        return recovered
 
+    def find_text(self, query, position, regex=False, ignore_case=False,
+                  backward=False):
+        """
+        Busca el texto query en el fichero abierto a partir de la posición
+        position, dando la vuelta al llegar al final (o al principio).
+
+        El texto del documento solo se reconstruye una vez por cada
+        modificación, así que las búsquedas sucesivas mientras el usuario
+        escribe no copian el documento.
+
+        Argumentos:
+            query: String con el texto a buscar.
+            position: Posición desde la que buscar.
+            regex: Si es True, query es una expresión regular.
+            ignore_case: Si es True, no se distinguen mayúsculas y minúsculas.
+            backward: Si es True, se busca la coincidencia anterior (que
+                termina antes de position).
+
+        Devuelve:
+            Tupla (inicio, fin) con la posición de la coincidencia (o None si
+            no hay ninguna).
+
+        Lanza:
+            re.error si query no es una expresión regular válida.
+        """
+        pattern = self._find_pattern(query, regex, ignore_case)
+        text = self._document_text()
+
+        if (backward):
+            match = (self._last_match(pattern, text, 0, position) or
+                     self._last_match(pattern, text, position, len(text)))
+        else:
+            match = (self._first_match(pattern, text, position) or
+                     self._first_match(pattern, text, 0))
+
+        if (match is None):
+            return None
+        return match.span()
+
+    def replacement_for(self, query, replacement, start, end, regex=False,
+                        ignore_case=False):
+        """
+        Devuelve el texto por el que se sustituye la coincidencia del texto
+        query que hay entre las posiciones start y end del fichero abierto (o
+        None si ahí no hay una coincidencia). En modo expresión regular,
+        replacement puede hacer referencia a los grupos (\\1, \\g<nombre>).
+
+        Lanza:
+            re.error si query no es una expresión regular válida o
+            replacement hace referencia a un grupo que no existe.
+        """
+        pattern = self._find_pattern(query, regex, ignore_case)
+        match = pattern.match(self._document_text(), start, end)
+        if (match is None or match.end() != end or start == end):
+            return None
+
+        return match.expand(replacement) if regex else replacement
+
+    def replace_all(self, query, replacement, regex=False, ignore_case=False):
+        """
+        Sustituye todas las coincidencias del texto query en el fichero abierto
+        por replacement (ver replacement_for).
+
+        El documento no se modifica: se devuelve un único cambio que abarca
+        desde la primera hasta la última coincidencia para que el editor lo
+        aplique de una vez (y se deshaga en un solo paso). Al aplicarlo, el
+        modelo se actualiza como con cualquier otra edición.
+
+        Devuelve:
+            Tupla (inicio, fin, texto nuevo, coincidencias) con el fragmento
+            que hay que sustituir (o None si no hay coincidencias).
+
+        Lanza:
+            re.error si query no es una expresión regular válida o
+            replacement hace referencia a un grupo que no existe.
+        """
+        pattern = self._find_pattern(query, regex, ignore_case)
+        text = self._document_text()
+
+        first = self._first_match(pattern, text, 0)
+        if (first is None):
+            return None
+
+        # Fin de la última coincidencia y número de coincidencias.
+        state = [first.end(), 0]
+
+        def substitute(match):
+            # Las coincidencias vacías se dejan como están.
+            if (match.start() == match.end()):
+                return u""
+            state[0] = match.end()
+            state[1] += 1
+            return match.expand(replacement) if regex else replacement
+
+        new_text = pattern.sub(substitute, text)
+        last_end, count = state
+
+        # Lo que hay antes de la primera coincidencia y tras la última no
+        # cambia.
+        new_text = new_text[first.start():
+                            len(new_text) - (len(text) - last_end)]
+
+        return (first.start(), last_end, new_text, count)
+
+    def line_column(self, position):
+        """
+        Devuelve la tupla (línea, columna), contando desde 0, de la posición
+        position del fichero abierto (usando el índice de líneas del
+        documento, sin recorrer el texto).
+        """
+        line = self.opened_file_data.line_at(position)
+        return (line, position - self.opened_file_data.line_start(line))
+
+    def _find_pattern(self, query, regex, ignore_case):
+        """
+        Devuelve la expresión regular compilada con la que se busca el texto
+        query (se reutiliza mientras no cambian la búsqueda ni sus opciones).
+        """
+        key, pattern = self._find_cache
+        if (key != (query, regex, ignore_case)):
+            flags = re.UNICODE | re.MULTILINE
+            if (ignore_case):
+                flags |= re.IGNORECASE
+            pattern = re.compile(query if regex else re.escape(query), flags)
+            self._find_cache = ((query, regex, ignore_case), pattern)
+
+        return pattern
+
+    def _first_match(self, pattern, text, start):
+        """
+        Devuelve la primera coincidencia no vacía de pattern en text a partir
+        de la posición start (o None si no hay ninguna).
+        """
+        for match in pattern.finditer(text, start):
+            if (match.end() > match.start()):
+                return match
+        return None
+
+    def _last_match(self, pattern, text, start, end):
+        """
+        Devuelve la última coincidencia no vacía de pattern en text entre las
+        posiciones start y end (o None si no hay ninguna).
+        """
+        last = None
+        for match in pattern.finditer(text, start, end):
+            if (match.end() > match.start()):
+                last = match
+        return last
+
+    def _document_text(self):
+        """
+        Devuelve el texto completo del fichero abierto (se reconstruye como
+        mucho una vez por cada modificación).
+        """
+        document, generation, text = self._text_cache
+        if (document is not self.opened_file_data or
+                generation != self.opened_file_generation):
+            text = self.opened_file_data.get_text()
+            self._text_cache = (self.opened_file_data,
+                                self.opened_file_generation, text)
+
+        return text
+
+    def is_modified(self, check_content=False):
+        """
+        Devuelve True si el fichero abierto tiene cambios sin guardar; False en
+        caso contrario.
+
+        La comprobación tiene coste constante: solo compara el contador de
+        modificaciones con el de la última vez que se guardó. Si el argumento
+        check_content es True y el documento mide lo mismo que la versión
+        guardada, se compara además su hash para no avisar de cambios cuando
+        el usuario ha dejado el texto como estaba.
+        """
+        if (self.opened_file_generation == self._saved_generation):
+            return False
+
+        if (check_content and self.check_content_hash and
+                len(self.opened_file_data) == self._saved_length):
+            saved_hash = self._saved_content_hash()
+            if (saved_hash is not None):
+                return self._content_hash() != saved_hash
+
+        return True
+
+    @traced(u"model.reload_folder")
     def reload_folder(self):
         """
-        Vuelve a cargar los ficheros de la carpeta abierta (para actualizar
-        la lista y mostrar nuevos ficheros que puedan haber sido creados).
+        Actualiza los ficheros de la carpeta abierta (para mostrar nuevos
+        ficheros que puedan haber sido creados o dejar de mostrar los que se
+        hayan borrado).
+
+        Solo se vuelve a recorrer la carpeta si ha cambiado, y la lista de
+        ficheros se modifica en lugar de reconstruirse.
+
+        Devuelve:
+            Tupla (añadidos, eliminados) con las listas de nombres de ficheros
+            que han aparecido y desaparecido.
+
+        Lanza:
+            FolderOpenError si no se puede leer la carpeta.
+        """
+        if (self._folder_index is None):
+            self.open_folder(self.opened_folder_path)
+            return (list(self.opened_folder_files), [])
+
+        try:
+            added, removed = self._folder_index.refresh()
+        except (IOError, OSError, UnicodeError):
+            raise FolderOpenError(
+                u"No se pudo abrir la carpeta \"" + self.opened_folder_path +
+                u"\"")
+
+        if (added or removed):
+            self.quick_open_index.remove(removed)
+            self.quick_open_index.add(added)
+            self._notify(FOLDER_CHANGED, added, removed)
+
+        return (added, removed)
+
+    def list_project_folder(self, folder=u""):
+        """
+        Lista una subcarpeta de la carpeta abierta, sin entrar en sus
+        subcarpetas, excluyendo los ficheros ocultos y los excluidos por los
+        ficheros .gitignore.
+
+        Argumentos:
+            folder: String con la ruta relativa de la subcarpeta (con / como
+                separador; por defecto, la carpeta abierta).
+
+        Devuelve:
+            Tupla (carpetas, ficheros) con las listas ordenadas de los nombres
+            de sus subcarpetas y ficheros.
+        """
+        return scan_folder(self._ignore_rules, folder)
+
+    def find_files(self, query, limit=MAX_RESULTS):
+        """
+        Busca por nombre los ficheros de la carpeta abierta (y de sus
+        subcarpetas) que coinciden con el texto query.
+
+        Devuelve:
+            Lista con como mucho limit rutas relativas (con / como
+            separador), de la más relevante a la menos.
+        """
+        return self.quick_open_index.search(query, limit)
+
+    def search_folder(self, query, regex=False, ignore_case=False):
+        """
+        Empieza a buscar el texto query en todos los ficheros de la carpeta
+        abierta y sus subcarpetas (salvo los ocultos, los excluidos por los
+        ficheros .gitignore y los binarios) y cancela la búsqueda anterior.
+
+        Argumentos:
+            query: String con el texto a buscar.
+            regex: Si es True, query es una expresión regular.
+            ignore_case: Si es True, no se distinguen mayúsculas y minúsculas.
+
+        Devuelve:
+            Iterador que devuelve, por cada fichero con coincidencias, una
+            lista de tuplas (ruta relativa, línea, columna, línea de texto).
+            Se puede consumir desde otro hilo.
+
+        Lanza:
+            re.error si query no es una expresión regular válida.
+        """
+        # Si el recorrido del proyecto ya ha terminado, no hace falta volver a
+        # recorrer la carpeta.
+        if (self._crawler is None and self.project_files):
+            paths = list(self.project_files)
+        else:
+            paths = walk_project(self._ignore_rules)
+
+        # Los ficheros en los que el índice de contenido sabe que no está el
+        # texto no llegan a abrirse.
+        if (self.content_index is not None and not regex):
+            paths = self.content_index.filter_paths(paths, query, ignore_case)
+
+        return self._folder_search.search(self._ignore_rules.root_path, paths,
+                                          query, regex, ignore_case,
+                                          self.fallback_encoding)
+
+    def cancel_folder_search(self):
+        """
+        Cancela la búsqueda en la carpeta en curso (si la hay).
+        """
+        self._folder_search.cancel()
+
+    def start_project_crawl(self):
+        """
+        Empieza a recorrer en segundo plano todas las subcarpetas de la carpeta
+        abierta (si crawl_project es True). Los ficheros encontrados se
+        recogen llamando periódicamente a poll_project_crawl.
+        """
+        self._cancel_crawl()
+        self.project_files = []
+
+        if (self.crawl_project and self._ignore_rules is not None):
+            self._crawler = ProjectCrawler(self._ignore_rules)
+            self._crawler.start()
+
+    def poll_project_crawl(self):
+        """
+        Recoge los ficheros encontrados por el recorrido en segundo plano
+        desde la última llamada, los añade a project_files y los notifica.
+
+        Devuelve:
+            True si el recorrido sigue en marcha; False si ha terminado (o no
+            hay ninguno).
+        """
+        if (self._crawler is None):
+            return False
+
+        done = self._crawler.done
+        files = self._crawler.take_files()
+        if (done):
+            self._crawler = None
+
+        if (files or done):
+            self.project_files.extend(files)
+            self.quick_open_index.add(files)
+            self._notify(PROJECT_FILES_FOUND, files, done)
+
+        if (done and self.content_index is not None):
+            self._start_indexing()
+
+        return not done
+
+    def _cancel_crawl(self):
+        """
+        Detiene el recorrido en segundo plano (si lo hay).
+        """
+        if (self._crawler is not None):
+            self._crawler.cancel()
+            self._crawler = None
+
+    def _start_indexing(self):
+        """
+        Empieza a actualizar en segundo plano el índice de contenido con los
+        ficheros encontrados por el recorrido del proyecto (solo se leen los
+        nuevos o modificados).
+        """
+        if (self._indexer is not None):
+            self._indexer.cancel()
+
+        self._indexer = ContentIndexer(self.content_index,
+                                       list(self.project_files),
+                                       self.fallback_encoding)
+        self._indexer.start()
+
+    def _close_content_index(self):
+        """
+        Detiene la actualización del índice de contenido (si la hay) y lo
+        cierra.
+        """
+        if (self._indexer is not None):
+            self._indexer.cancel()
+            self._indexer = None
+
+        if (self.content_index is not None):
+            self.content_index.close()
+            self.content_index = None
+
+    def _indexed_line_starts(self, file_path, text):
+        """
+        Devuelve el array con el comienzo de cada línea del texto text del
+        fichero file_path guardado en el índice de contenido (o None si no
+        está o no corresponde a text).
+        """
+        index = self.content_index
+        indexed_file = self._indexed_file(index, file_path)
+        if (indexed_file is None):
+            return None
+
+        line_starts = index.line_starts(*indexed_file)
+        if (line_starts is None or
+                len(line_starts) != text.count(u"\n") + 1):
+            return None
+
+        return line_starts
+
+    def _indexed_file(self, index, file_path):
+        """
+        Devuelve la tupla (ruta relativa, tamaño, fecha de modificación) con
+        la que se consulta el fichero file_path en el índice de contenido
+        index (o None si no hay índice o el fichero no está en la carpeta
+        abierta).
+        """
+        folder_path = self.opened_folder_path
+        if (index is None or not file_path.startswith(folder_path)):
+            return None
+
+        try:
+            status = os.stat(file_path)
+        except OSError:
+            return None
+
+        relative_path = file_path[len(folder_path):]
+        return (relative_path.replace(os.path.sep, u"/"), status.st_size,
+                status.st_mtime)
+
+    def _mark_saved(self, content_hash, generation, length, text=None):
+        """
+        Marca como guardada la versión del fichero abierto correspondiente al
+        valor generation del contador de modificaciones.
+
+        Argumentos:
+            content_hash: Hash del contenido guardado (o None si no se
+                conoce).
+            generation: Valor del contador de modificaciones.
+            length: Longitud del documento guardado.
+            text: String unicode con el contenido guardado, del que se
+                calcula el hash cuando haga falta si no se indica content_hash
+                (opcional).
+        """
+        self._saved_generation = generation
+        self._saved_length = length
+        self._saved_hash = content_hash
+        self._saved_text = text
+        self._hash_cache = (generation, content_hash)
+
+    def _saved_content_hash(self):
+        """
+        Devuelve el hash de la última versión guardada del fichero abierto (o
+        None si no se conoce).
+        """
+        if (self._saved_hash is None and self._saved_text is not None):
+            self._saved_hash = self._hash_text(self._saved_text)
+            self._saved_text = None
+
+        return self._saved_hash
+
+    def _content_hash(self):
+        """
+        Devuelve el hash del contenido actual del fichero abierto (se calcula
+        como mucho una vez por cada modificación).
+        """
+        generation, content_hash = self._hash_cache
+        if (generation != self.opened_file_generation or content_hash is None):
+            hash = hashlib.sha1()
+            for chunk in self.opened_file_data.iter_chunks():
+                hash.update(chunk.encode('utf-8'))
+            content_hash = hash.digest()
+            self._hash_cache = (self.opened_file_generation, content_hash)
+
+        return content_hash
+
+    def _hash_text(self, text):
+        """
+        Devuelve el hash del string unicode text (o None si no se guardan
+        hashes del contenido).
+        """
+        if (not self.check_content_hash):
+            return None
+        return hashlib.sha1(text.encode('utf-8')).digest()
+
+    def _restart_journal(self, document_path, file_path, generation):
+        """
+        Empieza un diario de ediciones nuevo para el documento (con la ruta
+        document_path) que se ha guardado en file_path con el contador de
+        modificaciones generation. Si el documento ha cambiado mientras se
+        guardaba, el diario nuevo empieza con su contenido completo.
+        """
+        if (document_path != file_path):
+            self.journal.discard(document_path)
+        self.journal.track(file_path)
+
+        if (file_path == self.opened_file_path):
+            data = self.opened_file_data
+            current_generation = self.opened_file_generation
+        else:
+            document = self._documents.get(file_path)
+            if (document is None or document.data is None):
+                return
+            data = document.data
+            current_generation = document.generation
+
+        if (current_generation != generation):
+            self.journal.record_text(file_path, unicode(data))
+
+    def _store_document(self):
+        """
+        Guarda el estado del documento activo en su objeto _Document (si es
+        un documento abierto con nombre).
+        """
+        document = self._documents.get(self.opened_file_path)
+        if (document is None):
+            return
+
+        document.data = self.opened_file_data
+        document.pages = self.opened_file_pages
+        document.binary = self.opened_file_binary
+        document.generation = self.opened_file_generation
+        document.text_format = self.opened_file_format
+        document.saved_generation = self._saved_generation
+        document.saved_length = self._saved_length
+        document.saved_hash = self._saved_hash
+        document.saved_text = self._saved_text
+        document.hash_cache = self._hash_cache
+
+    def _restore_document(self, document):
+        """
+        Convierte en documento activo el del objeto _Document document.
+        """
+        self.opened_file_path = document.file_path
+        self.opened_file_data = document.data
+        self.opened_file_pages = document.pages
+        self.opened_file_binary = document.binary
+        self.opened_file_generation = document.generation
+        self.opened_file_format = document.text_format
+        self._saved_generation = document.saved_generation
+        self._saved_length = document.saved_length
+        self._saved_hash = document.saved_hash
+        self._saved_text = document.saved_text
+        self._hash_cache = document.hash_cache
+
+        # El texto de las búsquedas era del documento anterior.
+        self._text_cache = (None, None, None)
+
+    def _add_document(self, file_path, document):
+        """
+        Añade el objeto _Document document a los documentos abiertos (como el
+        más usado recientemente).
+        """
+        self._documents[file_path] = document
+        if (file_path not in self.open_documents):
+            self.open_documents.append(file_path)
+
+    def _rename_document(self, old_path, new_path):
+        """
+        Cambia la ruta de un documento abierto tras guardarlo con otro nombre.
+        Si ya había otro documento abierto con la ruta nueva, se cierra; si el
+        documento no tenía nombre, se añade a los documentos abiertos.
+        """
+        if (old_path == new_path):
+            return
+
+        if (new_path in self._documents):
+            self._discard_document(self._documents.pop(new_path))
+            self.open_documents.remove(new_path)
+
+        document = self._documents.pop(old_path, None)
+        if (document is None):
+            # Era el documento vacío sin nombre.
+            self._add_document(new_path, _Document(new_path))
+            return
+
+        self._documents[new_path] = document
+        self.open_documents[self.open_documents.index(old_path)] = new_path
+
+    def _evict_documents(self):
+        """
+        Descarga de memoria los documentos inactivos menos usados hasta que
+        ocupen menos de inactive_documents_budget caracteres. Los documentos
+        con cambios se vuelcan antes a un fichero de intercambio.
+        """
+        inactive = [(path, document)
+                    for path, document in self._documents.items()
+                    if path != self.opened_file_path and
+                    document.data is not None and document.pages is None]
+        used = sum(len(document.data) for _, document in inactive)
+
+        # Los documentos están ordenados del menos al más usado.
+        for path, document in inactive:
+            if (used <= self.inactive_documents_budget):
+                break
+
+            used -= len(document.data)
+            if (document.generation != document.saved_generation):
+                self._write_swap_file(document)
+
+            document.data = None
+            self._notify(DOCUMENT_EVICTED, path)
+
+    def _write_swap_file(self, document):
+        """
+        Vuelca el contenido del objeto _Document document (con cambios sin
+        guardar) a un fichero de intercambio.
+        """
+        if (self._swap_folder is None):
+            self._swap_folder = tempfile.mkdtemp(prefix=u"text_editor_swap_")
+            atexit.register(shutil.rmtree, self._swap_folder, True)
+
+        # Calculamos el hash de la versión guardada antes de descartar su
+        # texto.
+        if (document.saved_hash is None and document.saved_text is not None):
+            document.saved_hash = self._hash_text(document.saved_text)
+        document.saved_text = None
+
+        handle, swap_path = tempfile.mkstemp(suffix=u".swp",
+                                             dir=self._swap_folder)
+        with os.fdopen(handle, 'wb') as file:
+            for chunk in self._encode_chunks(document.data, None, None, None):
+                file.write(chunk)
+
+        document.swap_path = swap_path
+
+    def _remove_swap_file(self, document):
+        """
+        Borra el fichero de intercambio del objeto _Document document (si lo
+        tiene).
+        """
+        if (document.swap_path is not None):
+            try:
+                os.remove(document.swap_path)
+            except OSError:
+                pass
+            document.swap_path = None
+
+    def _discard_document(self, document):
+        """
+        Libera los recursos (proyección en memoria y fichero de intercambio)
+        del objeto _Document document de un documento que se cierra.
         """
-        self.open_folder(self.opened_folder_path)
+        if (document is None):
+            return
 
-    def _list_not_hidden_files(self, folder_path):
+        if (document.pages is not None):
+            document.pages.close()
+            document.pages = None
+        if (document.binary is not None):
+            document.binary.close()
+            document.binary = None
+        self._remove_swap_file(document)
+
+    def _close_pages(self):
         """
-        Devuelve una lista con los nombres de los ficheros no ocultos dentro de
-        la carpeta indicada en el argumento folder_path.
+        Cierra el fichero grande o binario abierto (si lo hay) y libera su
+        proyección en memoria.
         """
-        list = []
+        if (self.opened_file_pages is not None):
+            self.opened_file_pages.close()
+            self.opened_file_pages = None
+        if (self.opened_file_binary is not None):
+            self.opened_file_binary.close()
+            self.opened_file_binary = None
+
+
+class _Document():
+    """
+    Clase _Document: Estado de un documento abierto.
 
-        for f in os.listdir(folder_path):
-            if (os.path.isfile(os.path.join(folder_path, f))):  # Si es fichero...
-                if (not f.startswith('.')):  # ... y no está oculto...
-                    list.append(f)  # ... lo añadimos a la lista.
+    Argumentos:
+        file_path: String con la ruta al fichero.
 
-        return list
+    Atributos:
+        file_path: String con la ruta al fichero.
+        data: Objeto PieceTable con el contenido (o None si se ha descargado
+            de memoria).
+        pages: Objeto MappedTextFile si es un fichero grande; None en caso
+            contrario.
+        binary: Objeto MappedBinaryFile si es un fichero binario; None en caso
+            contrario.
+        generation: Contador de modificaciones.
+        text_format: Objeto TextFormat con el formato del fichero.
+        saved_generation, saved_length, saved_hash, saved_text: Estado de la
+            última versión guardada.
+        hash_cache: Tupla (generación, hash) con el último hash calculado.
+        swap_path: String con la ruta al fichero de intercambio con el
+            contenido si se ha volcado a disco; None en caso contrario.
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.data = PieceTable()
+        self.pages = None
+        self.binary = None
+        self.generation = 0
+        self.text_format = TextFormat()
+        self.saved_generation = 0
+        self.saved_length = 0
+        self.saved_hash = None
+        self.saved_text = None
+        self.hash_cache = (None, None)
+        self.swap_path = None
+
+
+def _folder_path_with_separator(folder_path):
+    """
+    Devuelve la ruta a la carpeta folder_path terminada en el separador de
+    fichero ('/' en Linux y Mac, '\\' en Windows), como se muestra en la
+    etiqueta de la carpeta abierta.
+    """
+    if (folder_path[-1] != os.path.sep):
+        return folder_path + os.path.sep
+    return folder_path
 
 
 if __name__ == "__main__":
@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Módulo con la cola de avisos del editor de texto.
+
+Los avisos (de información o de error) se muestran sin bloquear la interfaz,
+así que pueden llegar muchos seguidos. La cola junta los repetidos en uno
+solo con un contador, limita cuántos avisos distintos se muestran por
+segundo y, si se acumulan demasiados, los resume en uno. Los errores se
+guardan además en un registro para consultarlos después.
+
+Autor: Andrés Salinas Lima <i52salia@uco.es>.
+"""
+
+from __future__ import print_function
+from collections import OrderedDict, deque
+import sys
+import time
+
+
+# Tipos de aviso.
+INFO = u"info"
+ERROR = u"error"
+
+# Segundos mínimos entre dos avisos distintos.
+NOTIFICATION_INTERVAL = 1.0
+
+# Segundos durante los que se muestra cada aviso. Si se repite mientras
+# tanto, solo aumenta su contador.
+DISPLAY_TIME = 4.0
+
+# Número máximo de avisos pendientes antes de resumirlos en uno.
+MAX_PENDING = 3
+
+# Número máximo de errores que se guardan en el registro.
+ERROR_LOG_SIZE = 500
+
+
+class Notification():
+    """
+    Clase Notification: Aviso para el usuario.
+
+    Argumentos y atributos:
+        level: Tipo del aviso (INFO o ERROR).
+        text: String con el mensaje.
+        time: Instante (de time.time) de la última vez que se produjo.
+        count: Número de veces que se ha producido.
+    """
+
+    def __init__(self, level, text, time, count=1):
+        self.level = level
+        self.text = text
+        self.time = time
+        self.count = count
+
+
+class NotificationQueue():
+    """
+    Clase NotificationQueue: Cola de los avisos pendientes de mostrar.
+
+    Argumentos:
+        interval: Segundos mínimos entre dos avisos distintos.
+        display_time: Segundos durante los que se muestra cada aviso.
+
+    Atributos:
+        current: Aviso (objeto Notification) que se está mostrando (o None).
+        error_log: deque con los últimos errores (objetos Notification), del
+            más antiguo al más reciente. Los errores repetidos seguidos se
+            juntan en una sola entrada.
+        error_count: Número total de errores recibidos (sirve para saber si
+            el registro ha cambiado).
+    """
+
+    def __init__(self, interval=NOTIFICATION_INTERVAL,
+                 display_time=DISPLAY_TIME):
+        self.current = None
+        self.error_log = deque(maxlen=ERROR_LOG_SIZE)
+        self.error_count = 0
+
+        self._interval = interval
+        self._display_time = display_time
+        self._pending = OrderedDict()
+        self._last_shown = None
+
+    def post(self, level, text, now=None):
+        """
+        Añade a la cola el aviso del tipo level con el mensaje text.
+
+        Devuelve:
+            True si es una repetición del aviso que se está mostrando (cuyo
+            contador aumenta, así que basta con volver a mostrarlo); False en
+            caso contrario.
+        """
+        if (now is None):
+            now = time.time()
+
+        if (level == ERROR):
+            self.error_count += 1
+            last = self.error_log[-1] if self.error_log else None
+            if (last is not None and last.text == text):
+                last.count += 1
+                last.time = now
+            else:
+                self.error_log.append(Notification(level, text, now))
+
+        current = self.current
+        if (current is not None and current.level == level and
+                current.text == text and
+                now - current.time < self._display_time):
+            current.count += 1
+            current.time = now
+            return True
+
+        pending = self._pending.get((level, text))
+        if (pending is not None):
+            pending.count += 1
+            pending.time = now
+        else:
+            self._pending[(level, text)] = Notification(level, text, now)
+
+        return False
+
+    def take(self, now=None):
+        """
+        Saca de la cola el siguiente aviso que debe mostrarse (los errores
+        antes que la información), si ha pasado el tiempo mínimo desde el
+        anterior. Si hay demasiados pendientes, los resume en uno solo.
+
+        Devuelve:
+            Objeto Notification (o None si no hay que mostrar ninguno
+            todavía).
+        """
+        if (now is None):
+            now = time.time()
+
+        if (not self._pending or self.delay(now)):
+            return None
+
+        if (len(self._pending) > MAX_PENDING):
+            notification = self._summary(now)
+        else:
+            key = next((key for key in self._pending if key[0] == ERROR),
+                       next(iter(self._pending)))
+            notification = self._pending.pop(key)
+            notification.time = now
+
+        self.current = notification
+        self._last_shown = now
+
+        return notification
+
+    def delay(self, now=None):
+        """
+        Devuelve los segundos que faltan para poder mostrar el siguiente aviso
+        pendiente (0 si ya se puede) o None si no hay ninguno.
+        """
+        if (not self._pending):
+            return None
+        if (self._last_shown is None):
+            return 0
+
+        if (now is None):
+            now = time.time()
+
+        return max(0.0, self._interval - (now - self._last_shown))
+
+    def _summary(self, now):
+        """
+        Vacía la cola y devuelve un único aviso que resume todos los avisos
+        pendientes.
+        """
+        notifications = list(self._pending.values())
+        self._pending.clear()
+
+        errors = sum(notification.count for notification in notifications
+                     if notification.level == ERROR)
+        total = sum(notification.count for notification in notifications)
+
+        if (errors):
+            text = (u"%d avisos, %d de ellos errores (ver el registro de "
+                    u"errores)" % (total, errors))
+            return Notification(ERROR, text, now)
+
+        return Notification(INFO, u"%d avisos: %s" % (
+            total, notifications[-1].text), now)
+
+
+if __name__ == "__main__":
+    """
+    En caso de que intentemos ejecutar este módulo.
+    """
+    print(u"Este módulo no puede ser ejecutado", file=sys.stderr)
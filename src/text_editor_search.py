@@ -0,0 +1,589 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Módulo con las búsquedas del editor de texto.
+
+Autor: Andrés Salinas Lima <i52salia@uco.es>.
+"""
+
+from __future__ import print_function
+from text_editor_io import FALLBACK_ENCODING, SNIFF_SIZE, IO_CHUNK_SIZE
+from text_editor_io import is_binary, is_ascii_compatible, sniff_format
+from array import array
+from bisect import bisect_right
+import codecs
+import heapq
+import mmap
+import re
+import sys
+import os
+
+
+# Número máximo de resultados que devuelve una búsqueda de ficheros.
+MAX_RESULTS = 50
+
+# Número máximo de coincidencias que se devuelven de cada fichero en una
+# búsqueda en la carpeta.
+MAX_FILE_MATCHES = 1000
+
+# Número máximo de caracteres de la línea que se muestran con cada
+# coincidencia.
+PREVIEW_LENGTH = 200
+
+# Número de ficheros que se envían de una vez a cada proceso de búsqueda.
+_SEARCH_CHUNK_SIZE = 16
+
+# Búsqueda en curso en los procesos de búsqueda (valor compartido con el
+# proceso principal) y expresiones regulares ya compiladas en cada proceso.
+_search_generation = None
+_regex_cache = {}
+
+# Número máximo de coincidencias que se puntúan en cada nivel de la búsqueda de
+# ficheros (los niveles se recorren del más relevante al menos relevante).
+_MAX_CANDIDATES = 5000
+
+
+class QuickOpenIndex():
+    """
+    Clase QuickOpenIndex: Índice en memoria de las rutas de los ficheros de un
+    proyecto para buscarlos por nombre mientras el usuario escribe.
+
+    Las coincidencias se buscan por niveles, del más relevante al menos
+    relevante, y solo se baja de nivel si faltan resultados:
+
+        1. El nombre del fichero contiene el texto buscado (se buscan con un
+           índice de trigramas de los nombres; para textos de menos de tres
+           caracteres, con un índice de prefijos).
+        2. La ruta contiene el texto buscado.
+        3. La ruta contiene los caracteres del texto buscado en orden, aunque
+           no estén seguidos (por ejemplo, "tec" encuentra "text_editor.py").
+
+    Los niveles 2 y 3 se buscan con expresiones regulares sobre todas las
+    rutas empaquetadas en un único string, por lo que el recorrido se hace en
+    C. Las rutas se pueden añadir y eliminar sin reconstruir el índice.
+    """
+
+    def __init__(self):
+        self._paths = []  # Ruta de cada fichero (por identificador).
+        self._lower = []  # Ruta en minúsculas.
+        self._names = []  # Nombre del fichero en minúsculas.
+        self._ids = {}  # Identificador de cada ruta.
+        self._removed = set()  # Identificadores de las rutas eliminadas.
+
+        # Trigramas y prefijos (de uno y dos caracteres) de los nombres:
+        # array con los identificadores de los ficheros que los contienen.
+        self._trigrams = {}
+        self._prefixes = {}
+
+        # Rutas en minúsculas separadas por saltos de línea y posición en la
+        # que empieza cada una (se reconstruyen cuando cambian las rutas).
+        self._packed = None
+        self._packed_starts = None
+
+        # Última búsqueda por subsecuencia (texto e identificadores), para
+        # filtrar sobre ella si el usuario sigue escribiendo.
+        self._last_subsequence = (None, None)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def add(self, paths):
+        """
+        Añade al índice las rutas (con / como separador) de la lista paths.
+        """
+        for path in paths:
+            if (path in self._ids):
+                continue
+
+            id = len(self._paths)
+            lower = path.lower()
+            name = lower[lower.rfind(u"/") + 1:]
+
+            self._ids[path] = id
+            self._paths.append(path)
+            self._lower.append(lower)
+            self._names.append(name)
+
+            for trigram in set(name[i:i + 3] for i in range(len(name) - 2)):
+                self._postings(self._trigrams, trigram).append(id)
+            for prefix in set((name[:1], name[:2])):
+                self._postings(self._prefixes, prefix).append(id)
+
+        self._invalidate()
+
+    def remove(self, paths):
+        """
+        Elimina del índice las rutas de la lista paths.
+        """
+        for path in paths:
+            id = self._ids.pop(path, None)
+            if (id is not None):
+                self._removed.add(id)
+
+        # Si se han eliminado muchas rutas, reconstruimos el índice para no
+        # arrastrarlas en todas las búsquedas.
+        if (len(self._removed) > len(self._ids)):
+            paths = [self._paths[id] for id in sorted(self._ids.values())]
+            self.__init__()
+            self.add(paths)
+        else:
+            self._invalidate()
+
+    def search(self, query, limit=MAX_RESULTS):
+        """
+        Busca los ficheros que coinciden con el texto query.
+
+        Devuelve:
+            Lista con como mucho limit rutas, de la más relevante a la menos.
+        """
+        query = query.lower().replace(u" ", u"")
+        if (not query):
+            return []
+
+        results = []
+        found = set()
+
+        for level in (self._name_matches, self._path_matches,
+                      self._subsequence_matches):
+            if (len(results) >= limit):
+                break
+
+            candidates = [id for id in level(query) if id not in found]
+            best = heapq.nsmallest(limit - len(results), candidates,
+                                   key=lambda id: self._rank(id, query))
+            found.update(best)
+            results.extend(self._paths[id] for id in best)
+
+        return results
+
+    def _rank(self, id, query):
+        """
+        Devuelve la clave de ordenación de un resultado (menor es mejor): los
+        nombres que empiezan por el texto buscado primero y, después, las rutas
+        más cortas.
+        """
+        return (not self._names[id].startswith(query), len(self._lower[id]))
+
+    def _name_matches(self, query):
+        """
+        Devuelve los identificadores de los ficheros cuyo nombre contiene el
+        texto query.
+        """
+        if (len(query) < 3):
+            postings = self._prefixes.get(query)
+            if (postings is None):
+                return []
+            return [id for id in postings[:_MAX_CANDIDATES]
+                    if id not in self._removed]
+
+        # Intersección de los trigramas, empezando por el menos frecuente.
+        lists = []
+        for trigram in set(query[i:i + 3] for i in range(len(query) - 2)):
+            postings = self._trigrams.get(trigram)
+            if (postings is None):
+                return []
+            lists.append(postings)
+        lists.sort(key=len)
+
+        candidates = set(lists[0])
+        for postings in lists[1:]:
+            candidates.intersection_update(postings)
+            if (not candidates):
+                return []
+
+        matches = [id for id in candidates
+                   if id not in self._removed and query in self._names[id]]
+        return matches[:_MAX_CANDIDATES]
+
+    def _path_matches(self, query):
+        """
+        Devuelve los identificadores de los ficheros cuya ruta contiene el
+        texto query.
+        """
+        return self._packed_matches(re.escape(query))
+
+    def _subsequence_matches(self, query):
+        """
+        Devuelve los identificadores de los ficheros cuya ruta contiene los
+        caracteres del texto query en orden.
+        """
+        # Antes de cada carácter solo se admiten caracteres distintos de él,
+        # así la expresión regular nunca necesita volver atrás.
+        pattern = re.escape(query[0]) + u"".join(
+            u"[^\n" + re.escape(char) + u"]*" + re.escape(char)
+            for char in query[1:])
+
+        # Si el usuario ha seguido escribiendo, basta con filtrar los
+        # resultados de la búsqueda anterior.
+        last_query, last_ids = self._last_subsequence
+        if (last_query is not None and query.startswith(last_query) and
+                len(last_ids) < _MAX_CANDIDATES):
+            regex = re.compile(pattern)
+            ids = [id for id in last_ids
+                   if id not in self._removed and regex.search(self._lower[id])]
+        else:
+            ids = self._packed_matches(pattern)
+
+        self._last_subsequence = (query, ids)
+        return ids
+
+    def _packed_matches(self, pattern):
+        """
+        Devuelve los identificadores de las rutas (como mucho _MAX_CANDIDATES)
+        en las que se encuentra la expresión regular pattern.
+        """
+        if (self._packed is None):
+            self._pack()
+
+        ids = []
+        regex = re.compile(pattern)
+        position = 0
+
+        while (len(ids) < _MAX_CANDIDATES):
+            match = regex.search(self._packed, position)
+            if (match is None):
+                break
+
+            id = bisect_right(self._packed_starts, match.start()) - 1
+            if (id not in self._removed):
+                ids.append(id)
+
+            # Seguimos buscando a partir de la siguiente ruta.
+            position = self._packed_starts[id] + len(self._lower[id]) + 1
+
+        return ids
+
+    def _pack(self):
+        """
+        Empaqueta todas las rutas en minúsculas en un único string.
+        """
+        starts = array('l')
+        position = 0
+        for lower in self._lower:
+            starts.append(position)
+            position += len(lower) + 1
+
+        self._packed = u"\n".join(self._lower)
+        self._packed_starts = starts
+
+    def _invalidate(self):
+        """
+        Descarta los datos que dependen del conjunto de rutas.
+        """
+        self._packed = None
+        self._packed_starts = None
+        self._last_subsequence = (None, None)
+
+    def _postings(self, index, key):
+        """
+        Devuelve el array de identificadores de la clave key del índice index
+        (creándolo si no existe).
+        """
+        postings = index.get(key)
+        if (postings is None):
+            postings = index[key] = array('l')
+        return postings
+
+
+class FolderSearch():
+    """
+    Clase FolderSearch: Busca un texto en todos los ficheros de una carpeta
+    usando un conjunto de procesos (uno por núcleo) para no depender del GIL.
+
+    Cada proceso detecta el formato de los ficheros que le tocan (ver
+    sniff_format) y busca en su texto decodificado, por bloques de líneas
+    completas; los ficheros binarios se saltan. Los textos ASCII que no son
+    expresiones regulares se buscan directamente en los bytes de los ficheros
+    con codificaciones compatibles, proyectados en memoria (mmap) sin
+    decodificarlos. Los resultados llegan fichero a fichero, según van
+    terminando.
+
+    El conjunto de procesos se crea la primera vez que se busca y se reutiliza
+    en las búsquedas siguientes. Al empezar una búsqueda nueva (o cancelar la
+    actual), los procesos descartan sin abrirlos los ficheros pendientes de la
+    anterior.
+
+    Argumentos:
+        processes: Número de procesos (por defecto, uno por núcleo).
+    """
+
+    def __init__(self, processes=None):
+        self._processes = processes
+        self._pool = None
+        self._generation = None
+
+    def search(self, root_path, paths, query, regex=False, ignore_case=False,
+               fallback_encoding=FALLBACK_ENCODING):
+        """
+        Empieza a buscar el texto query en los ficheros de la carpeta
+        root_path y cancela la búsqueda anterior.
+
+        Argumentos:
+            root_path: String con la ruta a la carpeta.
+            paths: Iterable con las rutas relativas (con / como separador) de
+                los ficheros en los que buscar. Se consume en segundo plano,
+                así que puede ser un generador que recorra la carpeta.
+            query: String con el texto a buscar.
+            regex: Si es True, query es una expresión regular.
+            ignore_case: Si es True, no se distinguen mayúsculas y
+                minúsculas.
+            fallback_encoding: String con la codificación con la que se leen
+                los ficheros que no son UTF-8.
+
+        Devuelve:
+            Iterador que devuelve, por cada fichero con coincidencias, una
+            lista de tuplas (ruta relativa, línea, columna, línea de texto),
+            con líneas y columnas contadas desde 0.
+
+        Lanza:
+            re.error si query no es una expresión regular válida.
+        """
+        pattern, flags = _search_pattern(query, regex, ignore_case)
+        # Comprobamos la expresión aquí para no enviar a los procesos una que
+        # no es válida.
+        _compile(pattern, flags, isinstance(pattern, bytes))
+
+        if (self._pool is None):
+            # multiprocessing solo se importa al buscar por primera vez, para
+            # no retrasar el arranque del editor.
+            import multiprocessing
+
+            self._generation = multiprocessing.Value('i', 0, lock=False)
+            self._pool = multiprocessing.Pool(
+                self._processes or multiprocessing.cpu_count(),
+                _init_search_process, (self._generation,))
+
+        self._generation.value += 1
+        generation = self._generation.value
+
+        tasks = self._tasks(generation, root_path, paths, pattern, flags,
+                            fallback_encoding)
+        results = self._pool.imap_unordered(_search_file, tasks,
+                                            _SEARCH_CHUNK_SIZE)
+
+        return (matches for matches in results if matches)
+
+    def _tasks(self, generation, root_path, paths, pattern, flags,
+               fallback_encoding):
+        """
+        Generador con las tareas de la búsqueda generation (una por fichero)
+        que deja de recorrer paths en cuanto la búsqueda se cancela.
+        """
+        for path in paths:
+            if (self._generation.value != generation):
+                return
+            yield (generation, root_path, path, pattern, flags,
+                   fallback_encoding)
+
+    def cancel(self):
+        """
+        Cancela la búsqueda en curso (si la hay).
+        """
+        if (self._generation is not None):
+            self._generation.value += 1
+
+    def close(self):
+        """
+        Cancela la búsqueda en curso y termina los procesos de búsqueda.
+        """
+        if (self._pool is not None):
+            self.cancel()
+            self._pool.terminate()
+            self._pool = None
+
+
+def _search_pattern(query, regex, ignore_case):
+    """
+    Devuelve la tupla (patrón, opciones) de la expresión regular con la que se
+    busca el texto query. Si query es un texto ASCII y no una expresión
+    regular, el patrón se devuelve en bytes para poder buscarlo directamente
+    en los bytes de los ficheros (ver _search_file); en caso contrario, es un
+    string unicode.
+    """
+    flags = re.MULTILINE | re.UNICODE
+    if (ignore_case):
+        flags |= re.IGNORECASE
+
+    if (regex):
+        return (query, flags)
+
+    try:
+        return (re.escape(query.encode('ascii')), flags)
+    except UnicodeError:
+        return (re.escape(query), flags)
+
+
+def _compile(pattern, flags, binary):
+    """
+    Devuelve la expresión regular compilada del patrón pattern con las
+    opciones flags, para buscar en bytes si binary es True o en texto
+    unicode en caso contrario (los patrones en bytes son siempre ASCII).
+    Las expresiones ya compiladas se reutilizan.
+    """
+    if (binary):
+        flags &= ~re.UNICODE
+    elif (isinstance(pattern, bytes)):
+        pattern = pattern.decode('ascii')
+
+    regex = _regex_cache.get((pattern, flags))
+    if (regex is None):
+        if (len(_regex_cache) >= 2):
+            _regex_cache.clear()
+        regex = _regex_cache[(pattern, flags)] = re.compile(pattern, flags)
+
+    return regex
+
+
+def _init_search_process(generation):
+    """
+    Inicializa un proceso de búsqueda con el valor compartido que indica la
+    búsqueda en curso.
+    """
+    global _search_generation
+    _search_generation = generation
+
+
+def _search_file(task):
+    """
+    Busca en un fichero (dentro de un proceso de búsqueda).
+
+    Argumentos:
+        task: Tupla (búsqueda, carpeta, ruta relativa, patrón, opciones,
+            codificación si el fichero no es UTF-8).
+
+    Devuelve:
+        Lista de tuplas (ruta relativa, línea, columna, línea de texto) con
+        las coincidencias (vacía si la búsqueda se ha cancelado o el fichero
+        es binario o no se puede leer).
+    """
+    generation, root_path, path, pattern, flags, fallback_encoding = task
+    if (_is_cancelled(generation)):
+        return []
+
+    file_path = os.path.join(root_path, *path.split(u"/"))
+    try:
+        with open(file_path, 'rb') as file:
+            head = file.read(SNIFF_SIZE)
+            if (not head or is_binary(head)):
+                return []
+
+            text_format = sniff_format(head, fallback_encoding)
+
+            # En los bytes solo se puede buscar si el texto ASCII se
+            # representa igual en el fichero y las líneas acaban en u"\n".
+            if (isinstance(pattern, bytes) and not text_format.bom and
+                    text_format.newline != u"\r" and
+                    is_ascii_compatible(text_format.encoding)):
+                data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+                try:
+                    return _find_matches(data, _compile(pattern, flags, True),
+                                         path, generation, 0,
+                                         text_format.encoding)
+                finally:
+                    data.close()
+
+            return _search_text(file, text_format,
+                                _compile(pattern, flags, False), path,
+                                generation)
+    except (IOError, OSError, ValueError, LookupError):
+        return []
+
+
+def _search_text(file, text_format, regex, path, generation):
+    """
+    Busca la expresión regular regex en el texto del fichero file (abierto
+    en modo binario) con el formato text_format, decodificándolo por bloques
+    de líneas completas para no cargarlo entero en memoria. Las coincidencias
+    no pueden ocupar más de un bloque.
+    """
+    decoder = codecs.getincrementaldecoder(text_format.encoding)('replace')
+    file.seek(len(text_format.bom_bytes()))
+
+    matches = []
+    line = 0
+    rest = u""
+
+    while (len(matches) < MAX_FILE_MATCHES):
+        data = file.read(IO_CHUNK_SIZE)
+        text = rest + decoder.decode(data, final=not data)
+
+        if (data):
+            # Un u"\r" al final del bloque puede ser la mitad de un u"\r\n".
+            end = len(text) - 1 if text.endswith(u"\r") else len(text)
+            cut = max(text.rfind(u"\n", 0, end), text.rfind(u"\r", 0, end))
+            if (cut < 0):
+                rest = text
+                continue
+            text, rest = (text[:cut + 1], text[cut + 1:])
+
+        if (u"\r" in text):
+            text = text.replace(u"\r\n", u"\n").replace(u"\r", u"\n")
+
+        matches.extend(_find_matches(text, regex, path, generation, line))
+        if (not data or _is_cancelled(generation)):
+            break
+        line += text.count(u"\n")
+
+    if (_is_cancelled(generation)):
+        return []
+    return matches[:MAX_FILE_MATCHES]
+
+
+def _find_matches(data, regex, path, generation, first_line=0,
+                  encoding=None):
+    """
+    Devuelve las coincidencias de la expresión regular regex en el texto
+    data del fichero path (ver _search_file), cuya primera línea es la
+    first_line del fichero. data es un string unicode o, si se indica
+    encoding, los bytes del fichero en esa codificación.
+    """
+    newline = u"\n" if encoding is None else b"\n"
+    matches = []
+    line = first_line
+    position = 0
+
+    for match in regex.finditer(data):
+        start = match.start()
+        # Contamos los saltos de línea desde la coincidencia anterior, así el
+        # fichero solo se recorre una vez.
+        line += data[position:start].count(newline)
+        position = start
+
+        line_start = data.rfind(newline, 0, start) + 1
+        line_end = data.find(newline, start)
+        if (line_end == -1):
+            line_end = len(data)
+
+        before = data[line_start:start]
+        text = data[line_start:min(line_end, line_start + PREVIEW_LENGTH * 4)]
+        if (encoding is not None):
+            before = before.decode(encoding, 'replace')
+            text = text.decode(encoding, 'replace')
+        text = text[:PREVIEW_LENGTH].rstrip(u"\r")
+        matches.append((path, line, len(before), text))
+
+        if (len(matches) >= MAX_FILE_MATCHES):
+            break
+        # Cada cierto número de coincidencias comprobamos que la búsqueda no
+        # se ha cancelado.
+        if (len(matches) % 100 == 0 and _is_cancelled(generation)):
+            return []
+
+    return matches
+
+
+def _is_cancelled(generation):
+    """
+    Devuelve True si la búsqueda generation ya no es la búsqueda en curso
+    (dentro de un proceso de búsqueda); False en caso contrario.
+    """
+    return (_search_generation is not None and
+            _search_generation.value != generation)
+
+
+if __name__ == "__main__":
+    """
+    En caso de que intentemos ejecutar este módulo.
+    """
+    print(u"Este módulo no puede ser ejecutado", file=sys.stderr)
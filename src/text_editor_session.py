@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Módulo con la caché de la sesión del editor de texto.
+
+Al salir se guardan la carpeta abierta con su lista de ficheros, el fichero
+activo y la posición del cursor y del scroll, de forma que al volver a
+iniciar el programa se pueden mostrar al instante mientras la carpeta se
+vuelve a leer en segundo plano.
+
+Autor: Andrés Salinas Lima <i52salia@uco.es>.
+"""
+
+from __future__ import print_function
+from text_editor_io import write_atomic
+import json
+import sys
+import os
+
+
+# Fichero en el que se guarda la sesión.
+SESSION_PATH = os.path.join(os.path.expanduser(u"~"), u".text_editor",
+                            u"session.json")
+
+# Número máximo de ficheros de la carpeta abierta que se guardan en la
+# sesión. Con más, leer la lista guardada tardaría casi lo mismo que volver
+# a leer la carpeta, así que no se guarda.
+MAX_SESSION_FILES = 100000
+
+# Versión del formato del fichero de sesión (las sesiones con otra versión se
+# ignoran).
+_SESSION_VERSION = 1
+
+
+class Session():
+    """
+    Clase Session: Estado del editor que se conserva entre dos ejecuciones.
+
+    Atributos:
+        folder_path: String con la ruta a la carpeta abierta (o None).
+        folder_files: Lista con los ficheros de la carpeta abierta (o None si
+            no se ha guardado).
+        file_path: String con la ruta al fichero activo (o None).
+        cursor: Posición del cursor en el fichero activo.
+        scroll: Posición del scroll vertical del editor.
+    """
+
+    def __init__(self, folder_path=None, folder_files=None, file_path=None,
+                 cursor=0, scroll=0):
+        self.folder_path = folder_path
+        self.folder_files = folder_files
+        self.file_path = file_path
+        self.cursor = cursor
+        self.scroll = scroll
+
+
+def load_session(session_path=SESSION_PATH):
+    """
+    Lee la sesión guardada en el fichero session_path.
+
+    Devuelve:
+        Objeto Session (o None si no hay ninguna sesión válida guardada).
+    """
+    try:
+        with open(session_path, 'rb') as file:
+            data = json.loads(file.read().decode('utf-8'))
+
+        if (not isinstance(data, dict) or
+                data.get(u"version") != _SESSION_VERSION):
+            return None
+
+        return Session(data.get(u"folder"), data.get(u"files"),
+                       data.get(u"file"), int(data.get(u"cursor", 0)),
+                       int(data.get(u"scroll", 0)))
+    except (IOError, OSError, ValueError, TypeError):
+        return None
+
+
+def save_session(session, session_path=SESSION_PATH):
+    """
+    Guarda la sesión session (objeto Session) en el fichero session_path. Si
+    no puede guardarse, el editor simplemente empezará sin ella la próxima
+    vez.
+    """
+    folder_files = session.folder_files
+    if (folder_files is not None and len(folder_files) > MAX_SESSION_FILES):
+        folder_files = None
+
+    data = {
+        u"version": _SESSION_VERSION,
+        u"folder": session.folder_path,
+        u"files": folder_files,
+        u"file": session.file_path,
+        u"cursor": session.cursor,
+        u"scroll": session.scroll,
+    }
+
+    try:
+        folder_path = os.path.dirname(session_path)
+        if (not os.path.isdir(folder_path)):
+            os.makedirs(folder_path)
+
+        write_atomic(session_path, [json.dumps(data).encode('utf-8')])
+    except (IOError, OSError):
+        pass
+
+
+if __name__ == "__main__":
+    """
+    En caso de que intentemos ejecutar este módulo.
+    """
+    print(u"Este módulo no puede ser ejecutado", file=sys.stderr)
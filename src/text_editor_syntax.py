@@ -0,0 +1,278 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Módulo con los analizadores léxicos del resaltado de sintaxis del editor de
+texto.
+
+Cada analizador trocea una línea de texto en fragmentos (posición, longitud,
+clase) partiendo del estado en el que terminó la línea anterior (un entero
+que indica, por ejemplo, si se está dentro de una cadena de varias líneas) y
+devuelve el estado en el que termina. Así el resaltado puede rehacerse a
+partir de una línea modificada y detenerse en cuanto el estado final de una
+línea vuelve a coincidir con el que tenía.
+
+Autor: Andrés Salinas Lima <i52salia@uco.es>.
+"""
+
+from __future__ import print_function
+from array import array
+import re
+import sys
+import os
+
+
+# Clases de los fragmentos resaltados.
+KEYWORD = u"keyword"
+CONSTANT = u"constant"
+STRING = u"string"
+NUMBER = u"number"
+COMMENT = u"comment"
+KEY = u"key"
+DECORATOR = u"decorator"
+TIMESTAMP = u"timestamp"
+ERROR = u"error"
+WARNING = u"warning"
+
+# Estado de una línea que no empieza dentro de ninguna construcción de varias
+# líneas.
+NORMAL_STATE = 0
+
+# Clase interna de las cadenas de Python que siguen en la línea siguiente.
+_OPEN_STRING = u"open_string"
+
+
+class Lexer():
+    """
+    Clase Lexer: Analizador léxico de un formato de fichero basado en
+    expresiones regulares.
+
+    Las reglas son una lista de tuplas (expresión regular, clase) que se
+    prueban en orden en cada posición de la línea; los fragmentos que no
+    coinciden con ninguna regla no se resaltan. Los analizadores de formatos
+    con construcciones de varias líneas redefinen tokenize.
+
+    Atributos:
+        name: String con el nombre del formato.
+        extensions: Tupla con las extensiones (en minúsculas, con el punto) y
+            nombres de los ficheros del formato.
+    """
+
+    name = u""
+    extensions = ()
+    rules = []
+
+    def __init__(self):
+        # Unimos todas las reglas en una sola expresión regular con un grupo
+        # por regla, de forma que cada línea se recorre una sola vez.
+        self._pattern = re.compile(u"|".join(
+            u"(?P<rule%d>%s)" % (i, pattern)
+            for i, (pattern, _) in enumerate(self.rules)))
+        self._kinds = dict((u"rule%d" % i, kind)
+                           for i, (_, kind) in enumerate(self.rules))
+
+    def tokenize(self, line, state=NORMAL_STATE):
+        """
+        Trocea la línea line (string unicode sin salto de línea) que empieza
+        en el estado state.
+
+        Devuelve:
+            Tupla (fragmentos, estado): la lista de fragmentos resaltados
+            (tuplas (posición, longitud, clase)) y el estado en el que termina
+            la línea.
+        """
+        return (self._match_rules(line, 0), NORMAL_STATE)
+
+    def _match_rules(self, line, start):
+        """
+        Devuelve la lista de fragmentos de la línea line a partir de la
+        posición start según las reglas del analizador.
+        """
+        return [(match.start(), match.end() - match.start(),
+                 self._kinds[match.lastgroup])
+                for match in self._pattern.finditer(line, start)]
+
+
+class PythonLexer(Lexer):
+    """
+    Clase PythonLexer: Analizador léxico de Python. Las cadenas entre comillas
+    triples pueden ocupar varias líneas.
+    """
+
+    name = u"Python"
+    extensions = (u".py", u".pyw")
+
+    # Estados de las líneas que empiezan dentro de una cadena entre comillas
+    # triples.
+    _TRIPLE_STATES = {u"'''": 1, u'"""': 2}
+    _DELIMITERS = {1: u"'''", 2: u'"""'}
+
+    _KEYWORDS = (u"and", u"as", u"assert", u"async", u"await", u"break",
+                 u"class", u"continue", u"def", u"del", u"elif", u"else",
+                 u"except", u"exec", u"finally", u"for", u"from", u"global",
+                 u"if", u"import", u"in", u"is", u"lambda", u"nonlocal",
+                 u"not", u"or", u"pass", u"print", u"raise", u"return",
+                 u"try", u"while", u"with", u"yield")
+
+    rules = [
+        (u"#.*", COMMENT),
+        # Cadenas entre comillas triples que terminan en la misma línea.
+        (u"[rRbBuUfF]{0,2}(?:'''.*?'''|\"\"\".*?\"\"\")", STRING),
+        # Cadenas entre comillas triples que siguen en la línea siguiente
+        # (ver tokenize).
+        (u"[rRbBuUfF]{0,2}(?:'''|\"\"\").*", _OPEN_STRING),
+        (u"[rRbBuUfF]{0,2}(?:'(?:[^'\\\\]|\\\\.)*'?|"
+         u"\"(?:[^\"\\\\]|\\\\.)*\"?)", STRING),
+        (u"@[\\w.]+", DECORATOR),
+        (u"\\b(?:%s)\\b" % u"|".join(_KEYWORDS), KEYWORD),
+        (u"\\b(?:True|False|None|self)\\b", CONSTANT),
+        (u"\\b(?:0[xXoObB][0-9a-fA-F_]+|\\d[\\d_]*\\.?\\d*"
+         u"(?:[eE][+-]?\\d+)?[jJlL]?)\\b", NUMBER),
+    ]
+
+    def tokenize(self, line, state=NORMAL_STATE):
+        tokens = []
+        start = 0
+
+        # Si la línea empieza dentro de una cadena de varias líneas, buscamos
+        # dónde termina.
+        if (state != NORMAL_STATE):
+            end = line.find(self._DELIMITERS[state])
+            if (end == -1):
+                return ([(0, len(line), STRING)] if line else [], state)
+            start = end + 3
+            tokens.append((0, start, STRING))
+
+        tokens.extend(self._match_rules(line, start))
+
+        # Una cadena entre comillas triples sin cerrar ocupa el resto de la
+        # línea, así que solo puede ser el último fragmento.
+        state = NORMAL_STATE
+        if (tokens and tokens[-1][2] == _OPEN_STRING):
+            position, length, _ = tokens[-1]
+            delimiter = line[position:].lstrip(u"rRbBuUfF")[:3]
+            state = self._TRIPLE_STATES[delimiter]
+            tokens[-1] = (position, length, STRING)
+
+        return (tokens, state)
+
+
+class JsonLexer(Lexer):
+    """
+    Clase JsonLexer: Analizador léxico de JSON. Las cadenas seguidas de dos
+    puntos se resaltan como claves.
+    """
+
+    name = u"JSON"
+    extensions = (u".json", u".geojson", u".jsonl")
+
+    rules = [
+        (u"\"(?:[^\"\\\\]|\\\\.)*\"(?=\\s*:)", KEY),
+        (u"\"(?:[^\"\\\\]|\\\\.)*\"?", STRING),
+        (u"-?\\b\\d+(?:\\.\\d+)?(?:[eE][+-]?\\d+)?\\b", NUMBER),
+        (u"\\b(?:true|false|null)\\b", CONSTANT),
+    ]
+
+
+class YamlLexer(Lexer):
+    """
+    Clase YamlLexer: Analizador léxico de YAML.
+    """
+
+    name = u"YAML"
+    extensions = (u".yaml", u".yml")
+
+    rules = [
+        (u"(?:^|(?<=\\s))#.*", COMMENT),
+        (u"^(?:---|\\.\\.\\.)(?=\\s|$)", KEYWORD),
+        (u"^\\s*(?:-\\s+)?[^\\s#'\"\\-][^#:]*?(?=:(?:\\s|$))", KEY),
+        (u"'(?:[^']|'')*'?|\"(?:[^\"\\\\]|\\\\.)*\"?", STRING),
+        (u"[&*][\\w-]+|![\\w!/-]*", DECORATOR),
+        (u"\\b(?:true|false|yes|no|on|off|null|True|False|Yes|No|Null|"
+         u"TRUE|FALSE|NULL)\\b|(?<=\\s)~(?=\\s|$)", CONSTANT),
+        (u"(?<![\\w.])-?\\d+(?:\\.\\d+)?(?:[eE][+-]?\\d+)?(?![\\w.])",
+         NUMBER),
+    ]
+
+
+class LogLexer(Lexer):
+    """
+    Clase LogLexer: Analizador léxico de ficheros de registro (logs): fechas,
+    niveles de gravedad, cadenas y números.
+    """
+
+    name = u"Log"
+    extensions = (u".log", u".out", u".err")
+
+    rules = [
+        (u"\\d{4}-\\d{2}-\\d{2}[T ]\\d{2}:\\d{2}:\\d{2}(?:[.,]\\d+)?"
+         u"(?:Z|[+-]\\d{2}:?\\d{2})?|\\b\\d{2}:\\d{2}:\\d{2}(?:[.,]\\d+)?\\b",
+         TIMESTAMP),
+        (u"\\b(?:ERROR|FATAL|CRITICAL|SEVERE|Error|Fatal|Critical)\\b|"
+         u"\\bException\\b|\\bTraceback\\b", ERROR),
+        (u"\\b(?:WARN|WARNING|Warning)\\b", WARNING),
+        (u"\\b(?:INFO|DEBUG|TRACE|NOTICE|Info|Debug)\\b", KEYWORD),
+        (u"\"(?:[^\"\\\\]|\\\\.)*\"|'(?:[^'\\\\]|\\\\.)*'", STRING),
+        (u"\\b\\d+(?:\\.\\d+)?\\b", NUMBER),
+    ]
+
+
+# Analizadores disponibles (ver register_lexer y lexer_for).
+LEXERS = [PythonLexer(), JsonLexer(), YamlLexer(), LogLexer()]
+
+
+def register_lexer(lexer):
+    """
+    Añade el analizador lexer (objeto de una subclase de Lexer) a los
+    analizadores disponibles, con preferencia sobre los que ya había para las
+    mismas extensiones.
+    """
+    LEXERS.insert(0, lexer)
+
+
+def lexer_for(file_path):
+    """
+    Devuelve el analizador (objeto Lexer) de los ficheros como file_path
+    según su extensión (o su nombre), o None si no hay ninguno.
+    """
+    name = os.path.basename(file_path).lower()
+    extension = os.path.splitext(name)[1]
+
+    for lexer in LEXERS:
+        if (extension in lexer.extensions or name in lexer.extensions):
+            return lexer
+    return None
+
+
+def line_states(lexer, text, cancelled=None):
+    """
+    Calcula el estado en el que termina cada línea del texto text con el
+    analizador lexer. Puede llamarse desde un hilo secundario.
+
+    Argumentos:
+        lexer: Objeto Lexer.
+        text: String unicode con el texto (líneas separadas por u"\\n").
+        cancelled: Función que devuelve True si hay que dejar de calcular
+            (opcional).
+
+    Devuelve:
+        array de enteros con el estado final de cada línea (o None si se ha
+        cancelado).
+    """
+    states = array('i')
+    state = NORMAL_STATE
+
+    for number, line in enumerate(text.split(u"\n")):
+        if (cancelled is not None and number % 1000 == 0 and cancelled()):
+            return None
+        state = lexer.tokenize(line, state)[1]
+        states.append(state)
+
+    return states
+
+
+if __name__ == "__main__":
+    """
+    En caso de que intentemos ejecutar este módulo.
+    """
+    print(u"Este módulo no puede ser ejecutado", file=sys.stderr)
@@ -0,0 +1,257 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Módulo con la instrumentación (medida de tiempos y contadores) del editor de
+texto.
+
+La instrumentación se activa con variables de entorno al iniciar el
+programa:
+    TEXT_EDITOR_TRACE: Ruta al fichero de traza (líneas JSON, que se rota
+        al superar TRACE_MAX_BYTES).
+    TEXT_EDITOR_CHROME_TRACE: Ruta al fichero en el que se guarda, al salir,
+        la traza en el formato de Chrome (chrome://tracing).
+    TEXT_EDITOR_DEBUG: Si tiene valor, la barra de estado muestra los tiempos
+        y la memoria del programa.
+
+Si ninguna está definida, el decorador traced devuelve las funciones sin
+modificar, así que la instrumentación no tiene ningún coste.
+
+Autor: Andrés Salinas Lima <i52salia@uco.es>.
+"""
+
+from __future__ import print_function
+from collections import deque
+import atexit
+import functools
+import json
+import sys
+import os
+import threading
+import timeit
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+# Variables de entorno que activan la instrumentación.
+TRACE_VARIABLE = "TEXT_EDITOR_TRACE"
+CHROME_TRACE_VARIABLE = "TEXT_EDITOR_CHROME_TRACE"
+DEBUG_VARIABLE = "TEXT_EDITOR_DEBUG"
+
+# Tamaño máximo del fichero de traza y número de ficheros antiguos que se
+# conservan al rotarlo.
+TRACE_MAX_BYTES = 10 * 1024 * 1024
+TRACE_BACKUP_COUNT = 3
+
+# Número máximo de eventos que se guardan en memoria para la traza de Chrome.
+CHROME_TRACE_EVENTS = 100000
+
+# True si la instrumentación está activada.
+enabled = bool(os.environ.get(TRACE_VARIABLE) or
+               os.environ.get(CHROME_TRACE_VARIABLE) or
+               os.environ.get(DEBUG_VARIABLE))
+
+# True si se muestran los tiempos y la memoria en la barra de estado.
+debug = bool(os.environ.get(DEBUG_VARIABLE))
+
+# Recopilador de la instrumentación (objeto Tracer, si está activada).
+tracer = None
+
+
+class Tracer():
+    """
+    Clase Tracer: Recoge los tiempos y contadores de la instrumentación.
+
+    Puede usarse desde varios hilos a la vez.
+
+    Argumentos:
+        trace_path: String con la ruta al fichero de traza en líneas JSON (o
+            None para no escribirla).
+        chrome_trace_path: String con la ruta al fichero de la traza de
+            Chrome (o None para no escribirla).
+    """
+
+    def __init__(self, trace_path=None, chrome_trace_path=None):
+        self._lock = threading.Lock()
+        self._start = timeit.default_timer()
+
+        # Estadísticas de cada medida: [llamadas, total, última, máximo] (en
+        # segundos) y contadores.
+        self._timings = {}
+        self._counters = {}
+
+        self._logger = None
+        if (trace_path):
+            # logging solo se importa si hay que escribir la traza.
+            import logging
+            import logging.handlers
+
+            self._logger = logging.getLogger(u"text_editor_trace")
+            self._logger.propagate = False
+            self._logger.setLevel(logging.INFO)
+            handler = logging.handlers.RotatingFileHandler(
+                trace_path, maxBytes=TRACE_MAX_BYTES,
+                backupCount=TRACE_BACKUP_COUNT)
+            handler.setFormatter(logging.Formatter(u"%(message)s"))
+            self._logger.addHandler(handler)
+
+        self._chrome_trace_path = chrome_trace_path
+        self._chrome_events = None
+        if (chrome_trace_path):
+            self._chrome_events = deque(maxlen=CHROME_TRACE_EVENTS)
+            atexit.register(self.write_chrome_trace)
+
+    def add_timing(self, name, start, duration):
+        """
+        Añade una medida.
+
+        Argumentos:
+            name: String con el nombre de lo que se ha medido.
+            start: Instante (de timeit.default_timer) en el que empezó.
+            duration: Duración en segundos.
+        """
+        with self._lock:
+            timing = self._timings.get(name)
+            if (timing is None):
+                timing = self._timings[name] = [0, 0.0, 0.0, 0.0]
+            timing[0] += 1
+            timing[1] += duration
+            timing[2] = duration
+            timing[3] = max(timing[3], duration)
+
+        if (self._logger is None and self._chrome_events is None):
+            return
+
+        event = {
+            u"name": name,
+            u"start": round(start - self._start, 6),
+            u"duration": round(duration, 6),
+            u"thread": threading.current_thread().name,
+        }
+        if (self._logger is not None):
+            self._logger.info(json.dumps(event))
+        if (self._chrome_events is not None):
+            self._chrome_events.append(event)
+
+    def count(self, name, increment=1):
+        """
+        Suma increment al contador name.
+        """
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + increment
+
+    def last(self, name):
+        """
+        Devuelve la duración (en segundos) de la última medida name (o None
+        si no hay ninguna).
+        """
+        with self._lock:
+            timing = self._timings.get(name)
+            return timing[2] if timing is not None else None
+
+    def snapshot(self):
+        """
+        Devuelve una tupla (medidas, contadores): un diccionario con las
+        estadísticas de cada medida (diccionario con count, total, last y
+        max) y otro con el valor de cada contador.
+        """
+        with self._lock:
+            timings = dict((name, {u"count": timing[0], u"total": timing[1],
+                                   u"last": timing[2], u"max": timing[3]})
+                           for name, timing in self._timings.items())
+            return (timings, dict(self._counters))
+
+    def write_chrome_trace(self):
+        """
+        Escribe los eventos recogidos en el fichero de la traza de Chrome.
+        """
+        if (self._chrome_events is None):
+            return
+
+        process_id = os.getpid()
+        thread_ids = {}
+        events = []
+        for event in list(self._chrome_events):
+            thread_id = thread_ids.setdefault(event[u"thread"],
+                                              len(thread_ids) + 1)
+            events.append({
+                u"name": event[u"name"],
+                u"ph": u"X",
+                u"ts": int(event[u"start"] * 1000000),
+                u"dur": int(event[u"duration"] * 1000000),
+                u"pid": process_id,
+                u"tid": thread_id,
+            })
+        for name, thread_id in thread_ids.items():
+            events.append({u"name": u"thread_name", u"ph": u"M",
+                           u"pid": process_id, u"tid": thread_id,
+                           u"args": {u"name": name}})
+
+        try:
+            with open(self._chrome_trace_path, 'w') as file:
+                json.dump({u"traceEvents": events}, file)
+        except (IOError, OSError):
+            pass
+
+
+def traced(name):
+    """
+    Decorador que mide cada llamada a la función decorada con el nombre name.
+    Si la instrumentación no está activada, devuelve la función sin
+    modificar.
+    """
+    def decorator(function):
+        if (not enabled):
+            return function
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start = timeit.default_timer()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                tracer.add_timing(name, start,
+                                  timeit.default_timer() - start)
+
+        return wrapper
+
+    return decorator
+
+
+def memory_usage():
+    """
+    Devuelve una tupla (actual, máxima) con la memoria (RSS) del proceso en
+    KB. Cada valor es None si no se puede medir en este sistema.
+    """
+    current = None
+    try:
+        # Solo existe en Linux: el segundo valor son las páginas residentes.
+        with open("/proc/self/statm") as file:
+            pages = int(file.read().split()[1])
+        current = pages * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (IOError, OSError, ValueError, IndexError):
+        pass
+
+    peak = None
+    if (resource is not None):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Mac OS X la da en bytes; Linux, en KB.
+        if (sys.platform == "darwin"):
+            peak //= 1024
+
+    return (current, peak)
+
+
+if (enabled):
+    tracer = Tracer(os.environ.get(TRACE_VARIABLE),
+                    os.environ.get(CHROME_TRACE_VARIABLE))
+
+
+if __name__ == "__main__":
+    """
+    En caso de que intentemos ejecutar este módulo.
+    """
+    print(u"Este módulo no puede ser ejecutado", file=sys.stderr)
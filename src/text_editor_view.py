@@ -8,7 +8,12 @@ Autor: Andrés Salinas Lima <i52salia@uco.es>.
 """
 
 from __future__ import print_function
+from text_editor_syntax import KEYWORD, CONSTANT, STRING, NUMBER, COMMENT
+from text_editor_syntax import KEY, DECORATOR, TIMESTAMP, ERROR, WARNING
+from text_editor_syntax import NORMAL_STATE
+from bisect import bisect_left
 import sys
+import timeit
 from PyQt4 import QtCore
 from PyQt4 import QtGui
 
@@ -44,8 +49,25 @@ class text_editor_widget(QtGui.QWidget):
     Atributos:
         opened_folder_label: QLineEdit que muestra la ruta de la carpeta abierta.
         opened_file_label: QLineEdit que muestra la ruta del fichero abierto.
-        file_list: QListWidget que muestra la lista de ficheros de la carpeta.
-        text_edit: QTextEdit para mostrar/editar el fichero.
+        file_list: QListView que muestra la lista de ficheros de la carpeta.
+        file_list_model: Modelo de la lista de ficheros (objeto de la clase
+            FileListModel).
+        project_tree: QTreeView que muestra el árbol de subcarpetas y ficheros
+            de la carpeta abierta.
+        project_tree_model: Modelo del árbol del proyecto (objeto de la clase
+            ProjectTreeModel).
+        sidebar: QTabWidget del panel lateral con la lista de ficheros y el
+            árbol del proyecto.
+        document_tabs: QTabBar con una pestaña por cada documento abierto.
+        text_edit: QPlainTextEdit para mostrar/editar el fichero.
+        highlighter: Resaltado de sintaxis del editor (objeto de la clase
+            SyntaxHighlighter).
+        hex_view: QListView que muestra en hexadecimal el fichero abierto si
+            es binario (en lugar de text_edit), oculto hasta que se necesita.
+        hex_model: Modelo de la vista hexadecimal (objeto de la clase
+            HexModel).
+        find_bar: Barra para buscar y reemplazar texto en el fichero abierto
+            (objeto de la clase FindBar), oculta hasta que se necesita.
         refresh_button: QPushButton para recargar la lista de ficheros.
     """
 
@@ -84,8 +106,12 @@ class text_editor_widget(QtGui.QWidget):
         self.opened_file_label.setStatusTip(u"Ruta del fichero abierto")
 
         ##### Lista de ficheros #####
-        self.file_list = QtGui.QListWidget()
-        self.file_list.setFixedWidth(self._COLUMN_0_FIXED_WIDTH)
+        # Todas las filas miden lo mismo, así que Qt solo necesita calcular el
+        # tamaño de las filas visibles.
+        self.file_list_model = FileListModel(self)
+        self.file_list = QtGui.QListView()
+        self.file_list.setModel(self.file_list_model)
+        self.file_list.setUniformItemSizes(True)
         self.file_list.setMinimumHeight(self._ROW_2_MIN_HEIGHT)
         # Mostramos siempre las barras de scroll para evitar bug en el que
         # dichas barras de scroll no aparecen cuando deberían.
@@ -95,11 +121,67 @@ class text_editor_widget(QtGui.QWidget):
         self.file_list.setStatusTip(
             u"Ficheros de la carpeta abierta (seleccione uno para abrirlo)")
 
+        ##### Árbol del proyecto #####
+        self.project_tree_model = ProjectTreeModel(self)
+        self.project_tree = QtGui.QTreeView()
+        self.project_tree.setModel(self.project_tree_model)
+        self.project_tree.setHeaderHidden(True)
+        self.project_tree.setUniformRowHeights(True)
+        self.project_tree.setStatusTip(
+            u"Subcarpetas y ficheros de la carpeta abierta (seleccione un "
+            u"fichero para abrirlo)")
+
+        ##### Panel lateral #####
+        self.sidebar = QtGui.QTabWidget()
+        self.sidebar.setFixedWidth(self._COLUMN_0_FIXED_WIDTH)
+        self.sidebar.addTab(self.file_list, u"Carpeta")
+        self.sidebar.addTab(self.project_tree, u"Proyecto")
+
         ##### Editor de texto #####
-        self.text_edit = QtGui.QTextEdit()
+        # QPlainTextEdit solo admite texto plano y solo calcula la disposición
+        # de las líneas visibles. Sin ajuste de línea, además, redimensionar la
+        # ventana no obliga a recolocar el texto de todo el documento.
+        self.text_edit = QtGui.QPlainTextEdit()
+        self.text_edit.setLineWrapMode(QtGui.QPlainTextEdit.NoWrap)
         self.text_edit.setMinimumWidth(self._COLUMN_1_MIN_WIDTH)
         self.text_edit.setMinimumHeight(self._ROW_2_MIN_HEIGHT)
         self.text_edit.setStatusTip(u"Fichero abierto")
+        self.highlighter = SyntaxHighlighter(self.text_edit)
+
+        ##### Vista hexadecimal #####
+        # Como en la lista de ficheros, todas las filas miden lo mismo, así que
+        # solo se leen del fichero los bytes de las filas visibles.
+        self.hex_model = HexModel(self)
+        self.hex_view = QtGui.QListView()
+        self.hex_view.setModel(self.hex_model)
+        self.hex_view.setUniformItemSizes(True)
+        hex_font = QtGui.QFont(u"Monospace")
+        hex_font.setStyleHint(QtGui.QFont.TypeWriter)
+        self.hex_view.setFont(hex_font)
+        self.hex_view.setMinimumWidth(self._COLUMN_1_MIN_WIDTH)
+        self.hex_view.setMinimumHeight(self._ROW_2_MIN_HEIGHT)
+        self.hex_view.setStatusTip(u"Fichero binario abierto (solo lectura)")
+        self.hex_view.hide()
+
+        ##### Pestañas de documentos #####
+        self.document_tabs = QtGui.QTabBar()
+        self.document_tabs.setTabsClosable(True)
+        self.document_tabs.setDocumentMode(True)
+        self.document_tabs.setExpanding(False)
+        self.document_tabs.setStatusTip(u"Documentos abiertos")
+
+        editor_layout = QtGui.QVBoxLayout()
+        editor_layout.setContentsMargins(0, 0, 0, 0)
+        editor_layout.setSpacing(0)
+        editor_layout.addWidget(self.document_tabs)
+        editor_layout.addWidget(self.text_edit)
+        editor_layout.addWidget(self.hex_view)
+        editor_panel = QtGui.QWidget()
+        editor_panel.setLayout(editor_layout)
+
+        ##### Barra de búsqueda #####
+        self.find_bar = FindBar()
+        self.find_bar.hide()
 
         ##### Botones #####
         self.refresh_button = QtGui.QPushButton(u"Refrescar", self)
@@ -112,13 +194,714 @@ class text_editor_widget(QtGui.QWidget):
         grid.setSpacing(10)
         grid.addWidget(self.opened_folder_label, 0, 0)
         grid.addWidget(self.opened_file_label, 0, 1)
-        grid.addWidget(self.file_list, 1, 0)
-        grid.addWidget(self.text_edit, 1, 1, 2, 1)
+        grid.addWidget(self.sidebar, 1, 0)
+        grid.addWidget(editor_panel, 1, 1, 2, 1)
         grid.addWidget(self.refresh_button, 2, 0)
+        grid.addWidget(self.find_bar, 3, 1)
 
         self.setLayout(grid)
 
 
+class FindBar(QtGui.QWidget):
+    """
+    Clase FindBar: Barra para buscar y reemplazar texto en el fichero abierto.
+
+    Atributos:
+        find_edit: QLineEdit con el texto a buscar.
+        replace_edit: QLineEdit con el texto de reemplazo.
+        regex_check: QCheckBox para buscar una expresión regular.
+        case_check: QCheckBox para distinguir mayúsculas y minúsculas.
+        previous_button: QPushButton para ir a la coincidencia anterior.
+        next_button: QPushButton para ir a la coincidencia siguiente.
+        replace_button: QPushButton para reemplazar la coincidencia
+            seleccionada.
+        replace_all_button: QPushButton para reemplazar todas las
+            coincidencias.
+        close_button: QPushButton para ocultar la barra.
+        status_label: QLabel con el resultado de la búsqueda.
+    """
+
+    def __init__(self):
+        super(FindBar, self).__init__()
+        self._init_UI()
+
+    def _init_UI(self):
+        """
+        Inicialización de la interfaz.
+        """
+        self.find_edit = QtGui.QLineEdit()
+        self.find_edit.setPlaceholderText(u"Buscar")
+        self.replace_edit = QtGui.QLineEdit()
+        self.replace_edit.setPlaceholderText(u"Reemplazar por")
+
+        self.regex_check = QtGui.QCheckBox(u"Expresión regular")
+        self.case_check = QtGui.QCheckBox(u"Distinguir mayúsculas")
+
+        self.previous_button = QtGui.QPushButton(u"Anterior")
+        self.next_button = QtGui.QPushButton(u"Siguiente")
+        self.replace_button = QtGui.QPushButton(u"Reemplazar")
+        self.replace_all_button = QtGui.QPushButton(u"Reemplazar Todo")
+        self.close_button = QtGui.QPushButton(u"Cerrar")
+
+        self.status_label = QtGui.QLabel()
+
+        grid = QtGui.QGridLayout()
+        grid.setContentsMargins(0, 0, 0, 0)
+        grid.addWidget(self.find_edit, 0, 0)
+        grid.addWidget(self.previous_button, 0, 1)
+        grid.addWidget(self.next_button, 0, 2)
+        grid.addWidget(self.regex_check, 0, 3)
+        grid.addWidget(self.case_check, 0, 4)
+        grid.addWidget(self.close_button, 0, 5)
+        grid.addWidget(self.replace_edit, 1, 0)
+        grid.addWidget(self.replace_button, 1, 1)
+        grid.addWidget(self.replace_all_button, 1, 2)
+        grid.addWidget(self.status_label, 1, 3, 1, 3)
+        self.setLayout(grid)
+
+    def open(self, text=u""):
+        """
+        Muestra la barra con el texto a buscar text (si se indica)
+        seleccionado.
+        """
+        if (text):
+            self.find_edit.setText(text)
+
+        self.show()
+        self.find_edit.selectAll()
+        self.find_edit.setFocus()
+
+    def keyPressEvent(self, event):
+        """
+        Oculta la barra al pulsar Escape.
+        """
+        if (event.key() == QtCore.Qt.Key_Escape):
+            self.hide()
+        else:
+            super(FindBar, self).keyPressEvent(event)
+
+
+class SyntaxHighlighter(QtCore.QObject):
+    """
+    Clase SyntaxHighlighter: Resalta la sintaxis del documento de un
+    QPlainTextEdit sin bloquear la escritura.
+
+    A diferencia de QSyntaxHighlighter, que vuelve a analizar el documento
+    entero al asignárselo, solo se colorean los bloques (líneas) visibles
+    cuando se muestran. El estado del analizador léxico al final de cada
+    bloque se guarda en el propio bloque (userState), así que sigue siendo
+    válido aunque se inserten o borren líneas. Al modificar un bloque se
+    vuelve a analizar desde él hasta que el estado final de un bloque
+    coincide con el que tenía; si eso no ocurre enseguida (por ejemplo, al
+    abrir una cadena de varias líneas), el resto se analiza por tandas cortas
+    entre evento y evento.
+
+    Los estados de todo el documento se calculan en segundo plano sobre una
+    copia del texto y se aplican con set_states.
+
+    Argumentos:
+        text_edit: QPlainTextEdit cuyo documento se resalta.
+
+    Atributos:
+        generation: Contador que cambia cada vez que cambia el documento o el
+            analizador, para descartar los estados calculados para otros.
+    """
+
+    # Colores (y si va en negrita) de cada clase de fragmento.
+    _STYLES = {
+        KEYWORD: (u"#0000c0", True),
+        CONSTANT: (u"#800080", False),
+        STRING: (u"#a31515", False),
+        NUMBER: (u"#098658", False),
+        COMMENT: (u"#008000", False),
+        KEY: (u"#001080", True),
+        DECORATOR: (u"#795e26", False),
+        TIMESTAMP: (u"#267f99", False),
+        ERROR: (u"#e00000", True),
+        WARNING: (u"#c07000", True),
+    }
+
+    # Segundos que puede ocupar cada tanda de trabajo en el hilo de la
+    # interfaz.
+    _SLICE_TIME = 0.004
+
+    # Número de bloques que se analizan en el momento tras una modificación
+    # (el resto se analiza por tandas).
+    _EDIT_BLOCKS = 100
+
+    # Número máximo de bloques hacia atrás en los que se busca un estado
+    # conocido para empezar a analizar un bloque.
+    _LOOKBACK_BLOCKS = 500
+
+    def __init__(self, text_edit):
+        super(SyntaxHighlighter, self).__init__(text_edit)
+
+        self.generation = 0
+
+        self._text_edit = text_edit
+        self._document = None
+        self._lexer = None
+
+        self._formats = {}
+        for kind, (color, bold) in self._STYLES.items():
+            text_format = QtGui.QTextCharFormat()
+            text_format.setForeground(QtGui.QColor(color))
+            if (bold):
+                text_format.setFontWeight(QtGui.QFont.Bold)
+            self._formats[kind] = text_format
+
+        # Estados calculados en segundo plano pendientes de aplicar (y número
+        # del siguiente bloque) y primer bloque modificado desde que se tomó
+        # la copia del texto (los estados a partir de él ya no valen).
+        self._states = None
+        self._states_block = 0
+        self._dirty_from = None
+
+        # Números de los bloques desde los que hay que seguir analizando.
+        self._pending = []
+
+        self._work_timer = QtCore.QTimer(self)
+        self._work_timer.setInterval(0)
+        self._work_timer.timeout.connect(self._work)
+
+        # Los bloques visibles se colorean una sola vez por vuelta del bucle
+        # de eventos, aunque se pida varias veces.
+        self._visible_timer = QtCore.QTimer(self)
+        self._visible_timer.setSingleShot(True)
+        self._visible_timer.setInterval(0)
+        self._visible_timer.timeout.connect(self.highlight_visible)
+
+        text_edit.updateRequest.connect(self._visible_timer.start)
+
+    def set_document(self, document, lexer):
+        """
+        Resalta el documento document (QTextDocument) con el analizador lexer
+        (objeto Lexer o None para no resaltarlo).
+
+        Devuelve:
+            True si ha cambiado el documento o el analizador (y hay que
+            volver a calcular los estados en segundo plano); False en caso
+            contrario.
+        """
+        if (document is self._document and lexer is self._lexer):
+            return False
+
+        if (self._document is not None):
+            self._document.contentsChange.disconnect(self._document_changed)
+
+        self.generation += 1
+        self._document = document
+        self._lexer = lexer
+        self._states = None
+        self._dirty_from = None
+        self._pending = []
+        self._work_timer.stop()
+
+        document.contentsChange.connect(self._document_changed)
+        self._visible_timer.start()
+        return True
+
+    def set_states(self, states, generation):
+        """
+        Aplica (por tandas) los estados de las líneas states calculados en
+        segundo plano para la generación generation. Se descartan si el
+        documento o el analizador han cambiado desde entonces.
+        """
+        if (generation != self.generation):
+            return
+
+        self._states = states
+        self._states_block = 0
+        self._work_timer.start()
+
+    def highlight_visible(self):
+        """
+        Colorea los bloques visibles del editor que no estén ya coloreados
+        con su contenido y estado actuales.
+        """
+        if (self._lexer is None or self._document is None or
+                self._text_edit.document() is not self._document):
+            return
+
+        height = self._text_edit.viewport().height()
+        block = self._text_edit.cursorForPosition(QtCore.QPoint(0, 0)).block()
+        last_number = self._text_edit.cursorForPosition(
+            QtCore.QPoint(0, max(0, height - 1))).blockNumber()
+
+        while (block.isValid() and block.blockNumber() <= last_number):
+            self._color_block(block)
+            block = block.next()
+
+    def _color_block(self, block):
+        """
+        Colorea el bloque block (si su contenido, su estado inicial o el
+        analizador han cambiado desde que se coloreó).
+        """
+        state = self._start_state(block)
+        text = unicode(block.text())
+
+        data = block.userData()
+        key = (self._lexer.name, state, hash(text))
+        if (isinstance(data, _HighlightData) and data.key == key):
+            return
+
+        tokens, end_state = self._lexer.tokenize(text, state)
+        if (end_state != block.userState()):
+            block.setUserState(end_state)
+            # Los bloques siguientes no visibles también cambian.
+            self._pending.append(block.blockNumber() + 1)
+            self._work_timer.start()
+
+        ranges = []
+        for start, length, kind in tokens:
+            format_range = QtGui.QTextLayout.FormatRange()
+            format_range.start = start
+            format_range.length = length
+            format_range.format = self._formats[kind]
+            ranges.append(format_range)
+
+        block.layout().setAdditionalFormats(ranges)
+        block.setUserData(_HighlightData(key))
+        self._document.markContentsDirty(block.position(), block.length())
+
+    def _start_state(self, block):
+        """
+        Devuelve el estado del analizador al principio del bloque block (el
+        estado final del bloque anterior). Si no se conoce, se analizan los
+        bloques anteriores desde el último con estado conocido.
+        """
+        previous = block.previous()
+        if (not previous.isValid()):
+            return NORMAL_STATE
+        if (previous.userState() >= 0):
+            return previous.userState()
+
+        # Buscamos hacia atrás un bloque con estado conocido.
+        blocks = []
+        state = NORMAL_STATE
+        while (previous.isValid() and len(blocks) < self._LOOKBACK_BLOCKS):
+            if (previous.userState() >= 0):
+                state = previous.userState()
+                break
+            blocks.append(previous)
+            previous = previous.previous()
+
+        for previous in reversed(blocks):
+            state = self._lexer.tokenize(unicode(previous.text()), state)[1]
+            previous.setUserState(state)
+
+        return state
+
+    def _document_changed(self, position, chars_removed, chars_added):
+        """
+        Vuelve a analizar los bloques modificados (chars_removed caracteres
+        borrados y chars_added añadidos a partir de la posición position) y
+        los siguientes hasta que el estado converja.
+        """
+        if (self._lexer is None or (not chars_removed and not chars_added)):
+            return
+
+        first = self._document.findBlock(position).blockNumber()
+        last = self._document.findBlock(position + chars_added).blockNumber()
+
+        if (self._dirty_from is None or first < self._dirty_from):
+            self._dirty_from = first
+
+        next_number = self._analyze(first, last, self._EDIT_BLOCKS)
+        if (next_number is not None):
+            self._pending.append(next_number)
+            self._work_timer.start()
+
+    def _analyze(self, number, last_number, budget):
+        """
+        Analiza los bloques desde el número number hasta el last_number (como
+        mínimo) y después hasta que el estado final de uno coincida con el
+        que ya tenía, como mucho budget bloques.
+
+        Devuelve:
+            Número del bloque desde el que hay que seguir analizando, o None
+            si el estado ha convergido.
+        """
+        block = self._document.findBlockByNumber(number)
+        if (not block.isValid()):
+            return None
+
+        state = self._start_state(block)
+        while (block.isValid()):
+            old_state = block.userState()
+            state = self._lexer.tokenize(unicode(block.text()), state)[1]
+            block.setUserState(state)
+
+            if (block.blockNumber() >= last_number and state == old_state):
+                return None
+
+            budget -= 1
+            block = block.next()
+            if (budget <= 0 and block.isValid()):
+                return block.blockNumber()
+
+        return None
+
+    def _work(self):
+        """
+        Hace una tanda de trabajo pendiente (aplicar estados calculados en
+        segundo plano o seguir analizando tras una modificación) sin ocupar
+        el hilo de la interfaz más de _SLICE_TIME segundos.
+        """
+        if (self._lexer is None):
+            self._work_timer.stop()
+            return
+
+        start = timeit.default_timer()
+        while (timeit.default_timer() - start < self._SLICE_TIME):
+            if (self._states is not None):
+                self._apply_states()
+            elif (self._pending):
+                next_number = self._analyze(self._pending.pop(0), -1, 200)
+                if (next_number is not None):
+                    self._pending.insert(0, next_number)
+            else:
+                self._work_timer.stop()
+                break
+
+        self._visible_timer.start()
+
+    def _apply_states(self):
+        """
+        Aplica una tanda de los estados calculados en segundo plano a los
+        bloques que no se han modificado desde que se tomó la copia del
+        texto.
+        """
+        end = len(self._states)
+        if (self._dirty_from is not None):
+            end = min(end, self._dirty_from)
+
+        block = self._document.findBlockByNumber(self._states_block)
+        last = min(self._states_block + 500, end)
+        number = self._states_block
+        while (block.isValid() and number < last):
+            block.setUserState(self._states[number])
+            block = block.next()
+            number += 1
+
+        self._states_block = number
+        if (number >= end or not block.isValid()):
+            self._states = None
+            # Lo que se ha modificado desde la copia se analiza aquí.
+            if (self._dirty_from is not None):
+                self._pending.append(self._dirty_from)
+
+
+class _HighlightData(QtGui.QTextBlockUserData):
+    """
+    Clase _HighlightData: Datos de un bloque coloreado por SyntaxHighlighter.
+
+    Argumentos:
+        key: Tupla (analizador, estado inicial, hash del texto) con la que se
+            coloreó el bloque.
+    """
+
+    def __init__(self, key):
+        super(_HighlightData, self).__init__()
+        self.key = key
+
+
+class FileListModel(QtCore.QAbstractListModel):
+    """
+    Clase FileListModel: Modelo de la lista de ficheros de la carpeta abierta.
+
+    Guarda solo una lista ordenada con los nombres de los ficheros (sin crear
+    un objeto de Qt por fichero) y la entrega a la vista por lotes a medida
+    que el usuario se desplaza por ella (fetchMore).
+
+    Argumentos:
+        parent: QObject padre.
+    """
+
+    # Número de ficheros que se entregan a la vista en cada lote.
+    _BATCH_SIZE = 1000
+
+    def __init__(self, parent=None):
+        super(FileListModel, self).__init__(parent)
+
+        self._files = []
+        self._loaded = 0  # Número de ficheros entregados a la vista.
+
+    def set_files(self, files):
+        """
+        Sustituye la lista de ficheros por la lista ordenada files.
+        """
+        self.beginResetModel()
+        self._files = list(files)
+        self._loaded = min(len(self._files), self._BATCH_SIZE)
+        self.endResetModel()
+
+    def insert_file(self, name):
+        """
+        Inserta el fichero name en su posición dentro de la lista ordenada.
+        """
+        row = bisect_left(self._files, name)
+        if (row < len(self._files) and self._files[row] == name):
+            return
+
+        # Si la posición todavía no se ha entregado a la vista, basta con
+        # añadirlo a la lista.
+        if (row > self._loaded):
+            self._files.insert(row, name)
+            return
+
+        self.beginInsertRows(QtCore.QModelIndex(), row, row)
+        self._files.insert(row, name)
+        self._loaded += 1
+        self.endInsertRows()
+
+    def remove_file(self, name):
+        """
+        Elimina el fichero name de la lista.
+        """
+        row = bisect_left(self._files, name)
+        if (row >= len(self._files) or self._files[row] != name):
+            return
+
+        if (row >= self._loaded):
+            del self._files[row]
+            return
+
+        self.beginRemoveRows(QtCore.QModelIndex(), row, row)
+        del self._files[row]
+        self._loaded -= 1
+        self.endRemoveRows()
+
+    def file_at(self, row):
+        """
+        Devuelve el nombre del fichero de la fila row.
+        """
+        return self._files[row]
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        if (parent.isValid()):
+            return 0
+        return self._loaded
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if (index.isValid() and role == QtCore.Qt.DisplayRole):
+            return self._files[index.row()]
+        return None
+
+    def canFetchMore(self, parent):
+        if (parent.isValid()):
+            return False
+        return self._loaded < len(self._files)
+
+    def fetchMore(self, parent):
+        if (parent.isValid()):
+            return
+
+        count = min(len(self._files) - self._loaded, self._BATCH_SIZE)
+        self.beginInsertRows(QtCore.QModelIndex(), self._loaded,
+                             self._loaded + count - 1)
+        self._loaded += count
+        self.endInsertRows()
+
+
+class HexModel(QtCore.QAbstractListModel):
+    """
+    Clase HexModel: Modelo de la vista hexadecimal de un fichero binario.
+
+    Cada fila muestra BYTES_PER_ROW bytes del fichero (su posición, sus
+    valores en hexadecimal y los caracteres ASCII imprimibles). Las filas se
+    leen del fichero proyectado en memoria solo cuando la vista las pide.
+
+    Argumentos:
+        parent: QObject padre.
+    """
+
+    # Número de bytes de cada fila.
+    BYTES_PER_ROW = 16
+
+    def __init__(self, parent=None):
+        super(HexModel, self).__init__(parent)
+
+        self._binary = None  # Objeto MappedBinaryFile mostrado.
+
+    def set_file(self, binary):
+        """
+        Muestra el fichero binary (objeto MappedBinaryFile o None para no
+        mostrar nada).
+        """
+        if (binary is self._binary):
+            return
+
+        self.beginResetModel()
+        self._binary = binary
+        self.endResetModel()
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        if (parent.isValid() or self._binary is None):
+            return 0
+        return ((self._binary.size + self.BYTES_PER_ROW - 1) //
+                self.BYTES_PER_ROW)
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if (not index.isValid() or role != QtCore.Qt.DisplayRole):
+            return None
+
+        offset = index.row() * self.BYTES_PER_ROW
+        row = bytearray(self._binary.read(offset, self.BYTES_PER_ROW))
+
+        hex_bytes = u" ".join(u"%02x" % byte for byte in row)
+        ascii_chars = u"".join(unichr(byte) if 32 <= byte < 127 else u"."
+                               for byte in row)
+
+        return u"%08x  %-*s  %s" % (offset, self.BYTES_PER_ROW * 3 - 1,
+                                    hex_bytes, ascii_chars)
+
+
+class _ProjectTreeNode():
+    """
+    Clase _ProjectTreeNode: Carpeta o fichero del árbol del proyecto.
+
+    Atributos:
+        name: String con el nombre.
+        path: String con la ruta relativa a la carpeta raíz (con / como
+            separador).
+        is_folder: True si es una carpeta.
+        parent: Nodo padre (None en la raíz).
+        row: Posición dentro de los hijos del padre.
+        children: Lista de nodos hijos (None si todavía no se ha cargado).
+    """
+
+    def __init__(self, name, path, is_folder, parent, row):
+        self.name = name
+        self.path = path
+        self.is_folder = is_folder
+        self.parent = parent
+        self.row = row
+        self.children = None
+
+
+class ProjectTreeModel(QtCore.QAbstractItemModel):
+    """
+    Clase ProjectTreeModel: Modelo del árbol de subcarpetas y ficheros de la
+    carpeta abierta.
+
+    El contenido de cada carpeta solo se lee cuando el usuario la despliega
+    (fetchMore), por lo que abrir una carpeta con muchas subcarpetas es
+    inmediato.
+
+    Argumentos:
+        parent: QObject padre.
+    """
+
+    def __init__(self, parent=None):
+        super(ProjectTreeModel, self).__init__(parent)
+
+        self._root = _ProjectTreeNode(u"", u"", True, None, 0)
+        self._list_folder = None
+
+    def set_root(self, list_folder):
+        """
+        Vacía el árbol para mostrar una nueva carpeta raíz.
+
+        Argumentos:
+            list_folder: Función que recibe la ruta relativa de una carpeta y
+                devuelve la tupla (carpetas, ficheros) con los nombres de su
+                contenido.
+        """
+        self.beginResetModel()
+        self._root = _ProjectTreeNode(u"", u"", True, None, 0)
+        self._list_folder = list_folder
+        self.endResetModel()
+
+    def file_path(self, index):
+        """
+        Devuelve la ruta relativa (con / como separador) del fichero del
+        índice index, o None si es una carpeta.
+        """
+        node = self._node(index)
+        if (node.is_folder):
+            return None
+        return node.path
+
+    def index(self, row, column, parent=QtCore.QModelIndex()):
+        node = self._node(parent)
+        if (node.children is None or row < 0 or row >= len(node.children)):
+            return QtCore.QModelIndex()
+        return self.createIndex(row, column, node.children[row])
+
+    def parent(self, index):
+        if (not index.isValid()):
+            return QtCore.QModelIndex()
+
+        parent = index.internalPointer().parent
+        if (parent is None or parent is self._root):
+            return QtCore.QModelIndex()
+        return self.createIndex(parent.row, 0, parent)
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        node = self._node(parent)
+        if (node.children is None):
+            return 0
+        return len(node.children)
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return 1
+
+    def hasChildren(self, parent=QtCore.QModelIndex()):
+        node = self._node(parent)
+        return node.is_folder and (node.children is None or
+                                   len(node.children) > 0)
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if (not index.isValid()):
+            return None
+
+        node = index.internalPointer()
+        if (role == QtCore.Qt.DisplayRole):
+            return node.name
+        if (role == QtCore.Qt.DecorationRole):
+            icon = (QtGui.QStyle.SP_DirIcon if node.is_folder
+                    else QtGui.QStyle.SP_FileIcon)
+            return QtGui.QApplication.style().standardIcon(icon)
+        return None
+
+    def canFetchMore(self, parent):
+        node = self._node(parent)
+        return (self._list_folder is not None and node.is_folder and
+                node.children is None)
+
+    def fetchMore(self, parent):
+        node = self._node(parent)
+
+        try:
+            folders, files = self._list_folder(node.path)
+        except (IOError, OSError):
+            folders, files = ([], [])
+
+        prefix = node.path + u"/" if node.path else u""
+        children = [_ProjectTreeNode(name, prefix + name, True, node, row)
+                    for row, name in enumerate(folders)]
+        children.extend(_ProjectTreeNode(name, prefix + name, False, node,
+                                         len(folders) + row)
+                        for row, name in enumerate(files))
+
+        if (not children):
+            node.children = []
+            return
+
+        self.beginInsertRows(parent, 0, len(children) - 1)
+        node.children = children
+        self.endInsertRows()
+
+    def _node(self, index):
+        """
+        Devuelve el nodo del índice index (la raíz si no es válido).
+        """
+        if (index.isValid()):
+            return index.internalPointer()
+        return self._root
+
+
 class TextEditorMainWindow(QtGui.QMainWindow):
     """
     Clase TextEditorMainWindow: Ventana principal del programa.
@@ -138,6 +921,33 @@ class TextEditorMainWindow(QtGui.QMainWindow):
         open_folder_action: QAction para abrir carpeta.
         save_file_action: QAction para guardar fichero.
         save_as_action: QAction para guardar fichero como.
+        quick_open_action: QAction para buscar y abrir un fichero por nombre.
+        quick_open_dialog: Ventana para buscar ficheros por nombre (objeto de
+            la clase QuickOpenDialog).
+        find_action: QAction para buscar texto en el fichero abierto.
+        find_next_action: QAction para ir a la siguiente coincidencia.
+        find_previous_action: QAction para ir a la coincidencia anterior.
+        search_folder_action: QAction para buscar texto en la carpeta abierta.
+        search_folder_dialog: Ventana para buscar texto en la carpeta abierta
+            (objeto de la clase SearchFolderDialog).
+        progress_bar: QProgressBar de la barra de estado que muestra el
+            progreso de la operación de fichero en curso.
+        cancel_button: QPushButton de la barra de estado para cancelar la
+            operación de fichero en curso.
+        format_label: QLabel de la barra de estado con la codificación y los
+            saltos de línea del fichero abierto.
+        performance_label: QLabel de la barra de estado con los tiempos de
+            las últimas operaciones y la memoria usada (oculto salvo en modo
+            depuración).
+        error_log_button: QPushButton de la barra de estado con el número de
+            errores, que muestra el registro de errores (oculto mientras no
+            hay ninguno).
+        error_log_dock: Panel con el registro de errores (objeto de la clase
+            ErrorLogDock).
+        error_log_action: QAction para mostrar u ocultar el registro de
+            errores.
+        notification_toast: Aviso no modal de la ventana (objeto de la clase
+            NotificationToast).
     """
 
     def __init__(self, text_editor_widget):
@@ -165,6 +975,31 @@ class TextEditorMainWindow(QtGui.QMainWindow):
         self.open_folder_action.setShortcut('Ctrl+Shift+O')
         self.open_folder_action.setStatusTip(u"Abrir carpeta")
 
+        self.quick_open_action = QtGui.QAction(u"Ir a Fichero...", self)
+        self.quick_open_action.setShortcut('Ctrl+P')
+        self.quick_open_action.setStatusTip(
+            u"Buscar un fichero de la carpeta abierta por su nombre")
+
+        self.find_action = QtGui.QAction(u"Buscar y Reemplazar...", self)
+        self.find_action.setShortcut('Ctrl+F')
+        self.find_action.setStatusTip(
+            u"Buscar y reemplazar texto en el fichero abierto")
+
+        self.find_next_action = QtGui.QAction(u"Buscar Siguiente", self)
+        self.find_next_action.setShortcut('F3')
+        self.find_next_action.setStatusTip(u"Ir a la siguiente coincidencia")
+
+        self.find_previous_action = QtGui.QAction(u"Buscar Anterior", self)
+        self.find_previous_action.setShortcut('Shift+F3')
+        self.find_previous_action.setStatusTip(
+            u"Ir a la coincidencia anterior")
+
+        self.search_folder_action = QtGui.QAction(u"Buscar en Carpeta...",
+                                                  self)
+        self.search_folder_action.setShortcut('Ctrl+Shift+F')
+        self.search_folder_action.setStatusTip(
+            u"Buscar texto en todos los ficheros de la carpeta abierta")
+
         self.save_file_action = QtGui.QAction(u"Guardar", self)
         self.save_file_action.setShortcut('Ctrl+S')
         self.save_file_action.setStatusTip(
@@ -175,16 +1010,36 @@ class TextEditorMainWindow(QtGui.QMainWindow):
         self.save_as_action.setStatusTip(
             u"Guardar cambios del fichero abierto en un nuevo fichero")
 
+        # El panel del registro de errores ya trae la acción para mostrarlo u
+        # ocultarlo.
+        self.error_log_dock = ErrorLogDock(self)
+        self.error_log_dock.hide()
+        self.addDockWidget(QtCore.Qt.BottomDockWidgetArea, self.error_log_dock)
+
+        self.error_log_action = self.error_log_dock.toggleViewAction()
+        self.error_log_action.setText(u"Registro de Errores")
+        self.error_log_action.setStatusTip(
+            u"Mostrar u ocultar el registro de errores")
+
         ##### Barra de menús #####
         menuBar = self.menuBar()
         file_menu = menuBar.addMenu(u"Archivo")
         file_menu.addAction(self.open_file_action)
         file_menu.addAction(self.open_folder_action)
+        file_menu.addAction(self.quick_open_action)
         file_menu.addSeparator()
         file_menu.addAction(self.save_file_action)
         file_menu.addAction(self.save_as_action)
         file_menu.addSeparator()
         file_menu.addAction(self.exit_action)
+        search_menu = menuBar.addMenu(u"Buscar")
+        search_menu.addAction(self.find_action)
+        search_menu.addAction(self.find_next_action)
+        search_menu.addAction(self.find_previous_action)
+        search_menu.addSeparator()
+        search_menu.addAction(self.search_folder_action)
+        view_menu = menuBar.addMenu(u"Ver")
+        view_menu.addAction(self.error_log_action)
 
         ##### Barra de herramientas #####
         toolBar = self.addToolBar(u"Barra de Herramientas")
@@ -197,43 +1052,366 @@ class TextEditorMainWindow(QtGui.QMainWindow):
         ##### Barra de estado #####
         self.statusBar()  # Activa la barra de estado.
 
+        # Progreso de las operaciones de fichero (ocultos mientras no hay
+        # ninguna en curso).
+        self.progress_bar = QtGui.QProgressBar()
+        self.progress_bar.setRange(0, 100)
+        self.progress_bar.setMaximumWidth(200)
+        self.progress_bar.hide()
+        self.statusBar().addPermanentWidget(self.progress_bar)
+
+        self.cancel_button = QtGui.QPushButton(u"Cancelar")
+        self.cancel_button.setStatusTip(u"Cancelar la operación en curso")
+        self.cancel_button.hide()
+        self.statusBar().addPermanentWidget(self.cancel_button)
+
+        self.format_label = QtGui.QLabel()
+        self.format_label.setStatusTip(
+            u"Codificación y saltos de línea del fichero abierto")
+        self.statusBar().addPermanentWidget(self.format_label)
+
+        self.performance_label = QtGui.QLabel()
+        self.performance_label.setStatusTip(
+            u"Tiempos de las últimas operaciones y memoria usada")
+        self.performance_label.hide()
+        self.statusBar().addPermanentWidget(self.performance_label)
+
+        self.error_log_button = QtGui.QPushButton()
+        self.error_log_button.setFlat(True)
+        self.error_log_button.setStatusTip(u"Mostrar el registro de errores")
+        self.error_log_button.hide()
+        self.statusBar().addPermanentWidget(self.error_log_button)
+
+        ##### Ventanas #####
+        self.quick_open_dialog = QuickOpenDialog(self)
+        self.search_folder_dialog = SearchFolderDialog(self)
+        self.notification_toast = NotificationToast(self)
+
         ##### Widget contador #####
         # Añade a la ventana principal el contador.
         self.setCentralWidget(self.text_editor_widget)
 
         ##### Propiedades ventana #####
-        self.setWindowTitle(u"Editor de Texto")
+        # Qt sustituye [*] por un asterisco cuando hay cambios sin guardar.
+        self.setWindowTitle(u"Editor de Texto[*]")
+
+    def show_error_count(self, count):
+        """
+        Muestra en la barra de estado el número count de errores registrados.
+        """
+        self.error_log_button.setText(u"Errores: %d" % count)
+        self.error_log_button.setVisible(count > 0)
+
+    def resizeEvent(self, event):
+        """
+        Mantiene el aviso en la esquina de la ventana al cambiar su tamaño.
+        """
+        super(TextEditorMainWindow, self).resizeEvent(event)
+        self.notification_toast.move_to_corner()
 
 
-class TextEditorDialogs():
+class QuickOpenDialog(QtGui.QDialog):
     """
-    Clase TextEditorDialogs: Contiene métodos para mostrar mensajes emergentes y
-    ventanas de diálogo para abrir/guardar ficheros/directorios.
+    Clase QuickOpenDialog: Ventana para buscar ficheros por nombre mientras se
+    escribe y abrir uno de ellos.
+
+    Argumentos:
+        parent: QWidget padre.
+
+    Atributos:
+        search_edit: QLineEdit en el que se escribe el texto a buscar.
+        result_list: QListWidget con los ficheros encontrados.
     """
 
-    @staticmethod
-    def show_error_message(error_text):
+    def __init__(self, parent=None):
+        super(QuickOpenDialog, self).__init__(parent)
+        self._init_UI()
+
+    def _init_UI(self):
         """
-        Muestra una ventana emergente de error con el mensaje indicado en
-        el argumento error_text.
+        Inicialización de la interfaz.
         """
-        msg = QtGui.QMessageBox()
-        msg.setWindowTitle(u"Error")
-        msg.setIcon(QtGui.QMessageBox.Critical)
-        msg.setText(error_text)
-        msg.exec_()
+        self.search_edit = QtGui.QLineEdit()
+        self.search_edit.setPlaceholderText(u"Nombre del fichero")
 
-    @staticmethod
-    def show_info_message(info_text):
+        # Solo se muestran los mejores resultados, así que no hace falta un
+        # modelo propio.
+        self.result_list = QtGui.QListWidget()
+        self.result_list.setUniformItemSizes(True)
+
+        layout = QtGui.QVBoxLayout()
+        layout.addWidget(self.search_edit)
+        layout.addWidget(self.result_list)
+        self.setLayout(layout)
+
+        self.setWindowTitle(u"Ir a Fichero")
+        self.resize(500, 400)
+
+    def open(self):
         """
-        Muestra una ventana emergente de información con el mensaje indicado en
-        el argumento info_text.
+        Muestra la ventana vacía, lista para escribir.
         """
-        msg = QtGui.QMessageBox()
-        msg.setWindowTitle(u"Información")
-        msg.setIcon(QtGui.QMessageBox.Information)
-        msg.setText(info_text)
-        msg.exec_()
+        self.search_edit.clear()
+        self.result_list.clear()
+        self.show()
+        self.raise_()
+        self.activateWindow()
+        self.search_edit.setFocus()
+
+    def set_results(self, paths):
+        """
+        Muestra la lista de rutas paths como resultados y selecciona la
+        primera.
+        """
+        self.result_list.clear()
+        self.result_list.addItems(paths)
+        if (paths):
+            self.result_list.setCurrentRow(0)
+
+    def selected_path(self):
+        """
+        Devuelve la ruta del resultado seleccionado (o None si no hay
+        ninguno).
+        """
+        item = self.result_list.currentItem()
+        if (item is None):
+            return None
+        return unicode(item.text())
+
+    def keyPressEvent(self, event):
+        """
+        Permite moverse por los resultados con las flechas sin salir del campo
+        de búsqueda.
+        """
+        if (event.key() in (QtCore.Qt.Key_Up, QtCore.Qt.Key_Down)):
+            row = self.result_list.currentRow()
+            row += 1 if event.key() == QtCore.Qt.Key_Down else -1
+            if (0 <= row < self.result_list.count()):
+                self.result_list.setCurrentRow(row)
+        else:
+            super(QuickOpenDialog, self).keyPressEvent(event)
+
+
+class SearchFolderDialog(QtGui.QDialog):
+    """
+    Clase SearchFolderDialog: Ventana para buscar texto en todos los ficheros
+    de la carpeta abierta. Los resultados se van añadiendo según llegan.
+
+    Argumentos:
+        parent: QWidget padre.
+
+    Atributos:
+        search_edit: QLineEdit en el que se escribe el texto a buscar.
+        regex_check: QCheckBox para buscar una expresión regular.
+        case_check: QCheckBox para distinguir mayúsculas y minúsculas.
+        result_list: QListWidget con las coincidencias encontradas.
+        status_label: QLabel con el estado de la búsqueda.
+    """
+
+    # Número máximo de coincidencias que se muestran en la lista.
+    MAX_SHOWN_MATCHES = 10000
+
+    def __init__(self, parent=None):
+        super(SearchFolderDialog, self).__init__(parent)
+
+        # Tupla (ruta relativa, línea, columna) de cada fila de la lista.
+        self._matches = []
+
+        self._init_UI()
+
+    def _init_UI(self):
+        """
+        Inicialización de la interfaz.
+        """
+        self.search_edit = QtGui.QLineEdit()
+        self.search_edit.setPlaceholderText(u"Texto a buscar")
+
+        self.regex_check = QtGui.QCheckBox(u"Expresión regular")
+        self.case_check = QtGui.QCheckBox(u"Distinguir mayúsculas")
+
+        self.result_list = QtGui.QListWidget()
+        self.result_list.setUniformItemSizes(True)
+
+        self.status_label = QtGui.QLabel()
+
+        options = QtGui.QHBoxLayout()
+        options.addWidget(self.regex_check)
+        options.addWidget(self.case_check)
+        options.addStretch()
+
+        layout = QtGui.QVBoxLayout()
+        layout.addWidget(self.search_edit)
+        layout.addLayout(options)
+        layout.addWidget(self.result_list)
+        layout.addWidget(self.status_label)
+        self.setLayout(layout)
+
+        self.setWindowTitle(u"Buscar en Carpeta")
+        self.resize(700, 500)
+
+    def open(self):
+        """
+        Muestra la ventana con el texto a buscar seleccionado.
+        """
+        self.show()
+        self.raise_()
+        self.activateWindow()
+        self.search_edit.selectAll()
+        self.search_edit.setFocus()
+
+    def clear_matches(self):
+        """
+        Vacía la lista de coincidencias.
+        """
+        self.result_list.clear()
+        self.status_label.clear()
+        self._matches = []
+
+    def add_matches(self, matches):
+        """
+        Añade a la lista las coincidencias de la lista matches (tuplas
+        (ruta relativa, línea, columna, línea de texto)).
+        """
+        room = self.MAX_SHOWN_MATCHES - len(self._matches)
+        matches = matches[:max(room, 0)]
+
+        self.result_list.addItems([u"%s:%d: %s" % (path, line + 1, text.strip())
+                                   for path, line, _, text in matches])
+        self._matches.extend((path, line, column)
+                             for path, line, column, _ in matches)
+
+    def selected_match(self):
+        """
+        Devuelve la tupla (ruta relativa, línea, columna) de la coincidencia
+        seleccionada (o None si no hay ninguna).
+        """
+        row = self.result_list.currentRow()
+        if (row < 0):
+            return None
+        return self._matches[row]
+
+
+class NotificationToast(QtGui.QLabel):
+    """
+    Clase NotificationToast: Aviso que se muestra unos segundos en la esquina
+    inferior derecha de la ventana padre sin bloquearla ni quitarle el foco.
+    Al hacer click sobre él se oculta.
+
+    Argumentos:
+        parent: QWidget padre.
+    """
+
+    # Milisegundos durante los que se muestra cada aviso.
+    DISPLAY_TIME = 4000
+
+    # Separación en píxeles entre el aviso y los bordes de la ventana (por
+    # abajo se deja además sitio para la barra de estado).
+    MARGIN = 12
+    BOTTOM_MARGIN = 40
+
+    _INFO_STYLE = (u"background-color: #ffffe0; border: 1px solid #c0c080; "
+                   u"padding: 6px;")
+    _ERROR_STYLE = (u"background-color: #ffe0e0; border: 1px solid #c08080; "
+                    u"padding: 6px;")
+
+    def __init__(self, parent):
+        super(NotificationToast, self).__init__(parent)
+
+        self.setWordWrap(True)
+        self.setMaximumWidth(400)
+        self.hide()
+
+        self._hide_timer = QtCore.QTimer(self)
+        self._hide_timer.setSingleShot(True)
+        self._hide_timer.timeout.connect(self.hide)
+
+    def show_message(self, text, error=False):
+        """
+        Muestra el mensaje text (con el estilo de un error si error es True)
+        durante DISPLAY_TIME milisegundos.
+        """
+        self.setStyleSheet(self._ERROR_STYLE if error else self._INFO_STYLE)
+        self.setText(text)
+        self.adjustSize()
+        self.move_to_corner()
+        self.show()
+        self.raise_()
+        self._hide_timer.start(self.DISPLAY_TIME)
+
+    def move_to_corner(self):
+        """
+        Coloca el aviso en la esquina inferior derecha de la ventana padre.
+        """
+        parent = self.parentWidget()
+        self.move(max(parent.width() - self.width() - self.MARGIN, 0),
+                  max(parent.height() - self.height() - self.BOTTOM_MARGIN, 0))
+
+    def mousePressEvent(self, event):
+        """
+        Oculta el aviso al hacer click sobre él.
+        """
+        self._hide_timer.stop()
+        self.hide()
+
+
+class ErrorLogDock(QtGui.QDockWidget):
+    """
+    Clase ErrorLogDock: Panel con los últimos errores producidos, para poder
+    consultarlos después de que su aviso haya desaparecido.
+
+    Argumentos:
+        parent: QWidget padre.
+
+    Atributos:
+        error_list: QListWidget con los errores, del más reciente al más
+            antiguo.
+        clear_button: QPushButton para vaciar el registro.
+    """
+
+    def __init__(self, parent=None):
+        super(ErrorLogDock, self).__init__(u"Registro de Errores", parent)
+        self._init_UI()
+
+    def _init_UI(self):
+        """
+        Inicialización de la interfaz.
+        """
+        self.error_list = QtGui.QListWidget()
+        self.error_list.setUniformItemSizes(True)
+
+        self.clear_button = QtGui.QPushButton(u"Vaciar")
+        self.clear_button.setStatusTip(u"Vaciar el registro de errores")
+
+        buttons = QtGui.QHBoxLayout()
+        buttons.addStretch()
+        buttons.addWidget(self.clear_button)
+
+        layout = QtGui.QVBoxLayout()
+        layout.addWidget(self.error_list)
+        layout.addLayout(buttons)
+
+        widget = QtGui.QWidget()
+        widget.setLayout(layout)
+        self.setWidget(widget)
+
+    def set_errors(self, errors):
+        """
+        Muestra la lista errors (tuplas (hora, mensaje, repeticiones)), del
+        más antiguo al más reciente.
+        """
+        self.error_list.clear()
+        self.error_list.addItems([
+            u"%s  %s%s" % (hour, text, u" (x%d)" % count if count > 1 else u"")
+            for hour, text, count in reversed(errors)])
+
+
+class TextEditorDialogs():
+    """
+    Clase TextEditorDialogs: Contiene métodos para mostrar mensajes emergentes
+    que requieren una respuesta del usuario y ventanas de diálogo para
+    abrir/guardar ficheros/directorios. El resto de avisos se muestran sin
+    bloquear la ventana (ver NotificationToast).
+    """
 
     @staticmethod
     def confirm_operation_message(info_text):
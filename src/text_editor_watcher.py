@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Módulo con el vigilante de cambios de la carpeta abierta en el editor de
+texto.
+
+Autor: Andrés Salinas Lima <i52salia@uco.es>.
+"""
+
+from __future__ import print_function
+import sys
+from PyQt4 import QtCore
+
+
+class FolderWatcher(QtCore.QObject):
+    """
+    Clase FolderWatcher: Vigila la carpeta abierta y avisa cuando cambian sus
+    ficheros.
+
+    Usa QFileSystemWatcher (inotify en Linux) y, si el sistema no permite
+    vigilar la carpeta, la consulta periódicamente. Los avisos que llegan muy
+    seguidos (por ejemplo, al copiar muchos ficheros a la vez) se agrupan en
+    uno solo.
+
+    Señales:
+        folder_changed: Se emite cuando la carpeta vigilada ha cambiado.
+    """
+
+    folder_changed = QtCore.pyqtSignal()
+
+    # Milisegundos durante los que se acumulan los avisos antes de emitir
+    # folder_changed.
+    _DEBOUNCE_INTERVAL = 250
+
+    # Milisegundos entre consultas cuando no se puede vigilar la carpeta.
+    _POLL_INTERVAL = 2000
+
+    def __init__(self):
+        super(FolderWatcher, self).__init__()
+
+        self._folder_path = u""
+
+        self._watcher = QtCore.QFileSystemWatcher(self)
+        self._watcher.directoryChanged.connect(self._schedule)
+
+        self._debounce_timer = QtCore.QTimer(self)
+        self._debounce_timer.setSingleShot(True)
+        self._debounce_timer.setInterval(self._DEBOUNCE_INTERVAL)
+        self._debounce_timer.timeout.connect(self.folder_changed.emit)
+
+        self._poll_timer = QtCore.QTimer(self)
+        self._poll_timer.setInterval(self._POLL_INTERVAL)
+        self._poll_timer.timeout.connect(self.folder_changed.emit)
+
+    def watch(self, folder_path):
+        """
+        Empieza a vigilar la carpeta indicada en el argumento folder_path (y
+        deja de vigilar la anterior).
+        """
+        self.stop()
+
+        self._folder_path = folder_path
+        self._watcher.addPath(folder_path)
+
+        # Si no se ha podido vigilar la carpeta, la consultamos periódicamente.
+        if (not self._watcher.directories()):
+            self._poll_timer.start()
+
+    def stop(self):
+        """
+        Deja de vigilar la carpeta.
+        """
+        if (self._watcher.directories()):
+            self._watcher.removePaths(self._watcher.directories())
+
+        self._poll_timer.stop()
+        self._debounce_timer.stop()
+        self._folder_path = u""
+
+    def _schedule(self, path):
+        """
+        Programa el aviso de cambios si no estaba ya programado (los avisos
+        que lleguen mientras tanto se agrupan con él).
+        """
+        if (not self._debounce_timer.isActive()):
+            self._debounce_timer.start()
+
+
+if __name__ == "__main__":
+    """
+    En caso de que intentemos ejecutar este módulo.
+    """
+    print(u"Este módulo no puede ser ejecutado", file=sys.stderr)
@@ -0,0 +1,187 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Módulo con los hilos de trabajo del editor de texto.
+
+Autor: Andrés Salinas Lima <i52salia@uco.es>.
+"""
+
+from __future__ import print_function
+from text_editor_io import OperationCancelled
+from text_editor_syntax import line_states
+import sys
+import time
+from PyQt4 import QtCore
+
+
+class FileWorker(QtCore.QThread):
+    """
+    Clase FileWorker: Hilo que ejecuta una operación de fichero (abrir o
+    guardar) fuera del hilo de la interfaz.
+
+    La operación es una función que recibe dos argumentos: una función
+    progress a la que llamar con el trabajo hecho y el total, y una función
+    cancelled que devuelve True cuando el usuario ha cancelado la operación.
+
+    Argumentos:
+        operation: Función con la operación a ejecutar.
+
+    Señales:
+        progress: Se emite con el trabajo hecho y el total.
+        operation_finished: Se emite con el resultado de la operación.
+        operation_failed: Se emite con la excepción si la operación falla.
+        operation_cancelled: Se emite si la operación se cancela.
+    """
+
+    progress = QtCore.pyqtSignal(object, object)
+    operation_finished = QtCore.pyqtSignal(object)
+    operation_failed = QtCore.pyqtSignal(object)
+    operation_cancelled = QtCore.pyqtSignal()
+
+    def __init__(self, operation):
+        super(FileWorker, self).__init__()
+
+        self._operation = operation
+        self._cancelled = False
+
+    def run(self):
+        """
+        Ejecuta la operación (en el hilo secundario).
+        """
+        try:
+            result = self._operation(self.progress.emit, self.is_cancelled)
+        except OperationCancelled:
+            self.operation_cancelled.emit()
+        except Exception as error:
+            self.operation_failed.emit(error)
+        else:
+            self.operation_finished.emit(result)
+
+    def cancel(self):
+        """
+        Pide que se cancele la operación. La operación termina en cuanto
+        vuelve a comprobar si ha sido cancelada.
+        """
+        self._cancelled = True
+
+    def is_cancelled(self):
+        """
+        Devuelve True si se ha pedido cancelar la operación; False en caso
+        contrario.
+        """
+        return self._cancelled
+
+
+class SearchWorker(QtCore.QThread):
+    """
+    Clase SearchWorker: Hilo que recoge los resultados de una búsqueda en la
+    carpeta según van llegando y los pasa a la interfaz en grupos, para no
+    saturarla con una señal por coincidencia.
+
+    Argumentos:
+        results: Iterador con los resultados de la búsqueda: una lista de
+            coincidencias por cada fichero.
+
+    Señales:
+        matches_found: Se emite con una lista de coincidencias.
+        search_failed: Se emite con la excepción si la búsqueda falla.
+    """
+
+    matches_found = QtCore.pyqtSignal(object)
+    search_failed = QtCore.pyqtSignal(object)
+
+    # Segundos durante los que se acumulan las coincidencias antes de
+    # emitirlas.
+    _BATCH_INTERVAL = 0.1
+
+    def __init__(self, results):
+        super(SearchWorker, self).__init__()
+
+        self._results = results
+        self._cancelled = False
+
+    def run(self):
+        """
+        Recorre los resultados de la búsqueda (en el hilo secundario).
+        """
+        batch = []
+        last_emit = time.time()
+
+        try:
+            for matches in self._results:
+                if (self._cancelled):
+                    return
+                batch.extend(matches)
+
+                if (time.time() - last_emit >= self._BATCH_INTERVAL):
+                    self.matches_found.emit(batch)
+                    batch = []
+                    last_emit = time.time()
+        except Exception as error:
+            self.search_failed.emit(error)
+            return
+
+        if (batch and not self._cancelled):
+            self.matches_found.emit(batch)
+
+    def cancel(self):
+        """
+        Pide que se deje de recoger resultados. El hilo termina en cuanto
+        llega el siguiente resultado (o se acaba la búsqueda).
+        """
+        self._cancelled = True
+
+
+class HighlightWorker(QtCore.QThread):
+    """
+    Clase HighlightWorker: Hilo que analiza una copia del texto de un
+    documento para obtener el estado del resaltado de sintaxis al final de
+    cada línea, sin ocupar el hilo de la interfaz.
+
+    Argumentos:
+        lexer: Analizador léxico (objeto Lexer).
+        text: String unicode con una copia del texto del documento.
+
+    Señales:
+        states_ready: Se emite con el array de estados de las líneas.
+    """
+
+    states_ready = QtCore.pyqtSignal(object)
+
+    def __init__(self, lexer, text):
+        super(HighlightWorker, self).__init__()
+
+        self._lexer = lexer
+        self._text = text
+        self._cancelled = False
+
+    def run(self):
+        """
+        Analiza el texto (en el hilo secundario).
+        """
+        states = line_states(self._lexer, self._text, self.is_cancelled)
+        self._text = None
+
+        if (states is not None):
+            self.states_ready.emit(states)
+
+    def cancel(self):
+        """
+        Pide que se deje de analizar el texto.
+        """
+        self._cancelled = True
+
+    def is_cancelled(self):
+        """
+        Devuelve True si se ha pedido cancelar el análisis; False en caso
+        contrario.
+        """
+        return self._cancelled
+
+
+if __name__ == "__main__":
+    """
+    En caso de que intentemos ejecutar este módulo.
+    """
+    print(u"Este módulo no puede ser ejecutado", file=sys.stderr)